@@ -5,6 +5,38 @@ Vérifie la cohérence physique des machines générées
 
 import numpy as np
 
+# Codes des validations par lot (un bit par contrôle, combinés dans 'flags')
+ERR_DIM_NEGATIVE = 1 << 0     # D, L, Zs, slot_height ou slot_width <= 0
+ERR_RADII = 1 << 1            # R_ext <= R_int
+WARN_SLOTS = 1 << 2           # Zs non divisible par 2p
+WARN_D_L_LOW = 1 << 3
+WARN_D_L_HIGH = 1 << 4
+WARN_TAU_P_LOW = 1 << 5
+WARN_TAU_P_HIGH = 1 << 6
+WARN_AIR_GAP_LOW = 1 << 7
+WARN_AIR_GAP_HIGH = 1 << 8
+WARN_MAGNET_LOW = 1 << 9      # IPMSM
+WARN_MAGNET_HIGH = 1 << 10    # IPMSM, SPMSM (> 0.25), Hybrid (hors [0.2, 0.3])
+WARN_POLE_FLAT = 1 << 11      # SynRel
+WARN_POLE_DEEP = 1 << 12      # SynRel
+ERROR_MASK = ERR_DIM_NEGATIVE | ERR_RADII
+
+FLAG_MESSAGES = {
+    ERR_DIM_NEGATIVE: "Dimension négative ou nulle (D, L, Zs, slot_height, slot_width)",
+    ERR_RADII: "Rayon extérieur doit être > rayon intérieur",
+    WARN_SLOTS: "Nombre d'encoches non divisible par 2p",
+    WARN_D_L_LOW: "Ratio D/L trop faible (machine trop longue)",
+    WARN_D_L_HIGH: "Ratio D/L trop élevé (machine trop large)",
+    WARN_TAU_P_LOW: "Pas polaire trop petit",
+    WARN_TAU_P_HIGH: "Pas polaire trop grand",
+    WARN_AIR_GAP_LOW: "Entrefer trop petit",
+    WARN_AIR_GAP_HIGH: "Entrefer trop grand",
+    WARN_MAGNET_LOW: "Épaisseur aimant trop mince",
+    WARN_MAGNET_HIGH: "Épaisseur aimant trop épaisse ou hors plage",
+    WARN_POLE_FLAT: "Pôles trop plats (profondeur/largeur < 0.3)",
+    WARN_POLE_DEEP: "Pôles trop profonds (profondeur/largeur > 0.7)",
+}
+
 class BoldeaValidator:
     """
     Classe de validation des machines selon les critères de Boldea
@@ -209,6 +241,78 @@ class BoldeaValidator:
         else:
             return "À améliorer"
     
+    def validate_batch(self, designs, machine_type='IPMSM'):
+        """
+        Validation vectorisée d'un lot de designs (sans état, utilisable en parallèle)
+        
+        Mêmes contrôles et même score que validate_machine_design, évalués
+        comme masques NumPy sur toutes les lignes à la fois. Les messages ne
+        sont construits qu'à la demande (get_batch_messages).
+        
+        Args:
+            designs: DataFrame, tableau structuré NumPy ou dict de colonnes
+                ('D', 'L', 'tau_p', 'Zs', 'pole_pairs', 'air_gap', ...)
+            machine_type (str): Type de machine
+        
+        Returns:
+            dict: 'score' (float), 'flags' (bits ERR_*/WARN_*), 'is_valid' (bool), par ligne
+        """
+        
+        cols = _get_columns(designs)
+        n = len(next(iter(cols.values()))) if cols else 0
+        nan = np.full(n, np.nan)
+        col = lambda name: cols.get(name, nan)
+        flags = np.zeros(n, dtype=np.uint32)
+        
+        def set_flag(mask, flag):
+            flags[mask] |= np.uint32(flag)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Dimensions principales (NaN = dimension absente, contrôle ignoré)
+            negative = np.zeros(n, dtype=bool)
+            for name in ['D', 'L', 'Zs', 'slot_height', 'slot_width']:
+                negative |= col(name) <= 0
+            set_flag(negative, ERR_DIM_NEGATIVE)
+            set_flag(col('R_ext') <= col('R_int'), ERR_RADII)
+            Zs, p = col('Zs'), col('pole_pairs')
+            set_flag(np.isfinite(Zs) & np.isfinite(p) & (np.fmod(Zs, 2 * p) != 0), WARN_SLOTS)
+            
+            # Ratios géométriques
+            limits = self.limits
+            D_L_ratio = col('D') / col('L')
+            set_flag(D_L_ratio < limits['D_L_ratio']['min'], WARN_D_L_LOW)
+            set_flag(D_L_ratio > limits['D_L_ratio']['max'], WARN_D_L_HIGH)
+            set_flag(col('tau_p') < limits['tau_p']['min'], WARN_TAU_P_LOW)
+            set_flag(col('tau_p') > limits['tau_p']['max'], WARN_TAU_P_HIGH)
+            air_gap_ratio = col('air_gap') / col('D')
+            set_flag(air_gap_ratio < limits['air_gap_ratio']['min'], WARN_AIR_GAP_LOW)
+            set_flag(air_gap_ratio > limits['air_gap_ratio']['max'], WARN_AIR_GAP_HIGH)
+            
+            # Contrôles spécifiques au type de machine
+            magnet_ratio = col('magnet_thickness') / col('tau_p')
+            if machine_type == 'IPMSM':
+                set_flag(magnet_ratio < limits['magnet_thickness_ratio']['min'], WARN_MAGNET_LOW)
+                set_flag(magnet_ratio > limits['magnet_thickness_ratio']['max'], WARN_MAGNET_HIGH)
+            elif machine_type == 'SPMSM':
+                set_flag(magnet_ratio > 0.25, WARN_MAGNET_HIGH)
+            elif machine_type == 'SynRel':
+                aspect_ratio = col('pole_depth') / col('pole_width')
+                set_flag(aspect_ratio < 0.3, WARN_POLE_FLAT)
+                set_flag(aspect_ratio > 0.7, WARN_POLE_DEEP)
+            elif machine_type == 'Hybrid':
+                set_flag((magnet_ratio < 0.2) | (magnet_ratio > 0.3), WARN_MAGNET_HIGH)
+        
+        # Score identique à _calculate_validation_score
+        is_valid = (flags & ERROR_MASK) == 0
+        has_warning = (flags & ~np.uint32(ERROR_MASK)) != 0
+        score = np.minimum(100.0, 50.0 + 20.0 * ~has_warning + 30.0 * is_valid)
+        return {'score': score, 'flags': flags, 'is_valid': is_valid}
+    
+    @staticmethod
+    def get_batch_messages(flags):
+        """Messages d'un code 'flags' de validate_batch (construits à la demande)"""
+        return [message for flag, message in FLAG_MESSAGES.items() if int(flags) & flag]
+    
     def generate_validation_report(self, machine_dims, machine_type='IPMSM'):
         """Générer un rapport de validation complet"""
         
@@ -249,3 +353,19 @@ Statut: {' VALIDE' if validation_result['is_valid'] else ' INVALIDE'}
             report += " Design conforme aux critères Boldea\n"
         
         return report
+
+
+def _get_columns(designs):
+    """Colonnes float d'un DataFrame, d'un tableau structuré ou d'un dict de tableaux"""
+    if hasattr(designs, 'dtype') and designs.dtype.names is not None:
+        names = designs.dtype.names
+    elif hasattr(designs, 'columns'):
+        names = list(designs.columns)
+    else:
+        names = list(designs.keys())
+    columns = {}
+    for name in names:
+        values = np.asarray(designs[name])
+        if np.issubdtype(values.dtype, np.number):
+            columns[name] = values.astype(float)
+    return columns
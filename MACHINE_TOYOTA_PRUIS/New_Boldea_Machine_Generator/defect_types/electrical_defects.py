@@ -495,7 +495,39 @@ class ElectricalDefectGenerator:
             defects.append(defect)
         
         return defects
-    
+
+    def apply_computed_losses(self, defects: List[Dict[str, Any]], losses: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Ajoute aux défauts les pertes calculées [W] au lieu des seuls rapports tirés au hasard
+
+        losses : pertes de la machine saine de chaque défaut, scalaires ou tableaux (n,)
+        ('hysteresis', 'eddy', 'excess', 'copper', cf. util.losses.comp_batch_losses).
+        Le facteur d'un défaut core_loss ou eddy_current multiplie la composante concernée.
+        """
+        components = ['hysteresis', 'eddy', 'excess', 'copper']
+        n = len(defects)
+        base = np.stack([np.broadcast_to(np.asarray(losses[c], dtype=float), (n,)) for c in components], axis=1)
+
+        # Composante touchée par chaque défaut
+        factors = np.ones((n, len(components)))
+        component_map = {'hysteresis': 'hysteresis', 'eddy_current': 'eddy', 'excess': 'excess'}
+        for i, defect in enumerate(defects):
+            params = defect['parameters']
+            if defect['defect_type'] == 'core_loss':
+                factors[i, components.index(component_map[params['loss_type']])] = params['loss_factor']
+            elif defect['defect_type'] == 'eddy_current':
+                # Courants de Foucault dans les conducteurs : pertes cuivre supplémentaires
+                component = 'copper' if params['eddy_type'] == 'conductor' else 'eddy'
+                factors[i, components.index(component)] = params['loss_factor']
+
+        values = base * factors
+        total_base = base.sum(axis=1)
+        for i, defect in enumerate(defects):
+            defect['losses'] = {c: float(values[i, k]) for k, c in enumerate(components)}
+            defect['losses']['iron'] = float(values[i, :3].sum())
+            defect['losses']['total'] = float(values[i].sum())
+            defect['losses']['loss_ratio'] = float(values[i].sum() / total_base[i]) if total_base[i] > 0 else 1.0
+        return defects
+
     def get_defect_statistics(self, defects: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Calcule les statistiques des défauts"""
         if not defects:
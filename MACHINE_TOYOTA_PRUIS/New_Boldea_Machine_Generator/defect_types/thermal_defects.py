@@ -89,7 +89,12 @@ class ThermalDefectGenerator:
             'temp_increase': temp_increase,
             'area_affected': area_affected,
             'position': hotspot_position,
-            'description': f"Point chaud: +{temp_increase:.1f}°C sur {area_affected*100:.1f}% de la surface"
+            'description': f"Point chaud: +{temp_increase:.1f}°C sur {area_affected*100:.1f}% de la surface",
+            'impact': {
+                'temperature_rise': severity * 0.2,
+                'thermal_stress': severity * 0.15,
+                'efficiency_loss': severity * 0.05
+            }
         }
     
     def generate_thermal_gradient_defect(self, machine_dims, severity=None):
@@ -126,7 +131,12 @@ class ThermalDefectGenerator:
             'max_gradient': max_gradient,
             'affected_length': affected_length,
             'direction': gradient_direction,
-            'description': f"Gradient thermique: {max_gradient:.0f}°C/m en direction {gradient_direction}"
+            'description': f"Gradient thermique: {max_gradient:.0f}°C/m en direction {gradient_direction}",
+            'impact': {
+                'thermal_stress': severity * 0.2,
+                'temperature_rise': severity * 0.1,
+                'vibration': severity * 0.05
+            }
         }
     
     def generate_insulation_degradation_defect(self, machine_dims, severity=None):
@@ -167,7 +177,12 @@ class ThermalDefectGenerator:
             'resistance_reduction': resistance_reduction,
             'phases_affected': phases_affected,
             'degradation_type': degradation_type,
-            'description': f"Dégradation isolation: -{resistance_reduction*100:.1f}% résistance, {phases_affected} phase(s) affectée(s)"
+            'description': f"Dégradation isolation: -{resistance_reduction*100:.1f}% résistance, {phases_affected} phase(s) affectée(s)",
+            'impact': {
+                'temperature_rise': severity * 0.1,
+                'efficiency_loss': severity * 0.08,
+                'thermal_stress': severity * 0.1
+            }
         }
     
     def generate_cooling_failure_defect(self, machine_dims, severity=None):
@@ -209,7 +224,12 @@ class ThermalDefectGenerator:
             'efficiency_reduction': efficiency_reduction,
             'components_affected': components,
             'failure_type': failure_type,
-            'description': f"Défaillance refroidissement: -{efficiency_reduction*100:.1f}% efficacité, {failure_type}"
+            'description': f"Défaillance refroidissement: -{efficiency_reduction*100:.1f}% efficacité, {failure_type}",
+            'impact': {
+                'temperature_rise': severity * 0.25,
+                'efficiency_loss': severity * 0.1,
+                'thermal_stress': severity * 0.12
+            }
         }
     
     def generate_overload_defect(self, machine_dims, severity=None):
@@ -251,7 +271,12 @@ class ThermalDefectGenerator:
             'current_increase': current_increase,
             'duration': duration,
             'overload_cause': overload_cause,
-            'description': f"Surcharge thermique: {current_increase:.1f}x courant pendant {duration:.0f}s, cause: {overload_cause}"
+            'description': f"Surcharge thermique: {current_increase:.1f}x courant pendant {duration:.0f}s, cause: {overload_cause}",
+            'impact': {
+                'temperature_rise': severity * 0.22,
+                'efficiency_loss': severity * 0.12,
+                'thermal_stress': severity * 0.18
+            }
         }
     
     def generate_random_thermal_defect(self, machine_dims, severity=None):
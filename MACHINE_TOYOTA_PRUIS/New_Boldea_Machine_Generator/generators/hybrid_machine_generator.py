@@ -3,6 +3,7 @@ Générateur de machines hybrides (IPMSM + SynRel)
 Combinaison de couple magnétique et réluctance
 """
 
+import importlib.util
 import sys
 import os
 import numpy as np
@@ -15,7 +16,14 @@ from boldea_designer import BoldeaDesigner
 from boldea_validator import BoldeaValidator
 from machine_templates import MachineTemplates
 
-try:
+# PYLEECAN est importé à la première génération de machine, pas au chargement
+# du module (les processus qui n'utilisent que Boldea ne le chargent jamais)
+PYLEECAN_AVAILABLE = importlib.util.find_spec("pyleecan") is not None
+
+
+def _import_pyleecan():
+    """Importe les classes PYLEECAN utilisées par le générateur (une seule fois)"""
+    global MachineIPMSM, LamSlot, LamHole, HoleM50, SlotW60, Magnet, WindingUD, Shaft, Frame, save
     from pyleecan.Classes.MachineIPMSM import MachineIPMSM
     from pyleecan.Classes.LamSlot import LamSlot
     from pyleecan.Classes.LamHole import LamHole
@@ -26,10 +34,6 @@ try:
     from pyleecan.Classes.Shaft import Shaft
     from pyleecan.Classes.Frame import Frame
     from pyleecan.Functions.save import save
-    PYLEECAN_AVAILABLE = True
-except ImportError:
-    print("⚠️  PYLEECAN non disponible - mode simulation uniquement")
-    PYLEECAN_AVAILABLE = False
 
 class HybridMachineGenerator:
     """
@@ -69,6 +73,7 @@ class HybridMachineGenerator:
         
         if not PYLEECAN_AVAILABLE:
             raise ImportError("PYLEECAN requis pour la génération de machines")
+        _import_pyleecan()
         
         # 1. Dimensionnement selon Boldea pour hybride
         print(f"🔧 Dimensionnement Boldea Hybride pour {power_rated/1000:.0f}kW...")
@@ -111,6 +111,58 @@ def test_machine_templates():
     for i, suggestion in enumerate(suggestions[:3]):  # Top 3
         print(f"   {i+1}. {suggestion['machine_type']}: Score {suggestion['score']}")
 
+def test_validation_batch():
+    """Test de la validation vectorisée d'un lot de designs"""
+    print("\n=== TEST VALIDATION PAR LOT ===")
+    
+    import numpy as np
+    
+    designer = BoldeaDesigner()
+    validator = BoldeaValidator()
+    
+    # Lot de designs (puissance, vitesse, paires de pôles)
+    dims_list = []
+    for power, speed, pole_pairs in [(300e3, 6000, 4), (1e6, 100, 16), (50e3, 12000, 2), (2e6, 3000, 3)]:
+        dims = designer.calculate_machine_dimensions(power, speed, pole_pairs)
+        dims['pole_pairs'] = pole_pairs
+        dims_list.append(dims)
+    designs = {key: np.array([dims[key] for dims in dims_list]) for key in dims_list[0]}
+    designs['R_ext'] = np.array([0.1, 0.2, 0.05, 0.1])
+    designs['R_int'] = np.array([0.05, 0.1, 0.06, 0.05])  # 3e design invalide
+    
+    result = validator.validate_batch(designs, 'IPMSM')
+    for ii, dims in enumerate(dims_list):
+        dims.update(R_ext=designs['R_ext'][ii], R_int=designs['R_int'][ii])
+        scalar = validator.validate_machine_design(dims, 'IPMSM')
+        messages = validator.get_batch_messages(result['flags'][ii])
+        print(f"   Design {ii+1}: score {result['score'][ii]:.1f}, flags {result['flags'][ii]:#06x}")
+        assert result['score'][ii] == scalar['score']
+        assert result['is_valid'][ii] == scalar['is_valid']
+        assert len(messages) == len(scalar['warnings']) + len(scalar['errors'])
+    assert not result['is_valid'][2]
+
+def test_computed_losses():
+    """Test des pertes calculées attachées aux défauts électriques"""
+    print("\n=== TEST PERTES CALCULÉES ===")
+    
+    import numpy as np
+    sys.path.append(os.path.join(os.path.dirname(__file__), 'defect_types'))
+    from electrical_defects import ElectricalDefectGenerator
+    
+    generator = ElectricalDefectGenerator()
+    dims = BoldeaDesigner().calculate_machine_dimensions(300e3, 6000, 4)
+    defects = [generator.generate_core_loss_defect(dims, 4), generator.generate_eddy_current_defect(dims, 2),
+               generator.generate_winding_fault_defect(dims, 3)]
+    # Pertes de la machine saine de chaque défaut (cf. util.losses.comp_batch_losses)
+    losses = {'hysteresis': np.array([100.0, 120.0, 90.0]), 'eddy': 50.0, 'excess': 20.0, 'copper': 300.0}
+    generator.apply_computed_losses(defects, losses)
+    for defect in defects:
+        print(f"   {defect['defect_type']}: {defect['losses']['total']:.1f} W, rapport {defect['losses']['loss_ratio']:.2f}")
+    factor = defects[0]['parameters']['loss_factor']
+    assert np.isclose(defects[0]['losses']['total'], 470 + (factor - 1) * {'hysteresis': 100, 'eddy_current': 50, 'excess': 20}[defects[0]['parameters']['loss_type']])
+    assert defects[1]['losses']['loss_ratio'] > 1
+    assert defects[2]['losses']['total'] == 460 and defects[2]['losses']['loss_ratio'] == 1
+
 def main():
     """Fonction principale de test"""
     print("🚀 DÉMARRAGE DES TESTS BOLDEA")
@@ -126,6 +178,12 @@ def main():
         # Test 3: Templates
         test_machine_templates()
         
+        # Test 4: Validation par lot
+        test_validation_batch()
+        
+        # Test 5: Pertes calculées des défauts
+        test_computed_losses()
+        
         print("\n✅ TOUS LES TESTS ONT RÉUSSI !")
         print("Le module Boldea fonctionne correctement.")
         
@@ -0,0 +1,408 @@
+"""Benchmark cases of the generation, defect and simulation stages.
+
+Each case is a setup function registered with @benchmark: the setup runs
+once (not timed) and returns the function that is timed. Cases depending
+on pyleecan are skipped when it is not installed, so the suite runs
+offline on any machine.
+"""
+
+import os
+import sys
+from os.path import dirname, join
+
+import numpy as np
+
+ROOT = dirname(dirname(os.path.abspath(__file__)))
+BOLDEA = join(ROOT, "New_Boldea_Machine_Generator")
+for path in [ROOT, join(BOLDEA, "boldea_core"), join(BOLDEA, "defect_types")]:
+    if path not in sys.path:
+        sys.path.append(path)
+
+BENCHMARKS = dict()
+
+
+def benchmark(name, number=1, requires=None):
+    """Register a setup function as the benchmark case name
+
+    Args:
+        name (str): name of the case in the results
+        number (int): calls of the timed function per measure
+        requires (str): module needed by the case (skipped if missing)
+    """
+
+    def decorator(setup):
+        BENCHMARKS[name] = {"setup": setup, "number": number, "requires": requires}
+        return setup
+
+    return decorator
+
+
+MACHINE_PATH = join(ROOT, "IPMSM_Toyota1_Prius_2004.json")
+MACHINE_DIMS = {
+    "D": 0.2,
+    "L": 0.08,
+    "tau_p": 0.078,
+    "Zs": 48,
+    "slot_height": 0.03,
+    "slot_width": 0.008,
+    "magnet_thickness": 0.0065,
+    "air_gap": 0.00075,
+    "D_L_ratio": 2.5,
+}
+
+
+# Machine generation
+
+
+@benchmark("toyota_prius_generator_build", requires="pyleecan")
+def setup_toyota_generator():
+    from pyleecan.Classes.MachineIPMSM import MachineIPMSM
+    from util.toyota_prius_generator import Toyota_Prius_Generator
+
+    generator = Toyota_Prius_Generator()
+
+    def run():
+        return MachineIPMSM(
+            shaft=generator.create_shaft(),
+            rotor=generator.create_rotor(),
+            stator=generator.create_stator(),
+            type_machine=1,
+        )
+
+    return run
+
+
+@benchmark("boldea_designer_x100", number=10)
+def setup_boldea_designer():
+    from boldea_designer import BoldeaDesigner
+
+    designer = BoldeaDesigner()
+    powers = np.linspace(50e3, 500e3, 100)
+
+    def run():
+        return [designer.calculate_machine_dimensions(P, 6000, 4) for P in powers]
+
+    return run
+
+
+@benchmark("boldea_validator_x100", number=10)
+def setup_boldea_validator():
+    from boldea_designer import BoldeaDesigner
+    from boldea_validator import BoldeaValidator
+
+    designer, validator = BoldeaDesigner(), BoldeaValidator()
+    dims_list = [designer.calculate_machine_dimensions(P, 6000, 4) for P in np.linspace(50e3, 500e3, 100)]
+
+    def run():
+        return [validator.validate_machine_design(dims, "IPMSM") for dims in dims_list]
+
+    return run
+
+
+@benchmark("boldea_validator_batch_x100000", number=10)
+def setup_boldea_validator_batch():
+    from boldea_validator import BoldeaValidator
+
+    validator = BoldeaValidator()
+    rng = np.random.default_rng(0)
+    n = 100000
+    designs = {
+        "D": rng.uniform(0.1, 1.0, n),
+        "L": rng.uniform(0.05, 0.5, n),
+        "tau_p": rng.uniform(0.01, 0.2, n),
+        "Zs": rng.choice([24, 36, 48, 72], n),
+        "pole_pairs": rng.integers(1, 9, n),
+        "slot_height": rng.uniform(0.01, 0.05, n),
+        "slot_width": rng.uniform(0.004, 0.012, n),
+        "magnet_thickness": rng.uniform(0.002, 0.02, n),
+        "air_gap": rng.uniform(0.0003, 0.002, n),
+    }
+
+    def run():
+        return validator.validate_batch(designs, "IPMSM")
+
+    return run
+
+
+# Defect generation (batch API of each generator)
+
+
+def _setup_defect_batch(module, cls, method):
+    generator = getattr(__import__(module), cls)()
+
+    def run():
+        np.random.seed(0)
+        return getattr(generator, method)(MACHINE_DIMS, 100)
+
+    return run
+
+
+@benchmark("electrical_defect_batch_x100")
+def setup_electrical_defects():
+    return _setup_defect_batch("electrical_defects", "ElectricalDefectGenerator", "generate_electrical_defect_batch")
+
+
+@benchmark("mechanical_defect_batch_x100")
+def setup_mechanical_defects():
+    return _setup_defect_batch("mechanical_defects", "MechanicalDefectGenerator", "generate_mechanical_defect_batch")
+
+
+@benchmark("thermal_defect_batch_x100")
+def setup_thermal_defects():
+    return _setup_defect_batch("thermal_defects", "ThermalDefectGenerator", "generate_thermal_defect_batch")
+
+
+@benchmark("mixed_defect_batch_x100")
+def setup_mixed_defects():
+    return _setup_defect_batch("mixed_defects", "MixedDefectGenerator", "generate_mixed_defect_batch")
+
+
+# Simulation setup and machine files
+
+
+@benchmark("load_simulation", requires="pyleecan")
+def setup_load_simulation():
+    from pyleecan.Functions.load import load
+    from util.simulation import load_simulation
+
+    machine = load(MACHINE_PATH)
+
+    def run():
+        return load_simulation(machine=machine)
+
+    return run
+
+
+@benchmark("pyleecan_json_load", requires="pyleecan")
+def setup_json_load():
+    from pyleecan.Functions.load import load
+
+    def run():
+        return load(MACHINE_PATH)
+
+    return run
+
+
+@benchmark("pyleecan_json_save", requires="pyleecan")
+def setup_json_save():
+    from tempfile import mkdtemp
+
+    from pyleecan.Functions.load import load
+
+    machine = load(MACHINE_PATH)
+    path = join(mkdtemp(), "machine.json")
+
+    def run():
+        machine.save(path)
+
+    return run
+
+
+# Variant creation: structural-sharing clone vs full copies
+
+
+@benchmark("machine_clone", number=10, requires="pyleecan")
+def setup_machine_clone():
+    from pyleecan.Functions.load import load
+    from util.clone import clone_machine
+
+    machine = load(MACHINE_PATH)
+
+    def run():
+        return clone_machine(machine, {"stator.Rint": 0.081})
+
+    return run
+
+
+@benchmark("machine_deepcopy", number=10, requires="pyleecan")
+def setup_machine_deepcopy():
+    from copy import deepcopy
+
+    from pyleecan.Functions.load import load
+
+    machine = load(MACHINE_PATH)
+
+    def run():
+        return deepcopy(machine)
+
+    return run
+
+
+@benchmark("machine_json_roundtrip", requires="pyleecan")
+def setup_machine_json_roundtrip():
+    from tempfile import mkdtemp
+
+    from pyleecan.Functions.load import load
+
+    machine = load(MACHINE_PATH)
+    path = join(mkdtemp(), "machine.json")
+
+    def run():
+        machine.save(path)
+        return load(path)
+
+    return run
+
+
+# Reduced FEMM-free solve
+
+
+@benchmark("fe_solver_ring_machine_linear")
+def setup_fe_linear():
+    return _setup_fe_solve(type_BH=1)
+
+
+@benchmark("fe_solver_ring_machine_nonlinear")
+def setup_fe_nonlinear():
+    return _setup_fe_solve(type_BH=0)
+
+
+def _setup_fe_solve(type_BH):
+    from ring_machine import make_ring_machine
+    from util import fe_solver
+
+    mesh, machine = make_ring_machine()
+    problem = fe_solver.build_problem(mesh, machine, type_BH_stator=type_BH, type_BH_rotor=type_BH)
+    theta = np.linspace(0, np.pi / 2, 8, endpoint=False)
+    Is = np.array([[-60 * np.sin(2 * t - 2 * np.pi * k / 3) for k in range(3)] for t in theta])
+    angle = np.linspace(0, 2 * np.pi, 256, endpoint=False)
+    mag = fe_solver.MagScipy(nb_worker=1)
+
+    def run():
+        return mag.solve(problem, theta, Is, angle)
+
+    return run
+
+
+@benchmark("flux_lut_build_ring_machine")
+def setup_flux_lut_build():
+    from ring_machine import make_ring_machine
+    from util import fe_solver
+    from util.flux_lut import comp_flux_lut
+
+    mesh, machine = make_ring_machine()
+    problem = fe_solver.build_problem(mesh, machine, type_BH_stator=1, type_BH_rotor=1)
+
+    def run():
+        return comp_flux_lut(problem, 2, np.linspace(-100, 0, 11), np.linspace(0, 100, 11), nb_worker=1)
+
+    return run
+
+
+@benchmark("flux_lut_mtpa_x1000", number=10)
+def setup_flux_lut_mtpa():
+    from util.flux_lut import FluxLUT
+
+    Id, Iq = np.linspace(-300, 0, 16), np.linspace(0, 300, 16)
+    grid_d, grid_q = np.meshgrid(Id, Iq, indexing="ij")
+    Phi_d, Phi_q = 0.1 + 3e-4 * grid_d, 5e-4 * grid_q
+    lut = FluxLUT(Id, Iq, Phi_d, Phi_q, 6 * (Phi_d * grid_q - Phi_q * grid_d), p=4)
+    I_list = np.linspace(1, 300, 1000)
+
+    def run():
+        return lut.comp_mtpa(I_list)
+
+    return run
+
+
+@benchmark("electrical_fault_waveforms_x1000", number=1)
+def setup_electrical_fault_waveforms():
+    from util.electrical_synthesis import comp_fault_waveforms
+
+    turn_ratio = np.ones((1000, 3))
+    turn_ratio[:, 0] = np.linspace(1, 0.5, 1000)
+
+    def run():
+        return comp_fault_waveforms(0.1, 0.4e-3, 1.0e-3, 0.08, -60, 120, 3000, 4, turn_ratio)
+
+    return run
+
+
+@benchmark("signal_synthesis_tem_5s_50khz")
+def setup_signal_synthesis():
+    from util.signal_synthesis import PeriodicSignal
+
+    angle = np.arange(128) * 2 * np.pi / 128
+    signal = PeriodicSignal(100 + 5 * np.cos(24 * angle) + 2 * np.sin(angle))
+
+    def run():
+        return signal.synthesize(fs=50e3, duration=5, speed=lambda t: 1000 + 400 * t, noise_std=0.01)
+
+    return run
+
+
+@benchmark("thermal_network_steady_x2000")
+def setup_thermal_network():
+    from util.thermal_network import GEOMETRIES, ThermalNetwork
+
+    network = ThermalNetwork(GEOMETRIES["Toyota_Prius"])
+    P = network.comp_node_losses(copper=np.linspace(500, 3000, 2000), tooth=300, yoke=400)
+    edge_scale, boundary_scale = network.comp_edge_scale(2000, cooling=np.linspace(1, 0.2, 2000))
+
+    def run():
+        return network.solve_steady(P, edge_scale, boundary_scale)
+
+    return run
+
+
+@benchmark("demag_maps_ring_machine_x1000")
+def setup_demag_maps():
+    from ring_machine import make_ring_machine
+    from util import fe_solver
+    from util.demagnetization import comp_magnet_segments, random_demag_maps, solve_demag_maps
+
+    mesh, machine = make_ring_machine()
+    problem = fe_solver.build_problem(mesh, machine, type_BH_stator=1, type_BH_rotor=1)
+    segments = comp_magnet_segments(problem, nb_seg=4)
+    maps, _ = random_demag_maps(problem, 1000, nb_seg=4)
+    theta = np.linspace(0, np.pi / 2, 8, endpoint=False)
+    Is = np.array([[-60 * np.sin(2 * t - 2 * np.pi * k / 3) for k in range(3)] for t in theta])
+    angle = np.linspace(0, 2 * np.pi, 256, endpoint=False)
+
+    def run():
+        return solve_demag_maps(problem, theta, Is, maps, angle, segments, nb_worker=1)
+
+    return run
+
+
+# Import time of a fresh worker process (interpreter start-up included, see
+# python_startup for the reference)
+
+
+def _setup_import(statement):
+    import subprocess
+
+    cmd = [sys.executable, "-c", statement]
+
+    def run():
+        subprocess.run(cmd, cwd=ROOT, check=True)
+
+    return run
+
+
+@benchmark("python_startup")
+def setup_python_startup():
+    return _setup_import("pass")
+
+
+@benchmark("import_util_simulation")
+def setup_import_simulation():
+    return _setup_import("import util.simulation")
+
+
+@benchmark("import_util_failures")
+def setup_import_failures():
+    return _setup_import("import util.failures")
+
+
+@benchmark("import_util_fe_solver")
+def setup_import_fe_solver():
+    return _setup_import("import util.fe_solver")
+
+
+@benchmark("import_boldea_generators")
+def setup_import_generators():
+    return _setup_import(
+        "import sys; sys.path.append('New_Boldea_Machine_Generator/generators'); "
+        "import pyleecan_generator, hybrid_machine_generator"
+    )
@@ -0,0 +1,156 @@
+"""Run the benchmark suite, store the timings as JSON and compare to a baseline.
+
+Usage (from MACHINE_TOYOTA_PRUIS):
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 0.2 \
+        --threshold fe_solver_ring_machine_nonlinear=0.5
+
+A case regresses when its median time is above the baseline median times
+(1 + threshold), when it fails, or when a case of the baseline does not run
+(missing dependency, removed case); the exit code is then 1.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from importlib import import_module
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(abspath(__file__)))
+
+from bench_suite import BENCHMARKS
+
+
+def time_case(case, repeat=5):
+    """Median, min, mean and std of repeat measures of one case [s per call]"""
+    run = case["setup"]()
+    run()  # warm-up: first-call imports and caches are not measured
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(case["number"]):
+            run()
+        times.append((time.perf_counter() - start) / case["number"])
+    times = sorted(times)
+    mean = sum(times) / len(times)
+    return {
+        "median": times[len(times) // 2],
+        "min": times[0],
+        "mean": mean,
+        "std": (sum((t - mean) ** 2 for t in times) / len(times)) ** 0.5,
+        "repeat": repeat,
+        "number": case["number"],
+    }
+
+
+def run_benchmarks(names=None, repeat=5, verbose=True):
+    """Time the registered cases (all, or those whose name contains one of names)"""
+    results = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": dict(),
+        "skipped": dict(),
+        "failed": dict(),
+    }
+    for name, case in BENCHMARKS.items():
+        if names and not any(n in name for n in names):
+            continue
+        if case["requires"] is not None:
+            try:
+                import_module(case["requires"])
+            except ImportError:
+                results["skipped"][name] = case["requires"] + " not installed"
+                if verbose:
+                    print(f"{name:<40s} skipped ({case['requires']} not installed)")
+                continue
+        try:
+            res = time_case(case, repeat=repeat)
+        except Exception as e:
+            # A broken stage is reported, the other cases are still measured
+            results["failed"][name] = type(e).__name__ + ": " + str(e)
+            if verbose:
+                print(f"{name:<40s} FAILED ({results['failed'][name]})")
+            continue
+        results["benchmarks"][name] = res
+        if verbose:
+            print(f"{name:<40s} {res['median'] * 1e3:10.3f} ms (min {res['min'] * 1e3:.3f} ms)")
+    return results
+
+
+def compare(results, baseline, threshold=0.2, thresholds=None, names=None):
+    """Cases slower than the baseline by more than their threshold, failed or not run
+
+    Args:
+        names (list): the names filter of run_benchmarks, the baseline cases
+            outside the filter are not expected to run
+
+    Returns:
+        list: (name, reason) of the regressions
+    """
+    thresholds = thresholds or dict()
+    regressions = [(name, "FAILED " + error) for name, error in results["failed"].items()]
+    for name, base in baseline["benchmarks"].items():
+        if name in results["failed"] or (names and not any(n in name for n in names)):
+            continue
+        if name not in results["benchmarks"]:
+            reason = results["skipped"].get(name, "not in the benchmark suite")
+            regressions.append((name, "not run (" + reason + ")"))
+            continue
+        ref, median = base["median"], results["benchmarks"][name]["median"]
+        ratio = median / ref if ref > 0 else float("inf")
+        if ratio > 1 + thresholds.get(name, threshold):
+            regressions.append((name, f"{ref * 1e3:.3f} ms -> {median * 1e3:.3f} ms (x{ratio:.2f})"))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("names", nargs="*", help="run only the cases containing one of these names")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="JSON file of the results")
+    parser.add_argument("--baseline", help="JSON file of the results to compare with")
+    parser.add_argument("--save-baseline", help="write the results as a new baseline")
+    parser.add_argument(
+        "--threshold",
+        action="append",
+        default=[],
+        help="allowed slowdown, global (0.2 = +20%%) or per case (name=0.5)",
+    )
+    args = parser.parse_args(argv)
+
+    threshold, thresholds = 0.2, dict()
+    for value in args.threshold:
+        if "=" in value:
+            name, value = value.split("=", 1)
+            thresholds[name] = float(value)
+        else:
+            threshold = float(value)
+
+    results = run_benchmarks(args.names, repeat=args.repeat)
+    for path in [args.output, args.save_baseline]:
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, threshold, thresholds, names=args.names)
+        for name, reason in regressions:
+            print(f"REGRESSION {name}: {reason}")
+        if regressions:
+            return 1
+        print("No regression against " + args.baseline)
+    elif results["failed"]:
+        # Without a baseline a broken case still fails the run
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Machine à aimants en surface maillée en polaire, partagée par les tests et les benchmarks
+du solveur éléments finis intégré (util/fe_solver.py), sans FEMM ni GMSH ni pyleecan
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+
+
+def make_ring_machine(Nangle=192, Zs=12, p=2):
+    """Maillage polaire structuré et machine minimale (attributs pyleecan utilisés par le solveur)"""
+
+    radii = [0.01, 0.02, 0.03, 0.034, 0.036, 0.038, 0.04, 0.0405, 0.041, 0.045, 0.05, 0.06, 0.07]
+    theta = np.linspace(0, 2 * np.pi, Nangle, endpoint=False)
+    nodes = np.array([[r * np.cos(t), r * np.sin(t)] for r in radii for t in theta])
+    tri = []
+    for ii in range(len(radii) - 1):
+        for jj in range(Nangle):
+            a, b = ii * Nangle + jj, ii * Nangle + (jj + 1) % Nangle
+            c, d = a + Nangle, b + Nangle
+            tri += [[a, b, d], [a, d, c]]
+    tri = np.array(tri)
+
+    center = nodes[tri].mean(axis=1)
+    r = np.hypot(*center.T)
+    phi = np.arctan2(center[:, 1], center[:, 0]) % (2 * np.pi)
+    pole_rel = phi % (np.pi / p) - np.pi / (2 * p)
+    slot_rel = phi % (2 * np.pi / Zs) - np.pi / Zs
+
+    label = np.full(len(tri), "Airgap", dtype=object)
+    label[r < 0.04] = "Rotor-0_Lamination"
+    label[(r > 0.038) & (r < 0.04)] = "Rotor-0_HoleVoid_R0-T0-S0"
+    label[(r > 0.038) & (r < 0.04) & (np.abs(pole_rel) < 0.4 * np.pi / p)] = "Rotor-0_HoleMag_R0-T0-S0"
+    label[r > 0.041] = "Stator-0_Lamination"
+    label[(r > 0.041) & (r < 0.05) & (np.abs(slot_rel) < 0.6 * np.pi / Zs)] = "Stator-0_Wind_R0-T0-S0"
+    mesh = {"nodes": nodes, "tri": tri, "label": label.astype(str), "boundaries": {}}
+
+    # Enroulement q=1 simple couche : A, -C, B, -A, C, -B
+    seq = [(1, 0, 0), (0, 0, -1), (0, 1, 0), (-1, 0, 0), (0, 0, 1), (0, -1, 0)]
+    wind_mat = np.array([[[[10 * n for n in seq[k % 6]] for k in range(Zs)]]])
+    BH = np.array(
+        [[0, 0], [100, 0.5], [200, 1.0], [500, 1.4], [2000, 1.6], [10000, 1.8], [50000, 2.0]],
+        dtype=float,
+    )
+    iron = SimpleNamespace(mag=SimpleNamespace(mur_lin=2500, get_BH=lambda: BH))
+    magnet = SimpleNamespace(
+        mat_type=SimpleNamespace(mag=SimpleNamespace(Brm20=1.2, alpha_Br=-0.001, mur_lin=1.05))
+    )
+    machine = SimpleNamespace(
+        rotor=SimpleNamespace(
+            Rext=0.04,
+            mat_type=iron,
+            hole=[SimpleNamespace(Zh=2 * p, magnet_0=magnet, magnet_1=magnet)],
+        ),
+        stator=SimpleNamespace(
+            L1=0.1,
+            Rint=0.041,
+            mat_type=iron,
+            winding=SimpleNamespace(wind_mat=wind_mat, Npcp=1, p=p, qs=3),
+        ),
+        comp_Rgap_mec=lambda: 0.0405,
+    )
+    return mesh, machine
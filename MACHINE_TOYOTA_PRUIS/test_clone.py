@@ -0,0 +1,60 @@
+"""
+Test du clonage de machines avec partage des matériaux (util/clone.py)
+"""
+
+from copy import deepcopy
+
+import numpy as np
+
+from util.clone import clone_machine, get_path
+
+
+class Material:
+    def __init__(self, BH):
+        self.BH = BH
+
+
+class Conductor:
+    pass
+
+
+class CondType12(Conductor):  # partagé via sa classe mère, comme dans pyleecan
+    def __init__(self, cond_mat):
+        self.cond_mat = cond_mat
+
+
+class Part:
+    def __init__(self, **kwargs):
+        self.parent = None
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+            if isinstance(value, Part):
+                value.parent = self
+
+
+def make_machine():
+    iron = Material(np.random.rand(1000, 2))
+    copper = Material(np.random.rand(10, 2))
+    winding = Part(wind_mat=np.ones((1, 1, 48, 3)), conductor=CondType12(copper))
+    stator = Part(Rint=0.08095, mat_type=iron, winding=winding)
+    rotor = Part(Rext=0.0802, mat_type=iron, hole=[Part(W0=0.042, mat_void=Material(None))])
+    return Part(stator=stator, rotor=rotor)
+
+
+def test_clone_sharing():
+    """Matériaux et conducteurs partagés, le reste copié et modifiable"""
+    machine = make_machine()
+    variant = clone_machine(machine, {"stator.Rint": 0.081, "rotor.hole[0].W0": 0.04})
+
+    assert variant.stator.mat_type is machine.stator.mat_type
+    assert variant.stator.winding.conductor is machine.stator.winding.conductor
+    assert variant.stator.winding.wind_mat is not machine.stator.winding.wind_mat
+    assert variant.stator.parent is variant and variant.stator.winding.parent is variant.stator
+    assert get_path(variant, "rotor.hole[0].W0") == 0.04 and machine.rotor.hole[0].W0 == 0.042
+    assert machine.stator.Rint == 0.08095
+
+    variant.stator.winding.wind_mat[0, 0, 0, 0] = 0
+    assert machine.stator.winding.wind_mat[0, 0, 0, 0] == 1
+
+    full = deepcopy(machine)
+    assert full.stator.mat_type is not machine.stator.mat_type
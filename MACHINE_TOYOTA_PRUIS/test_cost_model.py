@@ -0,0 +1,51 @@
+"""
+Test du modèle de coût et de l'ordonnancement des campagnes (util/cost_model.py)
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from util.cost_model import CostModel, run_schedule, schedule
+
+
+def comp_runtime(features):
+    """Temps 'mesuré' synthétique : lois de puissance et facteur non linéaire"""
+    return 2e-6 * features["Nt"] * features["Zs"] ** 1.5 * (4 if features["is_nonlinear"] else 1) / features["nb_worker"] ** 0.8
+
+
+def test_cost_model(tmp_path):
+    """Prédiction des temps, LPT meilleur que FIFO, sauvegarde des mesures"""
+    rng = np.random.default_rng(0)
+    cost_model = CostModel()
+    for _ in range(40):
+        features = {"Nt": rng.choice([64, 128, 256]), "Na": 2048, "Zs": rng.choice([48, 72]), "p": 4,
+                    "nb_worker": rng.choice([1, 4]), "is_nonlinear": rng.integers(2), "is_femm": 1}
+        cost_model.add(features, comp_runtime(features) * rng.lognormal(0, 0.05))
+
+    # Extrapolation à une machine plus grande
+    features = {"Nt": 512, "Na": 2048, "Zs": 96, "p": 4, "nb_worker": 4, "is_nonlinear": 1, "is_femm": 1}
+    assert abs(cost_model.predict([features])[0] / comp_runtime(features) - 1) < 0.1
+
+    # Un long calcul en fin de file FIFO laisse les autres coeurs inactifs
+    costs = [1.0] * 12 + [6.0]
+    assert schedule(costs, 4, "fifo")["makespan"] == 9.0
+    assert schedule(costs, 4, "lpt")["makespan"] == 6.0
+
+    path = str(tmp_path / "timings.json")
+    cost_model.save(path)
+    assert len(CostModel.load(path).records) == 40
+
+
+def test_run_schedule():
+    """Campagne exécutée dans l'ordre LPT, temps réels ajoutés au modèle"""
+    cost_model = CostModel()
+    for duration in [0.01, 0.02, 0.04]:
+        cost_model.add({"Nt": duration * 1000}, duration)
+    tasks = [0.01, 0.01, 0.04, 0.01, 0.02]
+    report = run_schedule(tasks, lambda d: time.sleep(d) or d, 2, cost_model, comp_features=lambda d: {"Nt": d * 1000}, executor=ThreadPoolExecutor)
+    assert report["results"] == tasks
+    assert np.allclose(report["predicted"], tasks, rtol=0.05)
+    assert np.all(report["actual"] >= np.array(tasks) * 0.9)
+    assert len(cost_model.records) == 8
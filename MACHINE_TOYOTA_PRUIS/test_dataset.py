@@ -0,0 +1,104 @@
+"""
+Test de l'écriture du jeu de données en shards (util/dataset.py)
+"""
+
+from os.path import join
+
+import numpy as np
+import pytest
+
+from util.dataset import ShardWriter, comp_family, comp_output_sample, comp_split, load_manifest
+
+
+def test_comp_family():
+    """Familles sur les noms réels des fichiers machine du dépôt"""
+    reference = [
+        "Toyota_Prius",
+        "Toyota_Prius_gap_0.50mm",
+        "Toyota_Prius_Rint_+0.5mm",
+        "Toyota_Prius_Rext_-1.0mm",
+        "Toyota_Prius_Rint+2.0mm_Rext-0.5mm",
+        "Toyota_Prius_H0_100p_W0_120p",
+        "Toyota_Prius_Lmag_105p",
+        "Toyota_Prius_Ntcoil_150",
+        "Toyota_Prius_Ntcoil_100_geom_modif",
+        "Toyota_Prius_Zs_36_with_winding",
+        "Toyota_Prius_geo1",
+        "Toyota_Prius_geom1",
+        "Toyota_Prius_geom_def1",
+        "Toyota_Prius_modifiee1",
+        "Toyota_Prius_wind_defect_Ntcoil150p",
+        "Toyota_Prius_defect_magnet_1",
+        "IPMSM_Toyota1_Prius_2004",
+    ]
+    assert {comp_family(name) for name in reference} == {"Toyota_Prius"}
+
+    tesla = [
+        "Tesla_Model3_Reference",
+        "Tesla_Model3_Defaut_Usinage_Moins10_Pourcent",
+        "Tesla_Model3_Defaut_Usinage_Plus2_Pourcent",
+        "Tesla_Model3_Defaut_Excentricite_Dynamique_1deg",
+        "Tesla_Model3_Defaut_Demagnetisation_5_Pourcent",
+        "Tesla_Model3_Saine_Entrefer_Plus0p05mm",
+        "Tesla_Model3_Saine_Spires_Plus1_Tour",
+    ]
+    assert {comp_family(name) for name in tesla} == {"Tesla_Model3"}
+
+    # Conceptions numérotées des lots : saine et défaut d'une même conception ensemble
+    assert comp_family("Toyota_Prius_healthy_10_Ntcoil_7") == comp_family("Toyota_Prius_defect_10_Ntcoil_12")
+    assert comp_family("Toyota_Prius_defect_10_H10W16RH84RW450N7") == "Toyota_Prius_design10"
+    assert comp_family("Toyota_Prius_defect_11_Ntcoil_7") != comp_family("Toyota_Prius_defect_10_Ntcoil_7")
+    assert comp_family("Toyota_Prius_defect_01_H10W22RH81RW318N10") == comp_family("Toyota_Prius_healthy_1_Ntcoil_7")
+    with pytest.raises(Exception):
+        comp_family("Nissan_Leaf")
+
+
+def test_output_sample():
+    """Champs lus dans une sortie SciDataTool (clés = symboles)"""
+    pytest.importorskip("SciDataTool")
+    from test_surrogate import make_output
+
+    sample = comp_output_sample(make_output(p=2, Nt=16, Na=128))
+    assert sample["B_radial"].shape == (16, 128) and sample["Tem"].shape == (16,)
+    assert sample["p"] == 2 and abs(float(sample["Tem"].mean()) - 100) < 1e-4
+
+
+def test_shard_writer(tmp_path):
+    """Familles entières dans un même split, shards de taille fixe, manifeste fusionné"""
+    root = str(tmp_path)
+    rng = np.random.default_rng(0)
+    designs = list(range(1, 21))
+    defects = ["healthy", "winding", "demag"]
+
+    # Deux writers (deux processus) sur le même dossier
+    nb_sample = 0
+    for name in ["node0", "node1"]:
+        with ShardWriter(root, shard_size=16, name=name) as writer:
+            for design in designs[:10] if name == "node0" else designs[10:]:
+                for Ntcoil in [7, 10, 12]:
+                    for defect in (defects if name == "node0" else defects[::-1]):
+                        machine_name = "Toyota_Prius_" + ("healthy" if defect == "healthy" else "defect")
+                        machine_name += "_" + str(design).zfill(2) + "_Ntcoil_" + str(Ntcoil)
+                        sample = {"B_radial": rng.random((8, 64)), "Tem": rng.random(8), "p": np.int32(4)}
+                        split = writer.add(sample, comp_family(machine_name), defect)
+                        assert split == comp_split("Toyota_Prius_design" + str(design))
+                        nb_sample += 1
+
+    manifest = load_manifest(root)
+    assert sum(s["count"] for s in manifest["shards"]) == nb_sample
+    assert all(s["count"] <= 16 for s in manifest["shards"])
+    assert set(manifest["classes"]) == set(defects)
+    assert manifest["fields"]["B_radial"] == {"shape": [8, 64], "dtype": "float64"}
+
+    # Aucune famille partagée entre deux splits
+    groups = {split: set() for split in manifest["splits"]}
+    for shard in manifest["shards"]:
+        groups[shard["split"]].update(shard["groups"])
+    assert not (groups["train"] & groups["test"]) and not (groups["train"] & groups["val"])
+    assert manifest["splits"]["train"]["count"] > manifest["splits"]["test"]["count"] > 0
+
+    # Histogramme des classes cohérent avec les labels stockés (remappés)
+    for shard in manifest["shards"]:
+        labels = np.load(join(root, shard["prefix"] + "_label.npy"), mmap_mode="r")
+        labels = np.asarray(shard["label_map"])[labels]
+        assert np.bincount(labels, minlength=3).tolist() == shard["class_hist"]
@@ -0,0 +1,103 @@
+"""Tests de la démagnétisation par aimant et par segment (util/demagnetization.py)"""
+
+import numpy as np
+
+from ring_machine import make_ring_machine
+from util import fe_solver
+from util.demagnetization import (
+    apply_demag_map,
+    comp_magnet_segments,
+    make_demag_map,
+    random_demag_maps,
+    solve_demag_maps,
+    solve_demag_sweep,
+)
+
+
+def make_problem(type_BH=1):
+    mesh, machine = make_ring_machine()
+    return fe_solver.build_problem(mesh, machine, type_BH_stator=type_BH, type_BH_rotor=type_BH)
+
+
+def test_segments():
+    """Chaque aimant est découpé en nb_seg segments non vides"""
+    problem = make_problem()
+    seg_list, nb_seg = comp_magnet_segments(problem, nb_seg=4)
+
+    assert len(seg_list) == len(problem["magnet_elem"])
+    for elem, seg in zip(problem["magnet_elem"], seg_list):
+        assert len(seg) == len(elem)
+        assert sorted(np.unique(seg)) == list(range(nb_seg))
+
+
+def test_demag_sweep():
+    """Carte saine = balayage de courant, carte uniforme 0.9 = Br à vide * 0.9"""
+    problem = make_problem()
+    segments = comp_magnet_segments(problem, nb_seg=3)
+    angle = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+    theta = np.array([0.0, 0.2])
+    Is = np.array([[40, -20, -20], [10, 30, -40]], dtype=float)
+
+    maps = np.stack([make_demag_map(problem, 3, 1.0), make_demag_map(problem, 3, 0.9)])
+    res = solve_demag_sweep(problem, theta, Is, maps, angle, segments)
+    ref = fe_solver.solve_current_sweep(problem, theta, Is[None], angle)
+    assert res["Tem"].shape == (2, 2) and res["Br"].shape == (2, 2, 64)
+    assert np.allclose(res["Tem"][:, 0], ref["Tem"][:, 0], rtol=1e-6, atol=1e-9)
+    assert np.allclose(res["Br"][:, 0], ref["Br"][:, 0], atol=1e-9)
+
+    no_load = solve_demag_sweep(problem, theta, np.zeros((2, 3)), maps, angle, segments)
+    assert np.allclose(no_load["Br"][:, 1], 0.9 * no_load["Br"][:, 0], atol=1e-9)
+
+
+def test_local_map():
+    """Carte locale (un segment d'un aimant) : superposition comparée au calcul direct"""
+    problem = make_problem()
+    segments = comp_magnet_segments(problem, nb_seg=4)
+    angle = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+    theta = np.array([0.0, 0.1])
+    Is = np.zeros((2, 3))
+
+    remanence = make_demag_map(problem, 4, 0.5, magnet=[0], segment=[0])
+    res = solve_demag_maps(problem, theta, Is, remanence[None], angle, segments, nb_worker=1)
+    ref = fe_solver.solve_steps(apply_demag_map(problem, remanence, segments), theta, Is, angle)
+    assert np.allclose(res["Br"][:, 0], ref["Br"], atol=1e-9)
+    assert np.allclose(res["Phi_wind"][:, 0], ref["Phi_wind"], atol=1e-12)
+
+    # Flux à vide asymétrique : la démagnétisation locale crée des harmoniques d'espace impairs
+    healthy = fe_solver.solve_steps(problem, theta, Is, angle)
+    spectrum = np.abs(np.fft.rfft(ref["Br"][0] - healthy["Br"][0]))
+    assert spectrum[1] > 1e-3 * spectrum[2]
+    print(f"   Harmonique 1 / fondamental du défaut: {spectrum[1] / spectrum[2]:.3f}")
+
+
+def test_random_maps():
+    """Cartes aléatoires : formes, bornes et scénarios"""
+    problem = make_problem()
+    maps, names = random_demag_maps(problem, 50, nb_seg=4, max_loss=0.2, seed=1)
+
+    assert maps.shape == (50, len(problem["magnet_elem"]), 4) and len(names) == 50
+    assert np.all(maps <= 1) and np.all(maps >= 0.8)
+    assert set(names) <= {"uniform", "pole", "magnet", "edge", "local"}
+
+
+def test_local_map_contiguous():
+    """Scénario local : les segments démagnétisés sont voisins, quel que soit l'ordre des éléments du maillage"""
+    mesh, machine = make_ring_machine()
+    perm = np.random.default_rng(0).permutation(len(mesh["tri"]))
+    mesh = dict(mesh, tri=mesh["tri"][perm], label=mesh["label"][perm])
+    problem = fe_solver.build_problem(mesh, machine, type_BH_stator=1, type_BH_rotor=1)
+    seg_list, nb_seg = comp_magnet_segments(problem, nb_seg=4)
+
+    # Angle du centre de chaque segment, dans l'ordre (aimant, segment) des cartes
+    phi = []
+    for elem, seg in zip(problem["magnet_elem"], seg_list):
+        pts = fe_solver._centroid(problem["nodes"], problem["tri"][elem])
+        phi += [np.arctan2(*pts[seg == k].mean(axis=0)[::-1]) % (2 * np.pi) for k in range(nb_seg)]
+    order = np.argsort(phi)
+
+    maps, _ = random_demag_maps(problem, 20, nb_seg=nb_seg, scenarios=["local"], seed=2)
+    for remanence in maps:
+        loss = 1 - remanence.ravel()[order]
+        is_demag = loss > 0.2 * loss.max()
+        # Une seule suite de segments voisins le long de l'entrefer
+        assert np.sum(is_demag != np.roll(is_demag, 1)) == 2
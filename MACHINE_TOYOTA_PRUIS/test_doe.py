@@ -0,0 +1,56 @@
+"""
+Test des plans d'expériences sur la géométrie de la Toyota Prius (util/doe.py)
+"""
+
+import itertools
+
+import numpy as np
+
+from test_clone import make_machine
+from util.doe import comp_changes, iter_machines, sample_design
+
+SPACE = {
+    "stator_Rint": (["stator.Rint"], 0.080, 0.082, False),
+    "Ntcoil": (["stator.winding.Ntcoil"], 5, 12, True),
+    "airgap": ([], 0.0005, 0.00185, False),
+}
+
+
+def make_reference():
+    reference = make_machine()
+    reference.stator.winding.Ntcoil = 9
+    reference.stator.winding.wind_mat = 9 * np.sign(np.random.randn(1, 1, 48, 3))
+    return reference
+
+
+def test_sample_design():
+    """Plan LHS stratifié et plan factoriel produits un par un"""
+    points = list(sample_design(SPACE, 64, "lhs"))
+    assert all(5 <= p["Ntcoil"] <= 12 for p in points)
+    assert len(set(int((p["stator_Rint"] - 0.080) / (0.002 / 64)) for p in points)) == 64  # une valeur par strate
+
+    design = sample_design(SPACE, method="factorial", levels={"stator_Rint": 3, "Ntcoil": 2, "airgap": 4})
+    assert len(list(itertools.islice(design, 100))) == 24
+
+
+def test_comp_changes():
+    """Chemins clone_machine d'un point : nombre de spires dans wind_mat, entrefer par le rayon rotor"""
+    reference = make_reference()
+    changes = comp_changes(reference, {"stator_Rint": 0.081, "Ntcoil": 7, "airgap": 0.001}, SPACE)
+
+    assert changes["stator.Rint"] == 0.081 and changes["stator.winding.Ntcoil"] == 7
+    assert np.isclose(changes["rotor.Rext"], 0.080)
+    assert np.array_equal(changes["stator.winding.wind_mat"], 7 * np.sign(reference.stator.winding.wind_mat))
+
+    # Entrefer seul : rayon intérieur du stator de la référence
+    assert np.isclose(comp_changes(reference, {"airgap": 0.001}, SPACE)["rotor.Rext"], 0.08095 - 0.001)
+
+
+def test_iter_machines():
+    """Machines d'un plan de Sobol construites à la demande à partir d'une machine de référence"""
+    reference = make_reference()
+    for point, machine in iter_machines(sample_design(SPACE, 8, "sobol"), reference, SPACE):
+        assert np.isclose(machine.stator.Rint - machine.rotor.Rext, point["airgap"])
+        assert np.all(np.abs(machine.stator.winding.wind_mat) == point["Ntcoil"])
+        assert machine.stator.mat_type is reference.stator.mat_type
+    assert reference.stator.Rint == 0.08095
@@ -0,0 +1,75 @@
+"""
+Test de la synthèse des courants de défaut par le circuit équivalent (util/electrical_synthesis.py)
+"""
+
+import numpy as np
+
+from util.electrical_synthesis import comp_dq_parameters, comp_fault_waveforms, comp_sequence_currents, comp_turn_ratio
+from util.flux_lut import FluxLUT, comp_park
+
+PARAM = dict(psi_m=0.1, Ld=0.4e-3, Lq=1.0e-3, Rs=0.08, Id=-60.0, Iq=120.0, speed=3000, p=4)
+
+
+def test_dq_parameters():
+    """Flux et inductances retrouvés sur une table linéaire"""
+    Id, Iq = np.linspace(-200, 0, 11), np.linspace(0, 200, 11)
+    grid_d, grid_q = np.meshgrid(Id, Iq, indexing="ij")
+    lut = FluxLUT(Id, Iq, 0.1 + 0.4e-3 * grid_d, 1.0e-3 * grid_q, 0 * grid_d, p=4)
+    assert np.allclose(comp_dq_parameters(lut, -60, 120), (0.1, 0.4e-3, 1.0e-3))
+    assert np.allclose(comp_dq_parameters(lut, 0, 0), (0.1, 0.4e-3, 1.0e-3))
+
+
+def test_turn_ratio():
+    """Spires restantes de chaque phase après un défaut de bobinage"""
+    wind_mat = np.zeros((1, 1, 12, 3))
+    for k in range(12):
+        wind_mat[0, 0, k, k % 3] = 9 * (-1) ** (k // 3)
+    faulty = wind_mat.copy()
+    faulty[0, 0, 0, 0] = 3
+    assert np.allclose(comp_turn_ratio(faulty, wind_mat), [30 / 36, 1, 1])
+
+
+def test_fault_waveforms():
+    """Machine saine : courants (Id, Iq) équilibrés, défaut : courant inverse croissant"""
+    severity = np.linspace(0, 0.5, 6)
+    turn_ratio = np.ones((len(severity), 3))
+    turn_ratio[:, 0] -= severity
+    res = comp_fault_waveforms(turn_ratio=turn_ratio, **PARAM)
+    assert res["Is"].shape == res["Us"].shape == (6, len(res["time"]), 3)
+
+    # Cas sain : régime permanent au point de fonctionnement
+    d, q = comp_park(res["Is"][0], res["theta"])
+    assert np.allclose(d, PARAM["Id"], atol=0.5) and np.allclose(q, PARAM["Iq"], atol=0.5)
+    assert np.allclose(res["Is"].sum(axis=-1), 0, atol=1e-6)  # neutre isolé
+
+    positive, negative = comp_sequence_currents(res["Is"], res["theta"])
+    assert negative[0] < 1e-2 * positive[0]
+    assert np.all(np.diff(negative) > 0)
+
+
+def test_fault_waveforms_lut():
+    """Table linéaire : même résultat que le modèle linéarisé, table saturée : régime sain conservé"""
+    turn_ratio = np.array([[1, 1, 1], [0.7, 1, 1]])
+    short = dict(fs=128 * 200, nb_period=2, nb_period_settle=3)  # 200 Hz électrique
+    Id, Iq = np.linspace(-300, 100, 41), np.linspace(-100, 300, 41)
+    grid_d, grid_q = np.meshgrid(Id, Iq, indexing="ij")
+    linear = FluxLUT(Id, Iq, 0.1 + 0.4e-3 * grid_d, 1.0e-3 * grid_q, 0 * grid_d, p=4)
+    ref = comp_fault_waveforms(turn_ratio=turn_ratio, **short, **PARAM)
+    res = comp_fault_waveforms(turn_ratio=turn_ratio, **short, lut=linear, **PARAM)
+    assert np.allclose(res["Is"], ref["Is"], atol=1e-3) and np.allclose(res["Us"], ref["Us"], atol=1e-3)
+
+    # Saturation de l'axe q et saturation croisée
+    Phi_q = 0.25 * np.tanh(grid_q / 250) * (1 - 2e-4 * np.abs(grid_d))
+    saturated = FluxLUT(Id, Iq, 0.1 + 0.4e-3 * grid_d, Phi_q, 0 * grid_d, p=4)
+    res = comp_fault_waveforms(turn_ratio=turn_ratio, **short, lut=saturated, **PARAM)
+    d, q = comp_park(res["Is"][0], res["theta"])
+    assert np.allclose(d, PARAM["Id"], atol=0.5) and np.allclose(q, PARAM["Iq"], atol=0.5)
+    assert np.allclose(res["Is"].sum(axis=-1), 0, atol=1e-6)
+
+    # Le modèle linéarisé au point sain s'écarte du modèle saturé sur le cas en défaut
+    psi_m, Ld, Lq = comp_dq_parameters(saturated, PARAM["Id"], PARAM["Iq"])
+    lin = comp_fault_waveforms(turn_ratio=turn_ratio, **short, **dict(PARAM, psi_m=psi_m, Ld=Ld, Lq=Lq))
+    negative = comp_sequence_currents(res["Is"], res["theta"])[1][1]
+    negative_lin = comp_sequence_currents(lin["Is"], lin["theta"])[1][1]
+    assert abs(negative - negative_lin) > 0.02 * negative
+    print(f"   Courant inverse : {negative:.2f} A saturé, {negative_lin:.2f} A linéarisé")
@@ -0,0 +1,216 @@
+"""
+Test du solveur éléments finis intégré (util/fe_solver.py)
+Machine à aimants en surface maillée en polaire (ring_machine.py), sans FEMM ni GMSH
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+
+from ring_machine import make_ring_machine
+from util import fe_solver
+
+
+def test_regions():
+    """Identification des aimants (pôles alternés) et des encoches"""
+    mesh, machine = make_ring_machine()
+    problem = fe_solver.build_problem(mesh, machine, type_BH_stator=1, type_BH_rotor=1)
+
+    assert len(problem["magnet_elem"]) == 4
+    assert sorted(problem["magnet_pole"]) == [0, 1, 2, 3]
+    assert sorted(problem["slot_index"]) == list(range(12))
+    print(f"   {len(problem['magnet_elem'])} aimants, {len(problem['slot_elem'])} encoches")
+
+
+def test_pyleecan_labels():
+    """Noms physiques écrits par gmsh_export pour un rotor HoleM50 et un rotor à aimants en surface"""
+    labels = {
+        "Rotor-0_HoleMag_R0-T0-S0": fe_solver.MAGNET,
+        "Rotor-0_HoleMag_R0-T1-S0": fe_solver.MAGNET,
+        "Rotor-0_Magnet_R0-T0-S0": fe_solver.MAGNET,
+        "Rotor-0_HoleVoid_R0-T0-S0": fe_solver.AIR,
+        "Stator-0_Wind_R0-T0-S0": fe_solver.WINDING,
+        "Stator-0_SlotOpening_R0-T0-S0": fe_solver.AIR,
+        "Stator-0_Lamination": fe_solver.IRON_STATOR,
+        "Rotor-0_Lamination": fe_solver.IRON_ROTOR,
+        "Shaft": fe_solver.IRON_ROTOR,
+        "Airgap_Stator": fe_solver.AIR,
+    }
+    radius = {"Rotor": 0.03, "Shaft": 0.005, "Stator": 0.06, "Airgap": 0.0405}
+    nodes, tri = [], []
+    for ii, label in enumerate(labels):
+        r = radius[label.split("-")[0].split("_")[0]]
+        nodes += [[r, 1e-4 * ii], [r + 1e-4, 1e-4 * ii], [r, 1e-4 * (ii + 1)]]
+        tri.append([3 * ii, 3 * ii + 1, 3 * ii + 2])
+    mesh = {"nodes": np.array(nodes), "tri": np.array(tri), "label": np.array(list(labels))}
+
+    kind = fe_solver.classify_elements(mesh, Rgap=0.0405)
+    assert kind.tolist() == list(labels.values())
+
+
+def test_linear_torque():
+    """Couple moyen d'Arkkio comparé à 3/2 * p * psi_m * I (machine linéaire)"""
+    mesh, machine = make_ring_machine()
+    problem = fe_solver.build_problem(mesh, machine, type_BH_stator=1, type_BH_rotor=1)
+    p, I0 = 2, 50
+    theta = np.linspace(0, 2 * np.pi / p, 24, endpoint=False)
+
+    psi = np.array(
+        [fe_solver.comp_flux_linkage(problem, fe_solver.solve_step(problem, t, np.zeros(3))) for t in theta]
+    )
+    psi_1 = np.fft.rfft(psi[:, 0])[1] * 2 / len(theta)
+
+    Tem = []
+    for t in theta:
+        elec = p * t + np.angle(psi_1)
+        Is = np.array([-I0 * np.sin(elec - 2 * np.pi * k / 3) for k in range(3)])
+        Tem.append(fe_solver.solve_step(problem, t, Is)["Tem"])
+
+    expected = 1.5 * p * np.abs(psi_1) * I0
+    print(f"   Couple moyen: {np.mean(Tem):.3f}Nm (attendu {expected:.3f}Nm)")
+    assert abs(np.mean(Tem) - expected) < 0.05 * expected
+
+
+def test_nonlinear_convergence():
+    """Newton sur la courbe B(H) et flux d'entrefer à 2p pôles"""
+    mesh, machine = make_ring_machine()
+    problem = fe_solver.build_problem(mesh, machine, type_BH_stator=0, type_BH_rotor=0)
+    angle = np.linspace(0, 2 * np.pi, 128, endpoint=False)
+
+    res = fe_solver.solve_steps(problem, np.array([0.0, 0.1]), np.zeros((2, 3)), angle)
+    harmonics = np.abs(np.fft.rfft(res["Br"][0])) * 2 / len(angle)
+
+    assert np.all(res["nb_iter"] < 50) and "A" not in res
+    assert np.argmax(harmonics) == 2
+    print(f"   Itérations Newton: {res['nb_iter']}, Br fondamental: {harmonics[2]:.3f}T")
+
+
+def test_rotation_direction():
+    """Bobinage miroir (mmf_dir = -1) : le rotor suit le champ statorique, même couple moyen"""
+    time = np.linspace(0, 0.02, 24, endpoint=False)  # une période électrique à 1500 tr/min
+    mag = fe_solver.MagScipy()
+    Tem = dict()
+    for rot_dir in [1, -1]:
+        mesh, machine = make_ring_machine()
+        if rot_dir == -1:  # phases B et C permutées : le champ tourne en sens inverse
+            machine.stator.winding.wind_mat = machine.stator.winding.wind_mat[..., [0, 2, 1]]
+        machine.stator.comp_mmf_dir = lambda rot_dir=rot_dir: rot_dir
+        problem = fe_solver.build_problem(mesh, machine, type_BH_stator=1, type_BH_rotor=1)
+        simu = SimpleNamespace(
+            machine=machine,
+            input=SimpleNamespace(OP=SimpleNamespace(N0=1500), time=time, angle=np.zeros(1), angle_rotor_initial=0),
+        )
+
+        # Courants directs en phase avec la f.é.m. à vide de chaque machine
+        Phi = mag.solve_input(problem, simu, np.zeros((len(time), 3)))["Phi_wind"][:, 0]
+        alpha = np.angle(np.fft.rfft(Phi)[1])
+        Is = np.array([50 * np.cos(2 * np.pi * 50 * time - 2 * np.pi * k / 3 + alpha + np.pi / 2) for k in range(3)]).T
+        Tem[rot_dir] = mag.solve_input(problem, simu, Is)["Tem"].mean()
+
+    print(f"   Couple moyen: {Tem[1]:.3f}Nm (mmf_dir=1), {Tem[-1]:.3f}Nm (mmf_dir=-1)")
+    # Les diagonales du maillage polaire ne sont pas symétriques : quelques % d'écart
+    assert Tem[1] > 0 and np.isclose(Tem[-1], Tem[1], rtol=0.05)
+
+
+def test_current_sweep():
+    """Superposition (une factorisation LU par position) comparée au calcul direct"""
+    mesh, machine = make_ring_machine()
+    problem = fe_solver.build_problem(mesh, machine, type_BH_stator=1, type_BH_rotor=1)
+    angle = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+    theta = np.array([0.0, 0.2])
+    Is_list = np.array([[[0, 0, 0], [0, 0, 0]], [[40, -20, -20], [10, 30, -40]]], dtype=float)
+
+    res = fe_solver.solve_current_sweep(problem, theta, Is_list, angle)
+    for iop in range(len(Is_list)):
+        ref = fe_solver.solve_steps(problem, theta, Is_list[iop], angle)
+        assert np.allclose(res["Tem"][:, iop], ref["Tem"], rtol=1e-6, atol=1e-9)
+        assert np.allclose(res["Br"][:, iop], ref["Br"], atol=1e-9)
+        assert np.allclose(res["Phi_wind"][:, iop], ref["Phi_wind"], atol=1e-12)
+    print(f"   Couple par point de fonctionnement: {res['Tem'][0]}")
+
+
+def test_warm_start():
+    """Démarrage à chaud : pas précédent puis solution de référence d'une variante proche"""
+    from util.solution_cache import SolutionCache
+
+    angle = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+    theta = np.linspace(0, np.pi / 2, 8, endpoint=False)
+    Is = np.array([[-60 * np.sin(2 * t - 2 * np.pi * k / 3) for k in range(3)] for t in theta])
+
+    mesh, machine = make_ring_machine()
+    problem = fe_solver.build_problem(mesh, machine)
+    cold = [fe_solver.solve_step(problem, t, I)["nb_iter"] for t, I in zip(theta, Is)]
+    ref = fe_solver.solve_steps(problem, theta, Is, angle, is_keep_A=True)
+    assert ref["nb_iter"].sum() <= sum(cold)
+
+    # Variante : autre maillage, aimants légèrement plus forts
+    cache = SolutionCache()
+    cache.add(problem, theta, ref["A"])
+    mesh, machine = make_ring_machine(Nangle=180)
+    machine.rotor.hole[0].magnet_0.mat_type.mag.Brm20 = 1.22
+    problem = fe_solver.build_problem(mesh, machine)
+    A0 = cache.get_initial(problem, theta)
+    warm = fe_solver.solve_steps(problem, theta, Is, angle, A0_list=A0)
+    base = fe_solver.solve_steps(problem, theta, Is, angle)
+
+    assert cache.nb_hit == 1
+    assert warm["nb_iter"].sum() <= base["nb_iter"].sum()
+    assert np.allclose(warm["Tem"], base["Tem"], atol=1e-3 * np.abs(base["Tem"]).max())
+
+    # MagScipy : potentiels gardés par le cache, pas renvoyés
+    res = fe_solver.MagScipy(nb_worker=1, solution_cache=cache).solve(problem, theta, Is, angle)
+    assert "A" not in res and cache.references[-1]["A"].shape == (len(theta), len(problem["nodes"]))
+    print(f"   Itérations : {sum(cold)} à froid, {ref['nb_iter'].sum()} pas précédent, "
+          f"{warm['nb_iter'].sum()} depuis la référence (vs {base['nb_iter'].sum()})")
+
+
+def test_tracing():
+    """Spans imbriqués du solveur et statistiques par étape"""
+    from util import tracing
+
+    mesh, machine = make_ring_machine()
+    tracing.enable_tracing(memory=True)
+    with tracing.span("campagne"):
+        for _ in range(2):
+            problem = fe_solver.build_problem(mesh, machine, type_BH_stator=1, type_BH_rotor=1)
+            fe_solver.MagScipy().solve(problem, np.array([0.0]), np.zeros((1, 3)), np.linspace(0, 1, 8))
+    tracer = tracing.disable_tracing()
+    stats = tracing.comp_stage_stats(tracer.events)
+
+    assert stats["build_problem"]["count"] == 2 and stats["MagScipy.solve"]["count"] == 2
+    assert stats["campagne"]["total_ms"] >= stats["MagScipy.solve"]["total_ms"]
+    assert all(e["args"]["peak_mem_MB"] >= 0 for e in tracer.events)
+    assert not tracing.is_tracing()
+
+
+def test_flux_lut(tmp_path):
+    """Table (Id, Iq) : couple interpolé comparé au calcul direct, MTPA et sauvegarde"""
+    from util.flux_lut import FluxLUT, comp_flux_lut, comp_phase_currents
+
+    mesh, machine = make_ring_machine()
+    problem = fe_solver.build_problem(mesh, machine, type_BH_stator=1, type_BH_rotor=1)
+    lut = comp_flux_lut(problem, 2, np.linspace(-100, 0, 5), np.linspace(0, 100, 5), nb_worker=1)
+
+    # Machine à aimants en surface : Phi_d(0, 0) = psi_m, Phi_q(0, 0) = 0
+    assert abs(lut.Phi_q[-1, 0]) < 1e-6 * lut.Phi_d[-1, 0]
+    assert np.allclose(lut.comp_torque_dq(50, 60), lut.interp(50, 60)[2], rtol=0.02)
+
+    # Point hors grille comparé à une résolution directe (même axe d)
+    theta = np.arange(24) * 2 * np.pi / 48
+    Phi0 = fe_solver.solve_current_sweep(problem, theta, np.zeros((1, 24, 3)), np.zeros(1))["Phi_wind"][:, 0]
+    theta_d = 2 * theta + np.angle(np.fft.rfft(Phi0[:, 0])[1])
+    Is = comp_phase_currents(-30.0, 70.0, theta_d)
+    Tem = fe_solver.solve_current_sweep(problem, theta, Is[None], np.zeros(1))["Tem"].mean()
+    assert abs(lut.interp(-30, 70)[2] - Tem) < 0.01 * Tem
+
+    # MTPA à Id ~ 0 (pas de saillance), vectorisé sur les amplitudes
+    Id, Iq, Tem_mtpa = lut.comp_mtpa(np.linspace(10, 100, 10))
+    assert np.all(np.abs(Id) < 0.05 * Iq) and np.all(np.diff(Tem_mtpa) > 0)
+
+    # Défluxage : au-delà de la vitesse de base, Id < 0 et couple réduit
+    Tem_speed, Id, _ = lut.comp_torque_speed([1000, 5000], I_max=100, U_max=50)
+    assert Tem_speed[1] < Tem_speed[0] and Id[1] < 0
+
+    path = str(tmp_path / "lut.npz")
+    lut.save(path)
+    assert np.allclose(FluxLUT.load(path).interp(-30, 70)[2], lut.interp(-30, 70)[2], rtol=1e-5)
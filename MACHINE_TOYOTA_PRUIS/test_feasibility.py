@@ -0,0 +1,77 @@
+"""
+Test du contrôle de faisabilité géométrique (util/feasibility.py)
+"""
+
+import numpy as np
+
+from util import feasibility
+from util.feasibility import check_machine
+
+
+class Surface:
+    """Rectangle [r0, r1] x [-w/2, w/2] centré sur l'axe x"""
+
+    def __init__(self, r0, r1, w, label="Hole"):
+        self.r0, self.r1, self.w, self.label = r0, r1, w, label
+
+    def discretize(self, nb_point):
+        x = np.linspace(self.r0, self.r1, nb_point)
+        return np.concatenate([x + 1j * self.w / 2, x - 1j * self.w / 2])
+
+    def comp_surface(self):
+        return (self.r1 - self.r0) * self.w
+
+
+class Part:
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def as_dict(self):
+        to_dict = lambda v: v.as_dict() if isinstance(v, Part) else [to_dict(x) for x in v] if isinstance(v, list) else v
+        return {k: to_dict(v) for k, v in vars(self).items()}
+
+
+class Slot(Part):
+    def comp_height(self):
+        return self.H
+
+    def get_surface(self):
+        return Surface(self.Rint, self.Rint + self.H, self.W)
+
+
+class Hole(Part):
+    def build_geometry(self):
+        # Air de part et d'autre de l'aimant, puis aimant
+        return [Surface(self.R0, self.R0 + self.H, self.W - self.Wmag), Surface(self.R0, self.R0 + self.H, self.Wmag, "Magnet")]
+
+
+def make_machine(Rint=0.08095, H=0.03, W=0.008, Wmag=0.005):
+    stator = Part(Rint=Rint, Rext=0.1348, slot=Slot(Zs=48, H=H, W=W, Rint=Rint), winding=None)
+    rotor = Part(Rint=0.0275, Rext=0.0802, L1=0.0835, is_internal=True, hole=[Hole(Zh=8, R0=0.06, H=0.01, W=0.01, Wmag=Wmag)])
+    return Part(stator=stator, rotor=rotor, shaft=Part(Drsh=0.055))
+
+
+def test_feasibility():
+    """Machine de référence faisable, variantes agressives rejetées"""
+    feasibility.clear_cache()
+    result = check_machine(make_machine())
+    assert result["is_feasible"] and result["warnings"] == []
+
+    # Entrefer négatif (Rint-1.0mm)
+    result = check_machine(make_machine(Rint=0.07995))
+    assert not result["is_feasible"] and result["errors"][0].startswith("airgap")
+
+    # Encoches plus profondes que la culasse, et qui se chevauchent
+    result = check_machine(make_machine(H=0.06, W=0.012))
+    assert len(result["errors"]) == 2
+
+    # Aimant plus large que son trou (surface d'air négative)
+    result = check_machine(make_machine(Wmag=0.025))
+    assert any("degenerate surface Hole" in e for e in result["errors"])
+
+    # Les variantes de même géométrie réutilisent le résultat en cache
+    nb_cache = len(feasibility._cache)
+    machine = make_machine()
+    machine.stator.winding = Part(wind_mat=None, Ntcoil=12)  # hors empreinte géométrique
+    assert check_machine(machine)["is_feasible"] and len(feasibility._cache) == nb_cache
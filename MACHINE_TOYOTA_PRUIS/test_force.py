@@ -0,0 +1,74 @@
+"""
+Test des efforts de Maxwell et de l'attraction magnétique déséquilibrée (util/force.py)
+"""
+
+import numpy as np
+
+from util.dataset import ShardWriter
+from util.force import MU0, add_force_fields, comp_force_waves, comp_maxwell_stress, comp_ump
+from util.torch_dataset import Augment, ShardDataset
+
+p, Nt, Na, B0, Rgap, L = 4, 128, 512, 1.0, 0.08, 0.05
+
+
+def comp_field(ecc=0.0, Bt_ratio=0.0, phase=0.0):
+    """Champ tournant sur un tour mécanique, entrefer modulé par une excentricité statique"""
+    t = np.arange(Nt)[:, None] / Nt * 2 * np.pi
+    angle = np.arange(Na)[None, :] / Na * 2 * np.pi
+    Br = B0 * (1 + ecc * np.cos(angle)) * np.cos(p * (angle - t))
+    Bt = Bt_ratio * B0 * np.cos(p * (angle - t) + phase)
+    return Br, Bt
+
+
+def test_ump_and_torque():
+    """Rotor centré : pas d'effort net, excentricité : effort constant vers l'entrefer réduit"""
+    Pr, Pt = comp_maxwell_stress(*comp_field())
+    UMP, Tem = comp_ump(Pr, Pt, Rgap, L)
+    assert UMP.shape == (Nt, 2) and np.allclose(UMP, 0, atol=1e-6)
+
+    fields = np.array([comp_field(ecc) for ecc in [0.0, 0.05, 0.1]])  # (3, 2, Nt, Na)
+    UMP, _ = comp_ump(*comp_maxwell_stress(fields[:, 0], fields[:, 1]), Rgap, L)
+    Fx = Rgap * L * np.pi * np.array([0.0, 0.05, 0.1]) * B0**2 / (2 * MU0)
+    assert np.allclose(UMP[..., 0], Fx[:, None], rtol=1e-6, atol=1e-6)
+    assert np.allclose(UMP[..., 1], 0, atol=1e-6)
+
+    # Couple de la contrainte tangentielle
+    _, Tem = comp_ump(*comp_maxwell_stress(*comp_field(Bt_ratio=0.1, phase=0.5)), Rgap, L)
+    assert np.allclose(Tem, Rgap**2 * L * 2 * np.pi * 0.1 * B0**2 * np.cos(0.5) / (2 * MU0))
+
+
+def test_force_waves():
+    """Onde d'effort d'ordre 2p à la fréquence 2p et composante statique"""
+    Pr, _ = comp_maxwell_stress(*comp_field())
+    waves = comp_force_waves(Pr, nb_freq=16, nb_order=16)
+    assert waves.shape == (16, 33)
+    expected = np.zeros((16, 33))
+    expected[0, 16] = expected[2 * p, 16 + 2 * p] = B0**2 / (4 * MU0)
+    assert np.allclose(waves, expected, atol=1e-6 * B0**2 / MU0)
+
+    # Onde statique cos(r angle) : comptée une fois à l'ordre +r
+    angle = np.arange(Na) / Na * 2 * np.pi
+    waves = comp_force_waves(np.broadcast_to(np.cos(3 * angle), (Nt, Na)))
+    assert np.isclose(waves[0, 16 + 3], 1) and np.isclose(waves.sum(), 1)
+
+
+def test_add_force_fields(tmp_path):
+    """Ajout des champs d'effort à un dataset existant, lus par le dataset mémoire-mappé"""
+    root = str(tmp_path)
+    with ShardWriter(root, shard_size=3, fractions=(1, 0, 0)) as writer:
+        for ii, ecc in enumerate(np.linspace(0, 0.1, 5)):
+            Br, Bt = comp_field(ecc)
+            writer.add({"B_radial": Br, "B_tangential": Bt, "p": np.int32(p)}, "Machine" + str(ii), "eccentricity")
+    assert add_force_fields(root, Rgap, L, batch_size=2) == 5
+
+    dataset = ShardDataset(root, "train", augment=Augment())
+    assert dataset.fields[-2:] == ["force_waves", "UMP"]
+    samples = [dataset[ii] for ii in range(len(dataset))]
+    F = [np.hypot(*sample["UMP"].mean(axis=0)) for sample in samples]
+    assert np.allclose(sorted(F), Rgap * L * np.pi * np.linspace(0, 0.1, 5) * B0**2 / (2 * MU0), rtol=1e-4, atol=1e-2)
+
+    # Rotation et décalage temporel : l'effort augmenté est celui du champ augmenté
+    for sample in samples:
+        UMP, _ = comp_ump(*comp_maxwell_stress(sample["B_radial"], sample["B_tangential"]), Rgap, L)
+        assert np.allclose(sample["UMP"], UMP, rtol=1e-4, atol=1e-2)
+    assert any(np.abs(sample["UMP"][:, 1].mean()) > 1 for sample in samples)
@@ -0,0 +1,104 @@
+"""
+Test des pertes fer (Bertotti) et cuivre vectorisées (util/losses.py)
+"""
+
+import json
+from os.path import dirname, join
+from types import SimpleNamespace
+
+import numpy as np
+
+from util import fe_solver
+from util.losses import (
+    LOSS_COEFS,
+    LOSS_COEFS_M400_50A,
+    comp_batch_losses,
+    comp_copper_loss,
+    comp_iron_loss_density,
+    comp_material_loss_coefs,
+    comp_mesh_iron_loss,
+    comp_stator_flux,
+)
+
+GEOMETRY = dict(Rgap=0.081, L=0.05, Zs=48, w_tooth=0.005, h_tooth=0.03, h_yoke=0.02)
+
+
+def test_iron_loss_density():
+    """Induction sinusoïdale 1 T, 50 Hz : densités de Bertotti analytiques"""
+    t = np.arange(64) / 64 / 50
+    B = np.stack([np.sin(2 * np.pi * 50 * t), 1.5 * np.cos(2 * np.pi * 50 * t)], axis=-1)  # (Nt, E=2)
+    density = comp_iron_loss_density(B, period=1 / 50)
+    amplitude = np.array([1.0, 1.5])
+    assert np.allclose(density["hysteresis"], LOSS_COEFS["kh"] * 50 * amplitude**2)
+    assert np.allclose(density["eddy"], LOSS_COEFS["kc"] * (50 * amplitude) ** 2)
+    assert np.allclose(density["excess"], LOSS_COEFS["ke"] * (50 * amplitude) ** 1.5)
+
+    # Troisième harmonique : pertes par courants de Foucault 9 fois plus grandes
+    B3 = np.sin(2 * np.pi * 150 * t)[:, None]
+    assert np.isclose(comp_iron_loss_density(B3, period=1 / 50)["eddy"][0], 9 * density["eddy"][0])
+
+
+def test_material_loss_coefs():
+    """Coefficients M400-50A (tôle de toutes les machines) ajustés sur les LossData du matériau pyleecan"""
+    with open(join(dirname(__file__), "machines_custom2", "ntcoil_90", "M400-50A.json")) as f:
+        data = json.load(f)
+    f, B, p = np.array(data["mag"]["LossData"]["value"])
+    mat = SimpleNamespace(
+        mag=SimpleNamespace(LossData=SimpleNamespace(get_data=lambda: np.array([f, B, p]))),
+        struct=SimpleNamespace(rho=data["struct"]["rho"]),
+    )
+    coefs = comp_material_loss_coefs(mat)
+    for key in ["kh", "kc", "ke", "rho"]:
+        assert np.isclose(coefs[key], LOSS_COEFS_M400_50A[key], rtol=5e-3)
+    assert LOSS_COEFS is LOSS_COEFS_M400_50A
+
+    # Densités par défaut sur les mesures : 50 Hz - 2.5 kHz, 0.1 - 1.8 T
+    t = np.arange(64) / 64
+    predicted = np.array(
+        [sum(comp_iron_loss_density(b * np.sin(2 * np.pi * t)[:, None], period=1 / fk).values())[0] for fk, b in zip(f, B)]
+    )
+    assert np.sqrt(np.mean((predicted / p - 1) ** 2)) < 0.15 and np.all(np.abs(predicted / p - 1) < 0.35)
+
+    # Matériau sans données de pertes (ImportMatrix vide) : coefficients M400-50A
+    empty = SimpleNamespace(mag=SimpleNamespace(LossData=None), struct=SimpleNamespace(rho=7650.0))
+    assert comp_material_loss_coefs(empty) == LOSS_COEFS_M400_50A
+
+
+def test_stator_flux_and_batch():
+    """Flux des dents et de la culasse, pertes d'un lot de simulations"""
+    p, Nt, Na = 4, 128, 2048
+    t = np.arange(Nt)[:, None] / Nt * 2 * np.pi
+    angle = np.arange(Na)[None, :] / Na * 2 * np.pi
+    Br = np.cos(p * (angle - t))
+    B_tooth, B_yoke = comp_stator_flux(Br, GEOMETRY["Rgap"], GEOMETRY["Zs"], GEOMETRY["w_tooth"], GEOMETRY["h_yoke"])
+    assert B_tooth.shape == (Nt, 48) and B_yoke.shape == (Nt, Na)
+    assert np.isclose(B_yoke.max(), GEOMETRY["Rgap"] / (p * GEOMETRY["h_yoke"]), rtol=1e-3)
+    pitch = 2 * np.pi / 48
+    assert np.isclose(B_tooth[0, 0], GEOMETRY["Rgap"] * pitch * np.sinc(p * pitch / 2 / np.pi) / GEOMETRY["w_tooth"], rtol=1e-3)
+
+    # Lot : induction doublée -> hystérésis et Foucault x4, cuivre indépendant du champ
+    Is = 100 * np.cos(p * t - 2 * np.pi * np.arange(3)[None, :] / 3)
+    losses = comp_batch_losses(np.stack([Br, 2 * Br]), np.stack([Is, Is]), period=60 / 3000, R=[0.1, 0.2], **GEOMETRY)
+    assert losses["total"].shape == (2,)
+    assert np.isclose(losses["hysteresis"][1], 4 * losses["hysteresis"][0])
+    assert np.isclose(losses["eddy"][1], 4 * losses["eddy"][0])
+    assert np.allclose(losses["copper"], [3 / 2 * 100**2 * 0.1, 3 / 2 * 100**2 * 0.2])
+    assert np.allclose(losses["total"], losses["iron"] + losses["copper"])
+    assert np.isclose(comp_copper_loss(Is, [0.1, 0.1, 0.3]), 100**2 / 2 * 0.5)
+
+
+def test_mesh_iron_loss():
+    """Pertes calculées sur le maillage : surtout au stator, proportionnelles à B^2 en linéaire"""
+    from ring_machine import make_ring_machine
+
+    mesh, machine = make_ring_machine()
+    problem = fe_solver.build_problem(mesh, machine, type_BH_stator=1, type_BH_rotor=1)
+    theta = np.arange(32) * 2 * np.pi / 32
+    res = fe_solver.solve_steps(problem, theta, np.zeros((32, 3)), np.zeros(1), is_keep_A=True)
+    stator = comp_mesh_iron_loss(problem, res["A"], period=0.02, kinds=[fe_solver.IRON_STATOR])
+    rotor = comp_mesh_iron_loss(problem, res["A"], period=0.02, kinds=[fe_solver.IRON_ROTOR])
+    assert stator["hysteresis"] > 0 and rotor["hysteresis"] < 0.1 * stator["hysteresis"]
+    # Le rotor voit les harmoniques d'encoches à haute fréquence : Foucault plus marqué
+    assert sum(rotor.values()) < 0.2 * sum(stator.values())
+    double = comp_mesh_iron_loss(problem, 2 * res["A"], period=0.02, kinds=[fe_solver.IRON_STATOR])
+    assert np.isclose(double["eddy"], 4 * stator["eddy"])
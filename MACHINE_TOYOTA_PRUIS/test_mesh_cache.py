@@ -0,0 +1,149 @@
+"""
+Test du cache de maillages par empreinte géométrique (util/mesh_cache.py)
+Variantes JSON réelles de la Toyota Prius, lues par pyleecan s'il est installé, sinon en dict
+"""
+
+import copy
+import json
+from os import listdir
+from os.path import join
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from ring_machine import make_ring_machine
+from util import simulation
+from util.mesh_cache import MeshCache, comp_geometry_fingerprint
+
+BASE = join("machines_ntcoil_variation", "Toyota_Prius_Ntcoil_100p.json")
+
+
+class DictMachine:
+    """Machine JSON sans pyleecan : as_dict et le bobinage utilisés par l'empreinte"""
+
+    def __init__(self, machine_dict):
+        self.machine_dict = machine_dict
+        wind_mat = np.array(machine_dict["stator"]["winding"]["wind_mat"])
+        self.stator = SimpleNamespace(winding=SimpleNamespace(wind_mat=wind_mat))
+
+    def as_dict(self):
+        return copy.deepcopy(self.machine_dict)
+
+
+def load_variant(tmp_path, path, edit=None):
+    """Machine du fichier path, modifiée par edit(dict) avant la lecture"""
+    with open(path) as f:
+        machine_dict = json.load(f)
+    if edit is not None:
+        edit(machine_dict)
+    try:
+        from pyleecan.Functions.load import load
+    except ImportError:
+        return DictMachine(machine_dict)
+    variant_path = str(tmp_path / "variant.json")
+    with open(variant_path, "w") as f:
+        json.dump(machine_dict, f)
+    return load(variant_path)
+
+
+def scale_Brm20(machine_dict):
+    for name in ["magnet_0", "magnet_1"]:
+        machine_dict["rotor"]["hole"][0][name]["mat_type"]["mag"]["Brm20"] *= 0.9
+
+
+def add_wedge(machine_dict, mat=None):
+    mat = machine_dict["stator"]["mat_type"] if mat is None else mat
+    machine_dict["stator"]["slot"]["wedge_mat"] = copy.deepcopy(mat)
+
+
+def test_fingerprint_same_geometry(tmp_path):
+    """Variantes de bobinage, d'aimantation ou de longueur d'aimant : même empreinte"""
+    key = comp_geometry_fingerprint(load_variant(tmp_path, BASE))
+    variants = [
+        load_variant(tmp_path, join("machines_ntcoil_variation", "Toyota_Prius_Ntcoil_150p.json")),
+        load_variant(tmp_path, join("machines_defect", "Toyota_Prius_wind_defect_Ntcoil150p.json")),
+        load_variant(tmp_path, join("machines_magnet_height", "Toyota_Prius_Lmag_105p.json")),
+        load_variant(tmp_path, BASE, scale_Brm20),
+    ]
+    for machine in variants:
+        assert comp_geometry_fingerprint(machine) == key
+
+
+def test_fingerprint_geometry_change(tmp_path):
+    """Entrefer, rayon intérieur, encoche, trou d'aimant ou cale : empreintes différentes"""
+    keys = [comp_geometry_fingerprint(load_variant(tmp_path, BASE))]
+    variants = [
+        load_variant(tmp_path, "Toyota_Prius_gap_0.80mm.json"),
+        load_variant(tmp_path, BASE, lambda d: d["rotor"].update(Rint=0.05)),
+        load_variant(tmp_path, BASE, lambda d: d["stator"]["slot"].update(W0=0.0025)),
+        load_variant(tmp_path, join("machines_magnet_hole_variation", "Toyota_Prius_H0_100p_W0_120p.json")),
+        load_variant(tmp_path, BASE, add_wedge),
+    ]
+    keys += [comp_geometry_fingerprint(machine) for machine in variants]
+    assert len(set(keys)) == len(keys)
+
+    # Seule la présence de la cale compte, pas son matériau
+    machine = load_variant(tmp_path, BASE, lambda d: add_wedge(d, d["stator"]["winding"]["conductor"]["ins_mat"]))
+    assert comp_geometry_fingerprint(machine) == keys[-1]
+
+
+def write_ring_msh(path):
+    """Maillage .msh (format GMSH 2.2) de la machine annulaire, à la place de gmsh_export"""
+    import meshio
+
+    mesh, _ = make_ring_machine(Nangle=48)
+    names = sorted(set(mesh["label"]))
+    tag = np.array([names.index(name) + 1 for name in mesh["label"]])
+    points = np.column_stack([mesh["nodes"], np.zeros(len(mesh["nodes"]))])
+    msh = meshio.Mesh(
+        points,
+        [("triangle", mesh["tri"])],
+        cell_data={"gmsh:physical": [tag], "gmsh:geometrical": [tag]},
+        field_data={name: np.array([ii + 1, 2]) for ii, name in enumerate(names)},
+    )
+    meshio.write(path, msh, file_format="gmsh22", binary=False)
+
+
+def make_output(machine, T_mag):
+    return SimpleNamespace(simu=SimpleNamespace(machine=machine, mag=SimpleNamespace(T_mag=T_mag)))
+
+
+def test_mesh_cache(tmp_path, monkeypatch):
+    """Un seul maillage pour deux températures d'aimant, relu depuis le dossier par un autre cache"""
+    pytest.importorskip("meshio")
+    drawn = []
+
+    def gmsh_export(out=None, path_save="out.msh"):
+        drawn.append(path_save)
+        write_ring_msh(path_save)
+
+    monkeypatch.setattr(simulation, "gmsh_export", gmsh_export)
+    machine = load_variant(tmp_path, BASE)
+    cache_dir = str(tmp_path / "meshes")
+
+    cache = MeshCache(cache_dir)
+    mesh = cache.get_mesh(make_output(machine, T_mag=20))
+    assert (cache.nb_miss, cache.nb_hit) == (1, 0) and len(drawn) == 1
+    assert cache.get_mesh(make_output(machine, T_mag=120)) is mesh
+    assert (cache.nb_miss, cache.nb_hit) == (1, 1)
+    assert listdir(cache_dir) == [comp_geometry_fingerprint(machine) + ".msh"]
+
+    other = MeshCache(cache_dir)
+    assert len(other.get_mesh(make_output(machine, T_mag=60))["tri"]) == len(mesh["tri"])
+    assert (other.nb_miss, other.nb_hit) == (0, 1) and len(drawn) == 1
+
+
+def test_atomic_draw(tmp_path, monkeypatch):
+    """Un maillage interrompu ne laisse aucun fichier dans le cache"""
+
+    def gmsh_export(out=None, path_save="out.msh"):
+        with open(path_save, "w") as f:
+            f.write("$MeshFormat\n2.2 0 8\n")
+        raise Exception("GMSH interrompu")
+
+    monkeypatch.setattr(simulation, "gmsh_export", gmsh_export)
+    cache = MeshCache(str(tmp_path / "meshes"))
+    with pytest.raises(Exception, match="GMSH interrompu"):
+        cache.get_mesh(make_output(load_variant(tmp_path, BASE), T_mag=20))
+    assert listdir(cache.cache_dir) == [] and cache.meshes == dict()
@@ -0,0 +1,76 @@
+"""
+Test de la synthèse de signaux longs à partir d'une solution périodique (util/signal_synthesis.py)
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from util.signal_synthesis import PeriodicSignal
+
+p, Nt, Na = 4, 128, 16
+
+
+def comp_torque(angle, I0=1.0):
+    """Couple sur un tour mécanique : valeur moyenne, ondulation d'ordre 6p et excentricité d'ordre 1"""
+    return I0 * (100 + 5 * np.cos(6 * p * angle + 0.3)) + 2 * np.sin(angle)
+
+
+def test_constant_speed():
+    """À vitesse constante, le signal long suit la position du rotor"""
+    angle = np.arange(Nt) * 2 * np.pi / Nt
+    signal = PeriodicSignal(comp_torque(angle))
+    time, Tem = signal.synthesize(fs=20e3, duration=0.5, speed=1500)
+    assert Tem.shape == time.shape == (10000,)
+    assert np.allclose(Tem, comp_torque(2 * np.pi * 1500 / 60 * time))
+
+    # Champ B(t, angle) : une colonne par point d'entrefer
+    B = np.cos(p * (np.arange(Na)[None, :] * 2 * np.pi / Na - angle[:, None]))
+    time, B_long = PeriodicSignal(B).synthesize(fs=10e3, duration=0.1, speed=3000)
+    assert B_long.shape == (1000, Na)
+    assert np.allclose(B_long[:, 0], np.cos(p * 2 * np.pi * 50 * time))
+
+
+def test_speed_profile_chunks(tmp_path):
+    """Rampe de vitesse : phase continue entre les blocs, fichier .npy identique"""
+    angle = np.arange(Nt) * 2 * np.pi / Nt
+    signal = PeriodicSignal(comp_torque(angle))
+    speed = lambda t: 500 + 2000 * t
+    _, ref = signal.synthesize(fs=20e3, duration=1, speed=speed, chunk_size=20000)
+    time, Tem = signal.synthesize(fs=20e3, duration=1, speed=speed, chunk_size=777)
+    assert np.allclose(Tem, ref)
+    angle_exact = 2 * np.pi / 60 * (500 * time + 1000 * time**2)
+    assert np.allclose(Tem, comp_torque(angle_exact), atol=1e-3)
+
+    path = signal.write_npy(str(tmp_path / "Tem.npy"), fs=20e3, duration=1, speed=speed, chunk_size=777)
+    assert np.allclose(np.load(path, mmap_mode="r"), ref, rtol=1e-6)
+
+
+def test_load_and_noise():
+    """Changement de charge interpolé entre les solutions, bruit relatif au RMS"""
+    angle = np.arange(Nt) * 2 * np.pi / Nt
+    signal = PeriodicSignal([comp_torque(angle, 0.5), comp_torque(angle, 1.0)], load_levels=[0.5, 1.0])
+    load = lambda t: np.where(t < 0.1, 0.5, 0.75)
+    time, Tem = signal.synthesize(fs=20e3, duration=0.2, speed=1500, load=load)
+    assert np.allclose(Tem, comp_torque(2 * np.pi * 25 * time, load(time)))
+
+    _, noisy = signal.synthesize(fs=20e3, duration=0.2, speed=1500, load=load, noise_std=0.01, seed=1)
+    assert np.isclose(np.std(noisy - Tem), 0.01 * signal.rms, rtol=0.05)
+
+
+def test_from_output():
+    """Solution lue dans une sortie SciDataTool réelle (store_output, clés = symboles)"""
+    pytest.importorskip("SciDataTool")
+    from util.fe_solver import store_output
+
+    angle = np.arange(Nt) * 2 * np.pi / Nt
+    time = angle / (2 * np.pi * 25)  # un tour à 1500 tr/min
+    angle_gap = np.arange(Na) * 2 * np.pi / Na
+    Br = np.cos(p * (angle_gap[None, :] - angle[:, None]))
+    output = store_output(SimpleNamespace(mag=SimpleNamespace()), time, angle_gap, Br, 0 * Br, comp_torque(angle))
+
+    time, Tem = PeriodicSignal.from_output(output).synthesize(fs=20e3, duration=0.1, speed=1500)
+    assert np.allclose(Tem, comp_torque(2 * np.pi * 25 * time))
+    _, B_long = PeriodicSignal.from_output(output, field="B_radial").synthesize(fs=20e3, duration=0.1, speed=1500)
+    assert B_long.shape == (2000, Na) and np.allclose(B_long[:, 0], np.cos(p * 2 * np.pi * 25 * time))
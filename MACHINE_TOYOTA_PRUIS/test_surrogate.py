@@ -0,0 +1,96 @@
+"""
+Test du modèle de substitution (util/surrogate.py) sur une réponse analytique
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from util.surrogate import SurrogateModel, comp_output_targets
+
+
+def make_output(p=2, Nt=16, Na=128):
+    """Sortie stockée comme MagScipy (SciDataTool réel) : Br d'ordre p, couple ondulé"""
+    from util.fe_solver import store_output
+
+    time = np.linspace(0, 0.01, Nt, endpoint=False)
+    angle = np.linspace(0, 2 * np.pi, Na, endpoint=False)
+    phase = p * angle[None, :] - 2 * np.pi * 100 * time[:, None]
+    machine = SimpleNamespace(stator=SimpleNamespace(winding=SimpleNamespace(p=p)))
+    output = SimpleNamespace(mag=SimpleNamespace(), simu=SimpleNamespace(machine=machine))
+    Tem = 100 + 5 * np.cos(2 * np.pi * 600 * time)
+    return store_output(output, time, angle, 0.9 * np.cos(phase), 0.1 * np.sin(phase), Tem)
+
+
+def test_surrogate_uncertainty():
+    """Prédiction dans le domaine d'apprentissage, incertitude infinie en dehors"""
+    rng = np.random.default_rng(0)
+    surrogate = SurrogateModel(n_estimators=50, threshold=0.2)
+    for gap, Ntcoil in zip(rng.uniform(0.5e-3, 1.85e-3, 60), rng.integers(40, 150, 60)):
+        features = {"gap": gap, "Ntcoil": Ntcoil}
+        targets = {"Tem_mean": Ntcoil / (gap * 1e3), "Br_h4": 1 / (1 + gap * 1e3)}
+        surrogate.add(features, targets)
+    surrogate.fit()
+
+    queries = [{"gap": 1e-3, "Ntcoil": 100}, {"gap": 3e-3, "Ntcoil": 100}]
+    mean, std = surrogate.predict(queries)
+    uncertainty = surrogate.comp_uncertainty(queries, std)
+
+    assert abs(mean[0, surrogate.target_names.index("Tem_mean")] - 100) < 15
+    assert np.isfinite(uncertainty[0]) and np.isinf(uncertainty[1])
+    print(f"   Incertitude relative : {uncertainty}")
+
+
+def test_output_targets():
+    """Cibles lues dans une sortie SciDataTool (clés = symboles T_{em}, B_{rad}, B_{circ})"""
+    pytest.importorskip("SciDataTool")
+    targets = comp_output_targets(make_output())
+
+    assert abs(targets["Tem_mean"] - 100) < 1e-9 and abs(targets["Tem_ripple"] - 0.1) < 1e-9
+    assert abs(targets["Br_h2"] - 0.9) < 1e-9 and abs(targets["Bt_h2"] - 0.1) < 1e-9
+    assert abs(targets["Br_h6"]) < 1e-9
+
+
+def test_active_learning():
+    """Les simulations se concentrent là où la réponse varie vite"""
+    from util.active_learning import ActiveLearningSampler
+
+    candidates = [{"gap": gap} for gap in np.linspace(0, 1, 201)]
+    sampler = ActiveLearningSampler(
+        candidates,
+        simulate=lambda c: c,  # la « simulation » renvoie directement les paramètres
+        comp_targets=lambda c: {"Tem_mean": np.tanh((c["gap"] - 0.7) * 40)},
+        nb_init=5,
+    )
+    history = sampler.run(budget=25, batch_size=3)
+    gap = np.array([candidates[ii]["gap"] for ii, _ in history])
+
+    assert len(history) == 25 and len(set(ii for ii, _ in history)) == 25
+    assert np.sum(np.abs(gap - 0.7) < 0.1) > 2 * 25 * 0.2  # grille uniforme : 20% des points
+    print(f"   {np.sum(np.abs(gap - 0.7) < 0.1)} simulations sur 25 dans la zone de transition")
+
+
+def test_infeasible_candidates():
+    """Une machine infaisable (sortie None) est notée, pas simulée, et n'arrête pas la campagne"""
+    from util.active_learning import ActiveLearningSampler
+
+    candidates = [{"gap": gap} for gap in np.linspace(0, 1, 51)]
+    sampler = ActiveLearningSampler(
+        candidates,
+        simulate=lambda c: None if c["gap"] < 0.2 else c,  # entrefer trop petit : check_machine échoue
+        comp_targets=lambda c: {"Tem_mean": c["gap"] ** 2},
+        nb_init=5,
+    )
+    history = sampler.run(budget=15, batch_size=3)
+
+    assert len(history) == 15 and len(sampler.infeasible) > 0
+    assert all(candidates[ii]["gap"] < 0.2 for ii in sampler.infeasible)
+    assert not set(sampler.infeasible) & set(ii for ii, _ in history)
+
+    winding = SimpleNamespace(p=4, Ntcoil=9, Npcp=1, wind_mat=None)
+    stator = SimpleNamespace(Rint=0.08, Rext=0.13, L1=0.08, get_Zs=lambda: 48, winding=winding)
+    machine = SimpleNamespace(stator=stator, rotor=SimpleNamespace(Rint=0.03, Rext=0.08, hole=[]))
+    surrogate = SurrogateModel(simulate=lambda m: None)
+    res = surrogate.query(machine)
+    assert res["source"] == "infeasible" and surrogate.nb_infeasible == 1 and len(surrogate.X) == 0
@@ -0,0 +1,57 @@
+"""
+Test du groupe de symétrie et de la multiplication des échantillons (util/symmetry.py)
+"""
+
+import numpy as np
+
+from util.symmetry import comp_symmetry_group, expand_sample, roll_angle
+
+
+def make_wind_mat(Zs=48, p=4, Ntcoil=9):
+    """Bobinage réparti q=2 du Toyota Prius : A A -C -C B B -A -A C C -B -B ..."""
+    pattern = [(0, 1), (0, 1), (2, -1), (2, -1), (1, 1), (1, 1), (0, -1), (0, -1), (2, 1), (2, 1), (1, -1), (1, -1)]
+    wind_mat = np.zeros((1, 1, Zs, 3))
+    for k in range(Zs):
+        phase, sign = pattern[k % 12]
+        wind_mat[0, 0, k, phase] = sign * Ntcoil
+    return wind_mat
+
+
+def comp_field(slot, Zs=48, p=4, Nt=16, Na=2048):
+    """Champ d'entrefer avec une perturbation locale au droit de l'encoche en défaut"""
+    t = np.arange(Nt)[:, None] / Nt * 2 * np.pi / p
+    angle = np.linspace(0, 2 * np.pi, Na, endpoint=False)[None, :]
+    bump = np.exp(-((np.angle(np.exp(1j * (angle - 2 * np.pi * slot / Zs)))) ** 2) / 0.01)
+    return (1 + 0.2 * bump) * np.cos(p * (angle - t))
+
+
+def test_symmetry_group():
+    """Prius : 8 rotations, un pas polaire (6 encoches) inverse le champ"""
+    wind_mat = make_wind_mat()
+    group = comp_symmetry_group(wind_mat, Zh=8)
+    assert group == [(6 * k, (-1) ** k) for k in range(8)]
+    # Sans aimants alternés, seules les paires de pôles restent
+    assert len(comp_symmetry_group(wind_mat, Zh=8, is_antiper_rotor=False)) == 4
+    # Un bobinage en défaut casse la symétrie
+    wind_mat[0, 0, 3, 2] = -4
+    assert comp_symmetry_group(wind_mat, Zh=8) == [(0, 1)]
+
+
+def test_expand_sample():
+    """Échantillons équivalents identiques aux résultats simulés à chaque position"""
+    group = comp_symmetry_group(make_wind_mat(), Zh=8)
+    sample = {"B_radial": comp_field(3), "Tem": np.ones(16)}
+    expanded = expand_sample(sample, {"slot": 3, "Ntcoil_fault": 4}, group, Zs=48)
+    assert [d["slot"] for _, d in expanded] == [3, 9, 15, 21, 27, 33, 39, 45]
+    for moved, defect in expanded:
+        assert np.allclose(moved["B_radial"], comp_field(defect["slot"]), atol=1e-9)
+        assert defect["Ntcoil_fault"] == 4 and moved["Tem"] is sample["Tem"]
+
+    # Angle de l'excentricité décalé de 45°, le champ original exclu
+    expanded = expand_sample(sample, {"angle_deg": 10.0}, group, Zs=48, is_identity=False)
+    assert [d["angle_deg"] for _, d in expanded] == [55.0, 100.0, 145.0, 190.0, 235.0, 280.0, 325.0]
+
+    # Décalage d'une encoche (2048/48 points non entier) par déphasage de Fourier
+    angle = np.linspace(0, 2 * np.pi, 2048, endpoint=False)
+    field = lambda a: np.cos(4 * a) + 0.3 * np.cos(7 * a + 1)
+    assert np.allclose(roll_angle(field(angle), 1, 48), field(angle - 2 * np.pi / 48), atol=1e-9)
@@ -0,0 +1,64 @@
+"""
+Test du réseau thermique nodal et des cas de défauts thermiques (util/thermal_network.py)
+"""
+
+import numpy as np
+
+from util.thermal_network import GEOMETRIES, ThermalNetwork, solve_defect_cases
+
+from test_symmetry import make_wind_mat
+
+
+def make_network():
+    network = ThermalNetwork(GEOMETRIES["Toyota_Prius"])
+    P = network.comp_node_losses(copper=1500, tooth=300, yoke=400, rotor=50, magnet=30)
+    return network, P
+
+
+def test_steady_state():
+    """Bilan d'énergie et résolution par lot identique aux résolutions séparées"""
+    network, P = make_network()
+    T = network.solve_steady(P)
+    G_cool = network.boundary["G"].sum()
+    assert np.isclose(G_cool * (T[0, network.node("housing")] - network.params["T_cool"]), P.sum())
+    k = np.arange(network.nb_sector)
+    assert np.all(T[0, network.node("winding", k)] > T[0, network.node("yoke", k)])
+
+    scale = np.array([1.0, 0.5, 2.0])
+    edge_scale, boundary_scale = network.comp_edge_scale(3, cooling=scale)
+    T_batch = network.solve_steady(P * scale[:, None], edge_scale, boundary_scale)
+    for ii in range(3):
+        one = network.solve_steady(P * scale[ii], edge_scale[ii : ii + 1], boundary_scale[ii : ii + 1])
+        assert np.allclose(T_batch[ii], one[0])
+
+
+def test_defect_cases():
+    """Point chaud local, refroidissement dégradé et surcharge transitoire"""
+    network, P = make_network()
+    defects = [
+        {"defect_type": "thermal_gradient"},
+        {"defect_type": "hotspot", "temp_increase": 40, "area_affected": 0.05, "position": {"radial_pos": 0.72, "axial_pos": 0.5, "angular_pos": 0.0}},
+        {"defect_type": "cooling_failure", "efficiency_reduction": 0.6, "components_affected": ["stator"]},
+        {"defect_type": "overload", "current_increase": 1.5, "duration": 600},
+        {"defect_type": "overload", "current_increase": 1.5, "duration": 1e6},
+    ]
+    T = solve_defect_cases(network, defects, P)
+    inputs = network.comp_em_inputs(T, wind_mat=make_wind_mat(), R20=0.077)
+    healthy = network.solve_steady(P)[0]
+    assert np.allclose(T[0], healthy)
+
+    # Point chaud dans le bobinage autour de l'angle 0, pas à l'opposé
+    winding = T[1, network.node("winding", np.arange(48))] - healthy[network.node("winding", np.arange(48))]
+    assert winding[0] > 20 and winding[24] < 0.2 * winding[0]
+
+    assert np.all(T[2] > healthy)
+    # Surcharge : 600 s entre l'état initial et le régime permanent atteint en temps long
+    steady = network.solve_steady(network.comp_node_losses(copper=1500 * 1.5**2, tooth=300, yoke=400, rotor=50, magnet=30))[0]
+    assert healthy.max() < T[3].max() < steady.max()
+    assert np.allclose(T[4], steady, atol=0.5)
+
+    # Entrées des simulations magnétiques : T_mag, température et résistance par phase
+    assert inputs["T_mag"].shape == (5,) and inputs["R"].shape == (5, 3)
+    assert np.allclose(inputs["T_phase"][0], inputs["T_winding"][0])
+    assert np.all(inputs["R"][2] > inputs["R"][0]) and np.all(inputs["R"][0] > 0.077)
+    assert np.argmax(inputs["T_phase"][1] - inputs["T_phase"][0]) == 0  # encoche 0 : phase A
@@ -0,0 +1,50 @@
+"""
+Test du dataset mémoire-mappé et des augmentations (util/torch_dataset.py)
+"""
+
+import numpy as np
+
+from util.dataset import ShardWriter
+from util.torch_dataset import Augment, ShardDataset
+
+
+def make_sample(p, phase):
+    """Champ tournant B(t, angle) sur un tour mécanique (32*p pas)"""
+    t = np.arange(32 * p) / (32 * p) * 2 * np.pi
+    angle = np.linspace(0, 2 * np.pi, 256, endpoint=False)
+    B = np.cos(p * (angle[None, :] - t[:, None]) + phase)
+    Tem = 100 + np.cos(6 * p * t + phase)
+    return {"B_radial": B, "Tem": Tem, "p": np.int32(p)}
+
+
+def test_shard_dataset(tmp_path):
+    """Lecture par memmap, augmentations sans effet sur un champ idéal"""
+    root = str(tmp_path)
+    with ShardWriter(root, shard_size=5, fractions=(1, 0, 0)) as writer:
+        for ii in range(12):
+            writer.add(make_sample(4, 0.1 * ii), "Machine" + str(ii % 3), ["healthy", "demag"][ii % 2])
+
+    dataset = ShardDataset(root, "train")
+    assert len(dataset) == 12 and len(dataset.shards) == 3
+    sample = dataset[7]
+    assert sample["B_radial"].dtype == np.float32 and sample["B_radial"].shape == (128, 256)
+    assert dataset.classes[sample["label"]] == "demag"
+    assert isinstance(dataset.get_array(1, "B_radial"), np.memmap)
+
+    # Décalage d'un pas polaire (avec changement de signe) et de périodes
+    # électriques entières : un champ tournant idéal est inchangé
+    augmented = ShardDataset(root, "train", augment=Augment())
+    for ii in range(12):
+        assert np.allclose(augmented[ii]["B_radial"], dataset[ii]["B_radial"], atol=1e-5)
+        assert np.allclose(augmented[ii]["Tem"], dataset[ii]["Tem"], atol=1e-5)
+
+    # Bruit de capteur relatif au RMS
+    noisy = ShardDataset(root, "train", augment=Augment(is_roll=False, is_time_shift=False, noise_std=0.05))
+    diff = noisy[0]["B_radial"] - dataset[0]["B_radial"]
+    assert 0.02 < np.std(diff) < 0.05
+
+    # Un défaut localisé est bien déplacé par l'augmentation
+    B = dataset[0]["B_radial"].copy()
+    B[:, :8] += 1
+    rolled = Augment(is_time_shift=False)({"B_radial": B, "p": 4}, np.random.default_rng(1))["B_radial"]
+    assert not np.allclose(rolled, B)
@@ -0,0 +1,53 @@
+"""
+Test de la file de tâches multi-workers (util/work_queue.py)
+"""
+
+import threading
+import time
+from os.path import join
+
+from util.work_queue import DEAD, DONE, SQLiteBroker, enqueue_campaign, run_worker
+
+
+def test_work_queue(tmp_path):
+    """Tâches réparties entre workers, reprises après échec, file des tâches mortes"""
+    path = join(str(tmp_path), "campaign.db")
+    broker = SQLiteBroker(path, lease_time=60, max_attempts=2)
+    id_list = enqueue_campaign(broker, ["a.json", "b.json"], defects=[{}, {"stator.winding.Ntcoil": 6}], operating_points=[{"I0_rms": 100}, {"I0_rms": 200}])
+    assert len(id_list) == 8
+
+    failures = {"b.json": 1}  # b.json échoue une fois puis réussit
+    lock = threading.Lock()
+
+    def handler(task_id, payload):
+        with lock:
+            if failures.get(payload["machine"], 0) > 0:
+                failures[payload["machine"]] -= 1
+                raise Exception("FEMM crashed")
+        if payload["operating_point"]["I0_rms"] == 200 and payload["defect"] and payload["machine"] == "a.json":
+            raise Exception("always fails")
+        return {"machine": payload["machine"], "worker": threading.current_thread().name}
+
+    # Chaque worker (thread) a sa propre connexion, comme sur plusieurs noeuds
+    threads = [threading.Thread(target=run_worker, args=(SQLiteBroker(path, 60, 2), handler), kwargs={"poll_time": 0.01}, name="w" + str(ii)) for ii in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert broker.counts() == {DONE: 7, DEAD: 1}
+    dead = broker.get_dead()
+    assert dead[0][1]["defect"] and "always fails" in dead[0][2]
+    assert len(broker.get_results()) == 7
+
+    # Le worker d'une tâche a disparu : la tâche est reprise à l'expiration du bail
+    broker = SQLiteBroker(path, lease_time=0.05, max_attempts=2)
+    assert broker.requeue_dead() == 1
+    task_id, _ = broker.lease("lost worker")[0]
+    assert broker.lease("other worker") == []
+    time.sleep(0.1)
+    assert broker.lease("other worker")[0][0] == task_id
+    broker.nack(task_id, "stale", worker="lost worker")  # ignoré, la tâche a changé de worker
+    assert broker.counts()["running"] == 1
+    time.sleep(0.1)
+    assert broker.lease("third worker") == [] and broker.counts()[DEAD] == 1
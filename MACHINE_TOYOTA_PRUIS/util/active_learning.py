@@ -0,0 +1,134 @@
+"""Choice of the next variants to simulate by uncertainty of a cheap model.
+
+Hand-written grids (airgap 0.50..1.85mm, Ntcoil 40/80/150, Rint +0.5mm)
+spend the same number of simulations where the response is flat and where
+it changes quickly. The sampler keeps a surrogate of the response (torque
+mean and ripple, airgap harmonics) over the candidate variants and queues
+next the candidates it is the least sure about.
+"""
+
+import numpy as np
+
+from util.surrogate import SurrogateModel, comp_machine_features, comp_output_targets
+
+
+def comp_candidate_features(candidate):
+    """Features of a candidate: a machine (with its defect) or a dict of numbers"""
+    if "machine" in candidate:
+        return comp_machine_features(candidate["machine"], candidate.get("defect"))
+    return {k: float(v) for k, v in candidate.items()}
+
+
+def run_candidate(candidate):
+    """Default simulation of a candidate {"machine": machine, "defect": dict}"""
+    from util.simulation import load_simulation, run_simulation
+
+    return run_simulation(load_simulation(machine=candidate["machine"], solver="scipy"))
+
+
+class ActiveLearningSampler:
+    """Uncertainty sampling over a list of candidate variants
+
+    Args:
+        candidates (list): dicts {"machine": machine, "defect": dict} or dicts of parameters
+        simulate (callable): candidate -> output (None if infeasible), run_simulation with the
+            scipy solver by default
+        comp_targets (callable): output -> dict of responses
+        nb_init (int): candidates chosen by space filling before the model is used
+    """
+
+    def __init__(
+        self,
+        candidates,
+        simulate=run_candidate,
+        comp_targets=comp_output_targets,
+        nb_init=5,
+        n_estimators=50,
+        random_state=0,
+    ):
+        self.candidates = candidates
+        self.simulate = simulate
+        self.comp_targets = comp_targets
+        self.nb_init = nb_init
+        self.surrogate = SurrogateModel(
+            n_estimators=n_estimators, min_samples=nb_init, random_state=random_state
+        )
+        self.features = [comp_candidate_features(c) for c in candidates]
+        self.is_done = np.zeros(len(candidates), dtype=bool)
+        self.history = list()  # (candidate index, targets) in simulation order
+        self.infeasible = list()  # candidates skipped by the simulation (None output)
+
+        # Parameters scaled to [0, 1] for the distances
+        names = sorted(set().union(*self.features))
+        X = np.array([[f.get(name, 0) for name in names] for f in self.features], dtype=float)
+        span = X.max(axis=0) - X.min(axis=0)
+        self.X = (X - X.min(axis=0)) / np.where(span > 0, span, 1)
+
+    def comp_scores(self):
+        """Score of each pending candidate (-inf for the simulated ones)
+
+        Before nb_init simulations: distance to the nearest simulated candidate
+        (space filling). After: relative uncertainty of the surrogate, candidates
+        outside the simulated range first, ordered by distance.
+        """
+        dist = self.comp_distance(self.is_done)
+        if len(self.history) < self.nb_init or self.surrogate.model is None:
+            score = dist
+        else:
+            _, std = self.surrogate.predict(self.features)
+            score = self.surrogate.comp_uncertainty(self.features, std)
+            is_out = np.isinf(score)
+            score[is_out] = 1e6 * (1 + dist[is_out])
+        return np.where(self.is_done, -np.inf, score)
+
+    def comp_distance(self, is_ref):
+        if not np.any(is_ref):
+            return np.linalg.norm(self.X - self.X.mean(axis=0), axis=1)
+        diff = self.X[:, None, :] - self.X[None, is_ref, :]
+        return np.min(np.linalg.norm(diff, axis=2), axis=1)
+
+    def select(self, batch_size=1):
+        """Indices of the next candidates to simulate
+
+        Inside a batch, the score of the candidates close to an already chosen
+        one is reduced so that one batch does not explore a single region.
+        """
+        score = self.comp_scores()
+        chosen = list()
+        for _ in range(min(batch_size, int(np.sum(~self.is_done)))):
+            ii = int(np.argmax(score))
+            chosen.append(ii)
+            score[ii] = -np.inf
+            is_chosen = np.zeros(len(score), dtype=bool)
+            is_chosen[chosen] = True
+            d = self.comp_distance(is_chosen)
+            scale = np.median(self.comp_distance(self.is_done | is_chosen)) + 1e-12
+            is_pending = np.isfinite(score)
+            score[is_pending] *= 1 - np.exp(-((d[is_pending] / scale) ** 2))
+        return chosen
+
+    def step(self, batch_size=1):
+        """Simulate the next batch, update the surrogate and return the chosen indices
+
+        Infeasible candidates (None output, see util.simulation.run_simulation)
+        are recorded in infeasible and never chosen again.
+        """
+        chosen = self.select(batch_size)
+        for ii in chosen:
+            output = self.simulate(self.candidates[ii])
+            self.is_done[ii] = True
+            if output is None:
+                self.infeasible.append(ii)
+                continue
+            targets = self.comp_targets(output)
+            self.surrogate.add(self.features[ii], targets)
+            self.history.append((ii, targets))
+        if len(self.history) >= 2:
+            self.surrogate.fit()
+        return chosen
+
+    def run(self, budget, batch_size=1):
+        """Simulate up to budget feasible candidates, returns the history"""
+        while len(self.history) < budget and not np.all(self.is_done):
+            self.step(min(batch_size, budget - len(self.history)))
+        return self.history
@@ -0,0 +1,86 @@
+"""Machine clone sharing the heavy immutable sub-objects.
+
+A variant only changes a few dimensions, the winding matrix or a magnet
+property; its materials (B(H) curves, loss data) and conductor definitions
+are the same objects as in the reference machine. clone_machine deep-copies
+the machine except these shared objects, so that a variant can be mutated
+safely (e.g. in a parallel campaign) without reloading or copying the
+materials.
+
+The shared objects keep their parent pointer to the reference machine; a
+variant that needs its own material (e.g. another magnet grade) replaces
+it (set_path(variant, "rotor.hole[0].magnet_0.mat_type", new_mat)) rather
+than mutating it.
+"""
+
+import re
+from copy import deepcopy
+
+import numpy as np
+
+# pyleecan classes (and sub-classes) shared between a machine and its clones
+SHARED_CLASSES = ("Material", "Conductor")
+
+
+def clone_machine(machine, changes=None, shared_classes=SHARED_CLASSES):
+    """Copy of machine sharing its materials and conductors
+
+    Args:
+        machine: pyleecan machine (or any pyleecan object)
+        changes (dict): {path: value} applied to the copy, e.g.
+            {"stator.Rint": 0.081, "rotor.hole[0].W0": 0.04}
+        shared_classes (tuple): names of the classes shared instead of copied
+
+    Returns:
+        copy of machine
+    """
+    memo = {id(obj): obj for obj in find_shared(machine, shared_classes)}
+    variant = deepcopy(machine, memo)
+    for path, value in (changes or {}).items():
+        set_path(variant, path, value)
+    return variant
+
+
+def find_shared(obj, shared_classes=SHARED_CLASSES):
+    """Objects of the shared classes reachable from obj (parent pointers excluded)"""
+    shared, visited, stack = list(), set(), [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in visited or obj is None or isinstance(obj, (str, bytes, int, float, np.ndarray)):
+            continue
+        visited.add(id(obj))
+        if _is_shared(obj, shared_classes):
+            shared.append(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.extend(v for k, v in vars(obj).items() if k not in ("parent", "_parent"))
+    return shared
+
+
+def _is_shared(obj, shared_classes):
+    return any(cls.__name__ in shared_classes for cls in type(obj).__mro__)
+
+
+_PATH_ITEM = re.compile(r"([A-Za-z_]\w*)|\[(-?\d+)\]")
+
+
+def set_path(obj, path, value):
+    """Set the attribute (or list item) at path, e.g. "rotor.hole[0].magnet_0.Lmag" """
+    keys = [(name, int(index) if index else None) for name, index in _PATH_ITEM.findall(path)]
+    for name, index in keys[:-1]:
+        obj = getattr(obj, name) if name else obj[index]
+    name, index = keys[-1]
+    if name:
+        setattr(obj, name, value)
+    else:
+        obj[index] = value
+
+
+def get_path(obj, path):
+    """Value at path (same syntax as set_path)"""
+    for name, index in _PATH_ITEM.findall(path):
+        obj = getattr(obj, name) if name else obj[int(index)]
+    return obj
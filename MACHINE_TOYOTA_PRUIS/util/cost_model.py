@@ -0,0 +1,172 @@
+"""Runtime model of the simulations and cost-aware campaign scheduling.
+
+The runtime of a simulation is close to a product of power laws of its
+settings (time steps, airgap points, slots, pole pairs) times a factor for
+each option (non-linear B(H), periodicity, FEMM vs scipy solver). CostModel
+fits log(runtime) by least squares on the recorded runs, so a few dozen
+timings are enough and the model extrapolates to larger machines.
+
+The campaign is then started longest first (LPT): with a FIFO order one long
+job (e.g. a full non-linear Tesla model) started last keeps a single core
+busy while the others are idle.
+
+    cost_model = CostModel.load("timings.json")
+    report = run_schedule(simulations, run_simulation, nb_worker=8, cost_model=cost_model)
+    cost_model.save("timings.json")  # the campaign timings are added to the records
+"""
+
+import heapq
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Features of a run: log of the sizes, 0/1 of the options
+LOG_FEATURES = ["Nt", "Na", "Zs", "p", "nb_worker"]
+FLAG_FEATURES = ["is_nonlinear", "is_periodicity_a", "is_periodicity_t", "is_femm"]
+
+
+def comp_simulation_features(simulation):
+    """Cost features of a pyleecan simulation (Simu1 or SimuScipy)"""
+    machine, mag = simulation.machine, simulation.mag
+    return {
+        "Nt": _comp_size(simulation.input.time),
+        "Na": _comp_size(simulation.input.angle),
+        "Zs": machine.stator.get_Zs(),
+        "p": machine.stator.winding.p,
+        "nb_worker": getattr(mag, "nb_worker", 1) or 1,
+        "is_nonlinear": int(getattr(mag, "type_BH_stator", 0) == 0 or getattr(mag, "type_BH_rotor", 0) == 0),
+        "is_periodicity_a": int(bool(getattr(mag, "is_periodicity_a", False))),
+        "is_periodicity_t": int(bool(getattr(mag, "is_periodicity_t", False))),
+        "is_femm": int(type(mag).__name__ == "MagFEMM"),
+    }
+
+
+def _comp_size(axis):
+    # ndarray, or pyleecan ImportMatrix once set on the input
+    if hasattr(axis, "get_data"):
+        axis = axis.get_data()
+    return len(axis)
+
+
+class CostModel:
+    """Log-linear runtime model fitted on recorded (features, runtime) pairs"""
+
+    def __init__(self, ridge=1e-3):
+        self.ridge = ridge
+        self.records = list()
+        self.coef = None
+
+    def add(self, features, runtime):
+        self.records.append({"features": {k: float(v) for k, v in features.items()}, "runtime": float(runtime)})
+        self.coef = None
+
+    def to_vector(self, features):
+        x = [np.log(max(float(features.get(k, 1)), 1e-12)) for k in LOG_FEATURES]
+        x += [float(features.get(k, 0)) for k in FLAG_FEATURES]
+        return np.array(x + [1.0])
+
+    def fit(self):
+        if len(self.records) == 0:
+            raise Exception("No recorded runtime to fit the cost model")
+        X = np.array([self.to_vector(r["features"]) for r in self.records])
+        y = np.log([max(r["runtime"], 1e-6) for r in self.records])
+        # Ridge keeps the features that never vary in the records at 0
+        A = X.T @ X + self.ridge * np.diag(np.r_[np.ones(X.shape[1] - 1), 0])
+        self.coef = np.linalg.solve(A, X.T @ y)
+        return self
+
+    def predict(self, features_list):
+        """Predicted runtime [s] of each features dict"""
+        if self.coef is None:
+            self.fit()
+        X = np.array([self.to_vector(f) for f in features_list])
+        return np.exp(X @ self.coef)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"ridge": self.ridge, "records": self.records}, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        cost_model = cls(ridge=data["ridge"])
+        cost_model.records = data["records"]
+        return cost_model
+
+
+def schedule(costs, nb_worker, method="lpt"):
+    """Order of the tasks and their predicted start, worker and makespan
+
+    Workers take the next task of the order when they become free (as a
+    process pool or run_worker do).
+
+    Args:
+        costs (array): predicted runtime of each task [s]
+        nb_worker (int): parallel workers
+        method (str): "lpt" (longest processing time first) or "fifo"
+
+    Returns:
+        dict: "order" (task indices), "worker", "start" (per task), "makespan" [s]
+    """
+    costs = np.asarray(costs, dtype=float)
+    if method == "lpt":
+        order = np.argsort(-costs, kind="stable")
+    elif method == "fifo":
+        order = np.arange(len(costs))
+    else:
+        raise Exception("Unknown schedule method " + str(method) + ", use 'lpt' or 'fifo'")
+    free = [(0.0, k) for k in range(max(1, nb_worker))]
+    worker, start = np.zeros(len(costs), dtype=int), np.zeros(len(costs))
+    for ii in order:
+        start[ii], worker[ii] = heapq.heappop(free)
+        heapq.heappush(free, (start[ii] + costs[ii], worker[ii]))
+    makespan = max(t for t, _ in free)
+    return {"order": order, "worker": worker, "start": start, "makespan": makespan}
+
+
+def _run_timed(args):
+    func, task = args
+    t0 = time.perf_counter()
+    result = func(task)
+    return result, time.perf_counter() - t0
+
+
+def run_schedule(tasks, func, nb_worker, cost_model, comp_features=comp_simulation_features, method="lpt", executor=ProcessPoolExecutor):
+    """Run func on each task in the scheduled order, record the actual runtimes
+
+    Args:
+        tasks (list): e.g. simulations
+        func: function run on each task (picklable for a process pool)
+        cost_model (CostModel): predicts the runtimes, receives the new timings
+        comp_features: features of a task for the cost model
+
+    Returns:
+        dict: "results" (in the order of tasks), "predicted"/"actual" runtime per
+            task, "predicted_makespan"/"actual_makespan" [s]
+    """
+    features_list = [comp_features(task) for task in tasks]
+    predicted = cost_model.predict(features_list) if cost_model.records else np.ones(len(tasks))
+    plan = schedule(predicted, nb_worker, method)
+
+    t0 = time.perf_counter()
+    with executor(max_workers=nb_worker) as pool:
+        # map submits in the scheduled order, free workers take the next task
+        res_list = list(pool.map(_run_timed, [(func, tasks[ii]) for ii in plan["order"]]))
+    actual_makespan = time.perf_counter() - t0
+
+    results, actual = [None] * len(tasks), np.zeros(len(tasks))
+    for ii, (result, runtime) in zip(plan["order"], res_list):
+        results[ii], actual[ii] = result, runtime
+        cost_model.add(features_list[ii], runtime)
+    report = {
+        "results": results,
+        "predicted": predicted,
+        "actual": actual,
+        "predicted_makespan": plan["makespan"],
+        "actual_makespan": actual_makespan,
+    }
+    print("Campaign of", len(tasks), "runs: predicted", "%.1f" % plan["makespan"], "s, actual", "%.1f" % actual_makespan, "s")
+    return report
@@ -0,0 +1,201 @@
+"""Sharded dataset of simulated samples with leakage-free splits.
+
+The variants of a base machine (e.g. the ten Toyota_Prius_gap_* files) give
+near-identical samples: a random split puts some of them in train and the
+others in test. Here the split of a sample is drawn from the hash of its
+group key (machine family by default, see comp_family), so all the
+variants of a base machine land in the same split, whatever the writer
+process or the order of the samples.
+
+Each split is written as fixed-size shards, one .npy file per field (e.g.
+B_radial (n, Nt, Na), Tem (n, Nt), label (n,)), that the readers open with
+memory mapping. manifest_<name>.json lists the shards with their sample
+counts and class histograms; several writers (one name each) can fill the
+same folder in parallel, load_manifest merges their manifests.
+
+    with ShardWriter("dataset", name="node0") as writer:
+        for out, defect in runs:
+            writer.add(comp_output_sample(out), family=comp_family(out.simu.machine.name), group=defect, label=defect)
+"""
+
+import hashlib
+import json
+import os
+import re
+from glob import glob
+from os.path import basename, join
+
+import numpy as np
+
+SPLITS = ("train", "val", "test")
+
+# Base machine of the machine names: first matching (pattern, family), the
+# family may refer to the groups of the pattern. The numbered designs of the
+# batches (Toyota_Prius_healthy_10_Ntcoil_7, Toyota_Prius_defect_10_Ntcoil_12,
+# Toyota_Prius_defect_01_H10W22RH81RW318N10) are base machines of their own,
+# all the other Toyota_Prius_* and Tesla_Model3_* files are variants of the
+# reference machine (gap, Rint/Rext, H0/W0, Lmag, Ntcoil, geo, Usinage, Saine...).
+FAMILY_RULES = [
+    (r"Toyota_Prius_(?:healthy|defect)_0*(\d+)_", r"Toyota_Prius_design\1"),
+    (r"Toyota_Prius|IPMSM_Toyota1_Prius_2004", "Toyota_Prius"),
+    (r"Tesla_Model3", "Tesla_Model3"),
+]
+
+
+def comp_family(machine_name, family_rules=FAMILY_RULES):
+    """Base machine of a machine name, e.g. Toyota_Prius_Rint_+0.5mm -> Toyota_Prius"""
+    for pattern, family in family_rules:
+        match = re.match(pattern, machine_name)
+        if match:
+            return match.expand(family)
+    raise Exception("No base machine for " + machine_name + ", add it to FAMILY_RULES")
+
+
+def comp_split(key, fractions=(0.8, 0.1, 0.1), seed=0):
+    """Split of a group key, from its hash (same result in every process)"""
+    digest = hashlib.sha1((str(seed) + "/" + key).encode("utf-8")).hexdigest()
+    u = int(digest[:15], 16) / 16**15
+    index = int(np.searchsorted(np.cumsum(fractions) / np.sum(fractions), u, side="right"))
+    return SPLITS[min(index, len(SPLITS) - 1)]
+
+
+def comp_output_sample(output, dtype=np.float32):
+    """Fields of a sample from a pyleecan output: B(t, angle) components, Tem(t), p"""
+    Tem = output.mag.Tem
+    sample = {"Tem": np.asarray(Tem.get_along("time")[Tem.symbol], dtype=dtype)}
+    for comp in ["radial", "tangential"]:
+        B = output.mag.B.components[comp]
+        sample["B_" + comp] = np.asarray(B.get_along("time", "angle")[B.symbol], dtype=dtype)
+    sample["p"] = np.int32(output.simu.machine.stator.winding.p)
+    return sample
+
+
+class ShardWriter:
+    """Writer of fixed-size shards of samples split by group
+
+    Args:
+        root (str): dataset folder
+        shard_size (int): samples per shard (the last shard of a split is smaller)
+        fractions (tuple): train, val, test fractions of the groups
+        group_by (tuple): metadata making the group key, ("family",) or ("family", "group")
+        name (str): writer name, prefix of its shards and manifest (one per process)
+    """
+
+    def __init__(self, root, shard_size=1024, fractions=(0.8, 0.1, 0.1), group_by=("family",), name="part0", seed=0):
+        self.root = root
+        self.shard_size = shard_size
+        self.fractions = fractions
+        self.group_by = group_by
+        self.name = name
+        self.seed = seed
+        self.buffers = {split: list() for split in SPLITS}
+        self.shards = list()
+        self.fields = None
+        self.classes = list()
+        for split in SPLITS:
+            os.makedirs(join(root, split), exist_ok=True)
+
+    def add(self, sample, family, group="", label=None):
+        """Add a sample (dict of arrays with the same shapes for every sample)
+
+        Args:
+            family (str): base machine (see comp_family)
+            group (str): defect group (e.g. "healthy", "winding", "demag")
+            label (str): class of the sample, group by default
+        """
+        if self.fields is None:
+            self.fields = {k: {"shape": list(np.shape(v)), "dtype": str(np.asarray(v).dtype)} for k, v in sample.items()}
+        elif set(sample) != set(self.fields):
+            raise Exception("Sample fields " + str(sorted(sample)) + " differ from " + str(sorted(self.fields)))
+        label = group if label is None else label
+        if label not in self.classes:
+            self.classes.append(label)
+        meta = {"family": family, "group": group}
+        key = "/".join(str(meta[k]) for k in self.group_by)
+        split = comp_split(key, self.fractions, self.seed)
+        self.buffers[split].append((sample, self.classes.index(label), key))
+        if len(self.buffers[split]) >= self.shard_size:
+            self.flush(split)
+        return split
+
+    def flush(self, split):
+        """Write the buffered samples of a split as a shard"""
+        buffer = self.buffers[split]
+        if not buffer:
+            return
+        prefix = join(split, self.name + "_" + str(len([s for s in self.shards if s["split"] == split])).zfill(5))
+        arrays = {k: np.stack([np.asarray(s[k], dtype=self.fields[k]["dtype"]) for s, _, _ in buffer]) for k in self.fields}
+        arrays["label"] = np.array([c for _, c, _ in buffer], dtype=np.int32)
+        for key, array in arrays.items():
+            path = join(self.root, prefix + "_" + key + ".npy")
+            np.save(path + ".tmp.npy", array)
+            os.replace(path + ".tmp.npy", path)  # readers never see a partial shard
+        self.shards.append(
+            {
+                "split": split,
+                "prefix": prefix,
+                "count": len(buffer),
+                "class_hist": np.bincount(arrays["label"], minlength=len(self.classes)).tolist(),
+                "groups": sorted({key for _, _, key in buffer}),
+            }
+        )
+        self.buffers[split] = list()
+
+    def close(self):
+        """Flush the last shards and write the manifest"""
+        for split in SPLITS:
+            self.flush(split)
+        manifest = {
+            "fields": self.fields,
+            "classes": self.classes,
+            "group_by": list(self.group_by),
+            "fractions": list(self.fractions),
+            "shards": self.shards,
+        }
+        path = join(self.root, "manifest_" + self.name + ".json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(path + ".tmp", path)
+        return manifest
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_manifest(root):
+    """Merged manifest of the writers of a dataset folder
+
+    The class histograms are re-indexed on the merged class list, and the
+    label_map of each shard maps its stored labels (indices in the classes of
+    its writer) to the merged classes.
+    """
+    manifest = {"fields": None, "classes": list(), "shards": list()}
+    for path in sorted(glob(join(root, "manifest_*.json"))):
+        with open(path) as f:
+            part = json.load(f)
+        if manifest["fields"] is None:
+            manifest["fields"] = part["fields"]
+        elif part["fields"] != manifest["fields"]:
+            raise Exception("Fields of " + basename(path) + " differ from the other writers")
+        for label in part["classes"]:
+            if label not in manifest["classes"]:
+                manifest["classes"].append(label)
+        index = [manifest["classes"].index(label) for label in part["classes"]]
+        for shard in part["shards"]:
+            hist = [0] * len(manifest["classes"])
+            for ii, nb in zip(index, shard["class_hist"]):
+                hist[ii] += nb
+            manifest["shards"].append(dict(shard, class_hist=hist, label_map=index))
+    for shard in manifest["shards"]:
+        shard["class_hist"] += [0] * (len(manifest["classes"]) - len(shard["class_hist"]))
+    manifest["splits"] = {
+        split: {
+            "count": sum(s["count"] for s in manifest["shards"] if s["split"] == split),
+            "nb_shard": sum(s["split"] == split for s in manifest["shards"]),
+        }
+        for split in SPLITS
+    }
+    return manifest
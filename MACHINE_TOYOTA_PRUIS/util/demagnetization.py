@@ -0,0 +1,175 @@
+"""Per-pole, per-magnet and per-segment demagnetization of one base machine.
+
+A demagnetized machine is today a whole JSON variant with a uniform loss
+(Tesla_Model3_Defaut_Demagnetisation_5_Pourcent.json, Toyota_Prius_defect_magnet_1.json).
+Here the demagnetization is a remanence map (Nmag, nb_seg): the factor of
+Br in each segment of each magnet of the problem of fe_solver, the magnets
+being cut into nb_seg segments along their long axis (edges and corners
+demagnetize first). The geometry, mesh and problem of the base machine are
+built once; no machine is re-serialized.
+
+With linear materials one sparse LU per rotor position gives the field of
+each magnet segment and of 1A in each phase (fe_solver.solve_superposition),
+so any number of maps is a linear combination of these columns. With B(H)
+curves each map is a full solve of the problem with scaled remanence
+(apply_demag_map).
+
+    problem = simulation.mag.get_problem(Output(simu=simulation.simu))
+    segments = comp_magnet_segments(problem, nb_seg=4)
+    maps = random_demag_maps(problem, 1000, nb_seg=4)
+    res = solve_demag_maps(problem, theta, Is, maps, angle, segments)  # Tem (Nt, Nmap), Br (Nt, Nmap, Na)
+"""
+
+import numpy as np
+
+from util import fe_solver
+from util.tracing import traced
+
+# Scenarios of random_demag_maps
+DEMAG_SCENARIOS = ("uniform", "pole", "magnet", "edge", "local")
+
+
+def comp_magnet_segments(problem, nb_seg=4):
+    """Segment index of the elements of each magnet, cut along its long axis
+
+    Returns:
+        tuple: list of (E_k,) segment indices, nb_seg (segments argument of
+            fe_solver.solve_superposition)
+    """
+    nodes, tri = problem["nodes"], problem["tri"]
+    seg_list = list()
+    for elem in problem["magnet_elem"]:
+        pts = fe_solver._centroid(nodes, tri[elem])
+        c = pts.mean(axis=0)
+        _, vect = np.linalg.eigh(np.cov((pts - c).T))
+        u = vect[:, -1]  # long axis
+        # Oriented in the direction of rotation, segment 0 is the trailing edge
+        if c[0] * u[1] - c[1] * u[0] < 0:
+            u = -u
+        s = (pts - c) @ u
+        seg = np.floor((s - s.min()) / (s.max() - s.min() + 1e-12) * nb_seg).astype(int)
+        seg_list.append(np.minimum(seg, nb_seg - 1))
+    return seg_list, nb_seg
+
+
+def apply_demag_map(problem, remanence, segments):
+    """Problem of fe_solver with the remanence map (Nmag, nb_seg) applied per element"""
+    seg_list, _ = segments
+    remanence = np.asarray(remanence, dtype=float)
+    magnet_Br = [
+        np.asarray(Br)[None, :] * remanence[m, seg_list[m]][:, None] for m, Br in enumerate(problem["magnet_Br"])
+    ]
+    return dict(problem, magnet_Br=magnet_Br)
+
+
+def make_demag_map(problem, nb_seg, factor, pole=None, magnet=None, segment=None):
+    """Remanence map (Nmag, nb_seg): factor on the selected poles, magnets and segments, 1 elsewhere
+
+    Args:
+        factor (float): remaining fraction of Br, e.g. 0.95 for 5 % demagnetization
+        pole, magnet, segment (list): indices (magnet: index in problem["magnet_elem"]),
+            all if None
+    """
+    nb_mag = len(problem["magnet_elem"])
+    is_mag = np.ones(nb_mag, dtype=bool)
+    if pole is not None:
+        is_mag &= np.isin(problem["magnet_pole"], pole)
+    if magnet is not None:
+        is_mag &= np.isin(np.arange(nb_mag), magnet)
+    is_seg = np.ones(nb_seg, dtype=bool) if segment is None else np.isin(np.arange(nb_seg), segment)
+    remanence = np.ones((nb_mag, nb_seg))
+    remanence[np.ix_(is_mag, is_seg)] = factor
+    return remanence
+
+
+def random_demag_maps(problem, nb_map, nb_seg=4, max_loss=0.3, scenarios=DEMAG_SCENARIOS, seed=0):
+    """Random remanence maps (nb_map, Nmag, nb_seg) and their scenario names
+
+    - uniform: all the magnets (the existing JSON variants),
+    - pole: the magnets of one pole,
+    - magnet: one magnet,
+    - edge: the leading and trailing segments of all the magnets (armature reaction),
+    - local: loss decreasing from one segment to the next ones (local overheating).
+    """
+    rng = np.random.default_rng(seed)
+    nb_mag = len(problem["magnet_elem"])
+    poles = np.unique(problem["magnet_pole"])
+    maps = np.ones((nb_map, nb_mag, nb_seg))
+    names = rng.choice(scenarios, nb_map)
+    for ii, name in enumerate(names):
+        loss = rng.uniform(0.01, max_loss)
+        if name == "uniform":
+            maps[ii] = 1 - loss
+        elif name == "pole":
+            maps[ii] = make_demag_map(problem, nb_seg, 1 - loss, pole=[rng.choice(poles)])
+        elif name == "magnet":
+            maps[ii] = make_demag_map(problem, nb_seg, 1 - loss, magnet=[rng.integers(nb_mag)])
+        elif name == "edge":
+            maps[ii] = make_demag_map(problem, nb_seg, 1 - loss, segment=[0, nb_seg - 1])
+        elif name == "local":
+            center = rng.integers(nb_mag * nb_seg)
+            distance = np.abs(np.arange(nb_mag * nb_seg) - center)
+            distance = np.minimum(distance, nb_mag * nb_seg - distance)
+            maps[ii] = (1 - loss * 0.5**distance).reshape(nb_mag, nb_seg)
+        else:
+            raise Exception("Unknown demagnetization scenario " + str(name))
+    return maps, names.tolist()
+
+
+def solve_demag_sweep(problem, theta_list, Is, maps, angle, segments):
+    """Linear materials: solve a sequence of rotor positions for several remanence maps (one worker)
+
+    Args:
+        theta_list (array): rotor angles (Nt,) [rad]
+        Is (array): phase currents (Nt, qs) [A], the same for every map
+        maps (array): remanence maps (Nmap, Nmag, nb_seg)
+        angle (array): airgap angles (Nangle,) [rad]
+
+    Returns:
+        dict: Tem (Nt, Nmap), Br and Bt (Nt, Nmap, Nangle), Phi_wind (Nt, Nmap, qs)
+    """
+    maps = np.asarray(maps, dtype=float)
+    Nmap = maps.shape[0]
+    Nstat = len(problem["tri"])
+
+    Tem, Br, Bt, Phi = [], [], [], []
+    for it, theta in enumerate(theta_list):
+        base = fe_solver.solve_superposition(problem, theta, segments=segments)
+        coef = np.column_stack([maps.reshape(Nmap, -1), np.broadcast_to(Is[it], (Nmap, len(Is[it])))])
+        B = fe_solver._comp_B(base["A"], base["tri"], base["grad"])[Nstat:]
+        B = np.einsum("edk,ok->edo", B, coef)
+
+        Tem.append(fe_solver._comp_torque(problem, base["nodes"], base["band"], base["area"][Nstat:], B))
+
+        idx = fe_solver._locate_airgap(problem, base["nodes"], base["band"], angle)
+        br, bt = fe_solver._comp_rad_tan(B[idx], angle)
+        Br.append(br.T)
+        Bt.append(bt.T)
+        Phi.append(coef.dot(fe_solver._comp_flux_linkage(problem, base["A"]).T))
+    return {"Tem": np.array(Tem), "Br": np.array(Br), "Bt": np.array(Bt), "Phi_wind": np.array(Phi)}
+
+
+def _solve_maps(problem, theta, Is, maps, angle, segments):
+    """Non-linear solve of several remanence maps, map first (Nmap, Nt, ...)"""
+    res_list = [fe_solver.solve_steps(apply_demag_map(problem, remanence, segments), theta, Is, angle) for remanence in maps]
+    return {k: np.array([r[k] for r in res_list]) for k in ["Tem", "Br", "Bt", "Phi_wind"]}
+
+
+@traced()
+def solve_demag_maps(problem, theta, Is, maps, angle, segments, nb_worker=4):
+    """Fields of the base machine for each remanence map
+
+    Linear problems: one factorization per rotor position for all the maps,
+    positions split between nb_worker processes. Non-linear problems: the
+    maps are split between the processes.
+
+    Returns:
+        dict: Tem (Nt, Nmap), Br and Bt (Nt, Nmap, Nangle), Phi_wind (Nt, Nmap, qs)
+    """
+    theta, Is, maps = np.asarray(theta, dtype=float), np.asarray(Is, dtype=float), np.asarray(maps, dtype=float)
+    if problem["is_linear"]:
+        return fe_solver._run_chunks(
+            solve_demag_sweep, nb_worker, len(theta), lambda c: (problem, theta[c], Is[c], maps, angle, segments)
+        )
+    res = fe_solver._run_chunks(_solve_maps, nb_worker, len(maps), lambda c: (problem, theta, Is, maps[c], angle, segments))
+    return {k: np.moveaxis(v, 0, 1) for k, v in res.items()}
@@ -0,0 +1,139 @@
+"""Design of experiments over the Toyota Prius geometry.
+
+The geometry notebooks vary one parameter at a time. Here the parameters
+of PRIUS_SPACE (stator radii, SlotW11 and HoleM50 dimensions, magnet length,
+Ntcoil, airgap) are sampled jointly with a Latin hypercube, a Sobol sequence
+or a full factorial design, and the machines are produced one by one from
+a clone of the reference machine, so a large design is streamed to the
+simulations without building the whole batch.
+
+    for params, machine in iter_machines(sample_design(PRIUS_SPACE, 1024, "sobol")):
+        out = run_simulation(load_simulation(machine=machine, solver="scipy"))
+"""
+
+import itertools
+
+import numpy as np
+
+from util.clone import clone_machine
+
+# name: (paths set to the value, low, high, is_integer), around the reference
+# machine of Toyota_Prius_Generator. "airgap" sets the rotor outer radius from
+# the (sampled) stator bore: rotor.Rext = stator.Rint - airgap.
+PRIUS_SPACE = {
+    "stator_Rint": (["stator.Rint"], 0.0800, 0.0820, False),
+    "stator_Rext": (["stator.Rext"], 0.1300, 0.1400, False),
+    "slot_W0": (["stator.slot.W0"], 0.0015, 0.0025, False),
+    "slot_H0": (["stator.slot.H0"], 0.0008, 0.0012, False),
+    "slot_W1": (["stator.slot.W1"], 0.0045, 0.0055, False),
+    "slot_H2": (["stator.slot.H2"], 0.0300, 0.0360, False),
+    "slot_W2": (["stator.slot.W2"], 0.0072, 0.0088, False),
+    "slot_R1": (["stator.slot.R1"], 0.0035, 0.0040, False),
+    "hole_H0": (["rotor.hole[0].H0"], 0.0100, 0.0120, False),
+    "hole_H1": (["rotor.hole[0].H1"], 0.0012, 0.0018, False),
+    "hole_H2": (["rotor.hole[0].H2"], 0.0008, 0.0012, False),
+    "hole_H3": (["rotor.hole[0].H3"], 0.0055, 0.0075, False),
+    "hole_H4": (["rotor.hole[0].H4"], 0.0, 0.0005, False),
+    "hole_W0": (["rotor.hole[0].W0"], 0.0400, 0.0440, False),
+    "hole_W1": (["rotor.hole[0].W1"], 0.0, 0.0010, False),
+    "hole_W2": (["rotor.hole[0].W2"], 0.0, 0.0010, False),
+    "hole_W3": (["rotor.hole[0].W3"], 0.0130, 0.0150, False),
+    "hole_W4": (["rotor.hole[0].W4"], 0.0170, 0.0200, False),
+    "Lmag": (["rotor.hole[0].magnet_0.Lmag", "rotor.hole[0].magnet_1.Lmag"], 0.075, 0.092, False),
+    "Ntcoil": (["stator.winding.Ntcoil"], 5, 12, True),
+    "airgap": ([], 0.0005, 0.00185, False),
+}
+
+
+def sample_design(space=PRIUS_SPACE, n=100, method="lhs", seed=0, levels=3, block_size=1024):
+    """Parameter dicts of a design, yielded one by one
+
+    Args:
+        space (dict): parameters, see PRIUS_SPACE
+        n (int): number of samples (lhs, sobol); unused for factorial
+        method (str): "lhs", "sobol" or "factorial"
+        levels (int or dict): factorial levels per parameter
+        block_size (int): Sobol points drawn at a time (the sequence is streamed)
+    """
+    from scipy.stats import qmc
+
+    names = list(space)
+    d = len(names)
+    if method == "lhs":
+        # The strata of a Latin hypercube depend on n: drawn at once (n x d floats)
+        blocks = [qmc.LatinHypercube(d=d, seed=seed).random(n)]
+    elif method == "sobol":
+        sampler = qmc.Sobol(d=d, scramble=True, seed=seed)
+        blocks = (sampler.random(min(block_size, n - k)) for k in range(0, n, block_size))
+    elif method == "factorial":
+        if isinstance(levels, int):
+            levels = {name: levels for name in names}
+        grids = [np.linspace(0, 1, levels.get(name, 1)) if levels.get(name, 1) > 1 else [0.5] for name in names]
+        blocks = ([u] for u in itertools.product(*grids))
+    else:
+        raise Exception("Unknown design method " + str(method) + ", use 'lhs', 'sobol' or 'factorial'")
+
+    for block in blocks:
+        for u in block:
+            yield comp_point(space, names, u)
+
+
+def comp_point(space, names, u):
+    """Parameter values of a point u of the unit hypercube"""
+    point = dict()
+    for name, ui in zip(names, u):
+        _, low, high, is_integer = space[name]
+        if is_integer:
+            point[name] = int(min(np.floor(low + ui * (high - low + 1)), high))
+        else:
+            point[name] = low + ui * (high - low)
+    return point
+
+
+def comp_changes(machine, point, space=PRIUS_SPACE):
+    """{path: value} of a design point for clone_machine"""
+    changes = dict()
+    for name, value in point.items():
+        for path in space[name][0]:
+            changes[path] = value
+    if "Ntcoil" in point:
+        # Each coil of the winding matrix carries Ntcoil turns (sign kept)
+        wind_mat = np.asarray(machine.stator.winding.wind_mat, dtype=float)
+        changes["stator.winding.wind_mat"] = np.sign(wind_mat) * point["Ntcoil"]
+    if "airgap" in point:
+        Rint = point.get("stator_Rint", machine.stator.Rint)
+        changes["rotor.Rext"] = Rint - point["airgap"]
+    return changes
+
+
+def iter_machines(design, reference=None, space=PRIUS_SPACE, name="Toyota_Prius_DOE"):
+    """(parameters, machine) of each design point, built lazily
+
+    Args:
+        design: iterable of parameter dicts (e.g. sample_design)
+        reference: machine cloned for each point, Toyota_Prius_Generator by default
+            (its materials are loaded once and shared by all the machines)
+    """
+    if reference is None:
+        reference = create_reference_machine()
+    for ii, point in enumerate(design):
+        machine = clone_machine(reference, comp_changes(reference, point, space))
+        machine.name = name + "_" + str(ii)
+        yield point, machine
+
+
+def create_reference_machine(generator=None, name="Toyota_Prius_reference"):
+    """Toyota Prius machine of Toyota_Prius_Generator"""
+    from pyleecan.Classes.MachineIPMSM import MachineIPMSM
+
+    from util.toyota_prius_generator import Toyota_Prius_Generator
+
+    if generator is None:
+        generator = Toyota_Prius_Generator()
+    return MachineIPMSM(
+        name=name,
+        shaft=generator.create_shaft(),
+        rotor=generator.create_rotor(),
+        stator=generator.create_stator(),
+        type_machine=1,
+    )
@@ -0,0 +1,205 @@
+"""Phase current and voltage waveforms of winding-fault cases from the circuit model.
+
+load_simulation imposes sinusoidal currents (simu.elec = None); a current
+signature diagnosis needs the currents drawn by the faulty machine. Here the
+equivalent circuit of EEC_PMSM (Ud = Rs Id - w Phi_q, Uq = Rs Iq + w Phi_d)
+gives the voltages of the healthy operating point, with Phi_d and Phi_q from
+the flux linkage table of util.flux_lut. These voltages are applied to the
+phase-domain circuit of each fault case:
+
+    u_k = R_k i_k + d(psi_k)/dt,  psi = N L(theta) N i + N psi_m(theta),  sum(i) = 0
+
+where n_k is the ratio of the remaining turns of phase k (winding fault of
+the wind_mat, see create_machine_with_winding_failure), R_k = n_k Rs and
+N = diag(n). The star point is isolated. The circuit is integrated with
+BDF2 (second order, no numerical ringing of the star point voltage) for all
+the cases at once, one batched 4x4 solve per time step, so thousands of
+cases take seconds and no FEA is rerun.
+
+By default the machine is linearized at the healthy operating point
+(comp_dq_parameters): Phi_d = psi_m + Ld id, Phi_q = Lq iq over the whole
+cycle, which ignores the change of saturation with the fault currents. With
+the table itself (lut=...) the flux linkages are interpolated at the
+instantaneous (id, iq) of each case, with a few Newton iterations per step.
+
+    psi_m, Ld, Lq = comp_dq_parameters(lut, Id=-60, Iq=120)
+    res = comp_fault_waveforms(psi_m, Ld, Lq, Rs=0.08, Id=-60, Iq=120, speed=3000, p=4, turn_ratio=ratios)
+    res = comp_fault_waveforms(None, None, None, 0.08, -60, 120, 3000, 4, ratios, lut=lut)
+"""
+
+import numpy as np
+
+from util.tracing import traced
+
+
+def comp_dq_parameters(lut, Id, Iq, dI=1.0):
+    """Magnet flux and apparent inductances of an operating point of a FluxLUT
+
+    psi_m = Phi_d(0, Iq), Ld = (Phi_d(Id, Iq) - psi_m) / Id, Lq = Phi_q(Id, Iq) / Iq
+    (differential inductances of the table when Id or Iq is 0)
+    """
+    Phi_d, Phi_q, _ = lut.interp(Id, Iq)
+    psi_m = lut.interp(0, Iq)[0]
+    if Id != 0:
+        Ld = (Phi_d - psi_m) / Id
+    else:
+        Ld = (lut.interp(-dI, Iq)[0] - Phi_d) / -dI
+    if Iq != 0:
+        Lq = Phi_q / Iq
+    else:
+        Lq = lut.interp(Id, dI)[1] / dI
+    return float(psi_m), float(Ld), float(Lq)
+
+
+def comp_turn_ratio(wind_mat, wind_mat_ref):
+    """Remaining turns of each phase of a faulty winding matrix (qs,)"""
+    turns = np.abs(np.asarray(wind_mat, dtype=float)).sum(axis=(0, 1, 2))
+    turns_ref = np.abs(np.asarray(wind_mat_ref, dtype=float)).sum(axis=(0, 1, 2))
+    return turns / turns_ref
+
+
+def comp_inv_park(theta, qs=3):
+    """Inverse Park matrix (..., qs, 2) of the electrical angles theta"""
+    shift = np.asarray(theta)[..., None] - 2 * np.pi * np.arange(qs) / qs
+    return np.stack([np.cos(shift), -np.sin(shift)], axis=-1)
+
+
+@traced()
+def comp_fault_waveforms(
+    psi_m,
+    Ld,
+    Lq,
+    Rs,
+    Id,
+    Iq,
+    speed,
+    p,
+    turn_ratio,
+    fs=None,
+    nb_period=10,
+    nb_period_settle=5,
+    qs=3,
+    lut=None,
+    tol=1e-6,
+    max_iter=20,
+):
+    """Phase currents and voltages of a batch of winding-fault cases
+
+    Args:
+        psi_m, Ld, Lq (float): machine linearized at the operating point
+            (comp_dq_parameters), not used with lut
+        Rs (float): healthy phase resistance [Ohm]
+        Id, Iq (float): healthy operating point [A peak], sets the applied voltages
+        speed (float): rotor speed [rpm]
+        p (int): pole pairs
+        turn_ratio (array): remaining turns per phase (B, qs), 1 for a healthy phase
+        fs (float): sample rate [Hz], 256 samples per electrical period by default
+        nb_period (int): electrical periods returned
+        nb_period_settle (int): electrical periods computed and dropped (fault transient)
+        lut (FluxLUT): flux linkages interpolated at the instantaneous (id, iq) of each case
+        tol, max_iter: Newton iterations of each time step with lut (relative current change)
+
+    Returns:
+        dict: "time" (Nt,), "Is" and "Us" (B, Nt, qs) phase currents [A] and voltages [V],
+            "theta" (Nt,) electrical angle of the d axis
+    """
+    n = np.atleast_2d(np.asarray(turn_ratio, dtype=float))  # (B, qs)
+    B = n.shape[0]
+    omega = 2 * np.pi * p * speed / 60
+    fs = fs or 256 * omega / (2 * np.pi)
+    dt = 1 / fs
+    Nt_settle = int(round(nb_period_settle * 2 * np.pi / omega / dt))
+    Nt = int(round(nb_period * 2 * np.pi / omega / dt))
+    theta = omega * dt * np.arange(1, Nt_settle + Nt + 1)
+
+    # Healthy steady state: applied voltages and initial currents
+    if lut is None:
+        Phi_d, Phi_q = psi_m + Ld * Id, Lq * Iq
+    else:
+        Phi_d, Phi_q, _ = lut.interp(Id, Iq)
+    Ud = Rs * Id - omega * Phi_q
+    Uq = Rs * Iq + omega * Phi_d
+    P_inv = comp_inv_park(theta, qs)  # (Nt, qs, 2)
+    U = P_inv.dot([Ud, Uq])  # (Nt, qs)
+    P0_inv = comp_inv_park(0.0, qs)
+    i = np.broadcast_to(P0_inv.dot([Id, Iq]), (B, qs)).copy()
+    v_n = np.zeros(B)
+    if lut is None:
+        L_dq = np.diag([Ld, Lq])
+        L_abc = np.einsum("tkd,de,tje->tkj", P_inv, L_dq, P_inv) * 2 / qs  # (Nt, qs, qs)
+        psi_pm = psi_m * P_inv[:, :, 0]  # (Nt, qs)
+        NN = n[:, :, None] * n[:, None, :]  # (B, qs, qs)
+        psi = np.einsum("bkj,bj->bk", NN * (P0_inv.dot(L_dq).dot(P0_inv.T) * 2 / qs), i) + n * psi_m * P0_inv[:, 0]
+    else:
+        psi, _ = _comp_flux_lut(lut, n, i, P0_inv)
+
+    # BDF2 (backward Euler on the first step) with the star point voltage v_n:
+    # (N L N + h R) i + h v_n = (4 psi_k - psi_k-1) / 3 + h u - N psi_pm, h = 2 dt / 3
+    # With lut, Newton on psi(i) + h R i + h v_n = (4 psi_k - psi_k-1) / 3 + h u
+    R = Rs * n  # (B, qs)
+    M = np.zeros((B, qs + 1, qs + 1))
+    M[:, qs, :qs] = 1
+    diag = np.arange(qs)
+    Is, Us = np.empty((B, Nt, qs)), np.empty((B, Nt, qs))
+    rhs = np.zeros((B, qs + 1))
+    psi_prev = None
+    for k in range(Nt_settle + Nt):
+        h = dt if psi_prev is None else 2 * dt / 3
+        psi_hist = psi if psi_prev is None else (4 * psi - psi_prev) / 3
+        M[:, :qs, qs] = h
+        if lut is None:
+            L = NN * L_abc[k]
+            M[:, :qs, :qs] = L
+            M[:, diag, diag] += h * R
+            rhs[:, :qs] = psi_hist + h * U[k] - n * psi_pm[k]
+            x = np.linalg.solve(M, rhs[..., None])[..., 0]
+            i, v_n = x[:, :qs], x[:, qs]
+            psi_new = np.einsum("bkj,bj->bk", L, i) + n * psi_pm[k]
+        else:
+            for _ in range(max_iter):
+                psi_new, dpsi = _comp_flux_lut(lut, n, i, P_inv[k])
+                M[:, :qs, :qs] = dpsi
+                M[:, diag, diag] += h * R
+                rhs[:, :qs] = psi_hist + h * U[k] - psi_new - h * R * i - h * v_n[:, None]
+                rhs[:, qs] = -i.sum(axis=1)
+                dx = np.linalg.solve(M, rhs[..., None])[..., 0]
+                i, v_n = i + dx[:, :qs], v_n + dx[:, qs]
+                psi_new = psi_new + np.einsum("bkj,bj->bk", dpsi, dx[:, :qs])
+                if np.max(np.abs(dx[:, :qs])) <= tol * max(np.max(np.abs(i)), 1.0):
+                    break
+        psi_prev, psi = psi, psi_new
+        if k >= Nt_settle:
+            Is[:, k - Nt_settle] = i
+            Us[:, k - Nt_settle] = U[k] - v_n[:, None]
+    return {"time": dt * np.arange(Nt), "Is": Is, "Us": Us, "theta": theta[Nt_settle:]}
+
+
+def _comp_flux_lut(lut, n, i, P_inv, dI=1.0):
+    """Phase flux linkages (B, qs) of the currents i (B, qs) and their derivative (B, qs, qs)
+
+    The table is interpolated at (id, iq) of the ampere-turns n i, the
+    derivative of Phi_dq by central differences of dI.
+    """
+    qs = P_inv.shape[0]
+    i_dq = (n * i).dot(P_inv) * 2 / qs  # (B, 2)
+    steps = np.array([[0, 0], [dI, 0], [-dI, 0], [0, dI], [0, -dI]])
+    points = i_dq[:, None, :] + steps  # (B, 5, 2)
+    Phi = np.stack(lut.interp(points[..., 0], points[..., 1])[:2], axis=-1)  # (B, 5, 2)
+    J = np.stack([Phi[:, 1] - Phi[:, 2], Phi[:, 3] - Phi[:, 4]], axis=-1) / (2 * dI)  # dPhi_d,q / di_d,q
+    psi = n * Phi[:, 0].dot(P_inv.T)
+    dpsi = np.einsum("bk,kd,bde,je,bj->bkj", n, P_inv, J, P_inv, n) * 2 / qs
+    return psi, dpsi
+
+
+def comp_sequence_currents(Is, theta):
+    """Positive and negative sequence current amplitudes (B,) of phase currents (B, Nt, qs)
+
+    The negative sequence, zero for a healthy machine, is the usual current
+    signature of a winding fault.
+    """
+    qs = Is.shape[-1]
+    a = np.exp(2j * np.pi * np.arange(qs) / qs)
+    vector = 2 / qs * Is.dot(a)  # space vector (B, Nt)
+    positive = np.abs(np.mean(vector * np.exp(-1j * theta), axis=-1))
+    negative = np.abs(np.mean(np.conj(vector) * np.exp(-1j * theta), axis=-1))
+    return positive, negative
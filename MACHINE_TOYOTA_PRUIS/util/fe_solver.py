@@ -0,0 +1,941 @@
+"""Built-in sparse finite element magnetostatic solver.
+
+Solves the 2D magnetostatic problem (vector potential Az, linear triangles)
+on the GMSH mesh written by gmsh_export, with scipy.sparse only, so that a
+simulation can run headless on Linux nodes without FEMM.
+
+Rotor motion is handled with a moving band: the rotor side of the airgap
+(between the rotor bore and the mid-airgap arc) is re-triangulated for each
+rotor position while the rest of the mesh is kept as it is.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from os.path import join
+from tempfile import mkdtemp
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import splu, spsolve
+from scipy.spatial import Delaunay
+
+from util.tracing import traced
+
+MU0 = 4e-7 * np.pi
+
+# Element kinds
+AIR, IRON_STATOR, IRON_ROTOR, MAGNET, WINDING = 0, 1, 2, 3, 4
+
+try:
+    from pyleecan.Functions.labels import HOLEM_LAB, LAM_LAB, MAG_LAB, SHAFT_LAB, WIND_LAB
+except ImportError:  # same strings as pyleecan.Functions.labels
+    HOLEM_LAB, LAM_LAB, MAG_LAB, SHAFT_LAB, WIND_LAB = "HoleMag", "Lamination", "Magnet", "Shaft", "Wind"
+
+# First matching substring of the GMSH physical name (pyleecan surface
+# label, e.g. "Rotor-0_HoleMag_R0-T0-S0") gives the element kind, unmatched
+# surfaces (HoleVoid, SlotOpening, Wedge, Airgap...) are air
+REGION_RULES = [
+    (HOLEM_LAB, MAGNET),  # interior magnets (HoleM50...)
+    (MAG_LAB, MAGNET),  # surface magnets
+    (WIND_LAB, WINDING),
+    (LAM_LAB, IRON_STATOR),
+    (SHAFT_LAB, IRON_ROTOR),
+]
+
+
+@traced()
+def read_mesh(path):
+    """Read a GMSH .msh file into plain numpy arrays
+
+    Returns a dict with the node coordinates, the triangles, the physical
+    name of each triangle and the node indices of each named boundary.
+    """
+    import meshio
+
+    msh = meshio.read(path)
+    names = {int(v[0]): k for k, v in msh.field_data.items()}
+
+    tri_list, tag_list = [], []
+    boundaries = dict()
+    for block, tags in zip(msh.cells, msh.cell_data["gmsh:physical"]):
+        if block.type == "triangle":
+            tri_list.append(block.data)
+            tag_list.append(tags)
+        elif block.type == "line":
+            for tag in np.unique(tags):
+                name = names.get(int(tag), str(tag))
+                nodes = np.unique(block.data[tags == tag])
+                boundaries[name] = np.union1d(boundaries.get(name, []), nodes).astype(int)
+
+    if len(tri_list) == 0:
+        raise Exception("No triangle in mesh " + str(path))
+
+    tri = np.vstack(tri_list)
+    tag = np.concatenate(tag_list)
+    return {
+        "nodes": np.array(msh.points[:, :2], dtype=float),
+        "tri": tri.astype(int),
+        "label": np.array([names.get(int(t), str(t)) for t in tag]),
+        "boundaries": boundaries,
+    }
+
+
+def classify_elements(mesh, Rgap, region_rules=REGION_RULES):
+    """Element kind from the physical names, iron split by side of the airgap"""
+
+    kind = np.full(len(mesh["tri"]), AIR, dtype=int)
+    for label in np.unique(mesh["label"]):
+        for key, value in region_rules:
+            if key.lower() in label.lower():
+                kind[mesh["label"] == label] = value
+                break
+
+    radius = np.hypot(*_centroid(mesh["nodes"], mesh["tri"]).T)
+    is_rotor_iron = (kind == IRON_STATOR) & (radius < Rgap)
+    kind[is_rotor_iron] = IRON_ROTOR
+    return kind
+
+
+@traced()
+def build_problem(
+    mesh, machine, type_BH_stator=0, type_BH_rotor=0, T_mag=20, region_rules=REGION_RULES
+):
+    """Pre-compute everything that does not depend on the rotor position
+
+    The rotor side of the airgap is removed from the mesh, it is rebuilt by
+    comp_band for each rotor position.
+    """
+
+    Rrot = machine.rotor.Rext
+    Rgap = machine.comp_Rgap_mec()
+    tol = 1e-5 * Rgap
+
+    nodes, tri = mesh["nodes"], _orient(mesh["nodes"], mesh["tri"])
+    kind = classify_elements(mesh, Rgap, region_rules)
+    radius = np.hypot(*_centroid(nodes, tri).T)
+
+    # Moving band: rotor side of the airgap
+    is_band = (radius > Rrot) & (radius < Rgap)
+    tri, kind = tri[~is_band], kind[~is_band]
+    radius = radius[~is_band]
+
+    Nnode = len(nodes)
+    is_rotor_node = np.zeros(Nnode, dtype=bool)
+    is_rotor_node[tri[radius < Rrot].ravel()] = True
+    is_stator_node = np.zeros(Nnode, dtype=bool)
+    is_stator_node[tri[radius > Rgap].ravel()] = True
+    if np.any(is_rotor_node & is_stator_node):
+        raise Exception("Rotor and stator meshes are connected, no moving band possible")
+
+    node_radius = np.hypot(*nodes.T)
+    band_in = np.where(is_rotor_node & (np.abs(node_radius - Rrot) < tol))[0]
+    band_out = np.where(is_stator_node & (np.abs(node_radius - Rgap) < tol))[0]
+    if len(band_in) < 3 or len(band_out) < 3:
+        raise Exception("Mesh has no node on the rotor bore or on the mid-airgap arc")
+
+    # Outer boundary (or VP0 boundary when an airbox is drawn) and orphan nodes
+    if "VP0_BOUNDARY" in mesh["boundaries"]:
+        fixed = mesh["boundaries"]["VP0_BOUNDARY"]
+    else:
+        fixed = np.where(node_radius > node_radius[is_stator_node].max() - tol)[0]
+    is_used = is_rotor_node | is_stator_node
+    fixed = np.union1d(fixed, np.where(~is_used)[0]).astype(int)
+
+    problem = {
+        "nodes": nodes,
+        "tri": tri,
+        "kind": kind,
+        "is_rotor_node": is_rotor_node,
+        "band_in": band_in,
+        "band_out": band_out,
+        "Rrot": Rrot,
+        "Rgap": Rgap,
+        "fixed": fixed,
+        "L1": machine.stator.L1,
+    }
+    problem.update(_comp_winding(machine, nodes, tri, kind))
+    problem.update(_comp_magnets(machine, nodes, tri, kind, T_mag))
+    problem["materials"] = {
+        AIR: _linear_material(1),
+        WINDING: _linear_material(1),
+        MAGNET: _linear_material(problem["mur_magnet"]),
+        IRON_STATOR: _iron_material(machine.stator.mat_type, type_BH_stator),
+        IRON_ROTOR: _iron_material(machine.rotor.mat_type, type_BH_rotor),
+    }
+    problem["is_linear"] = type_BH_stator != 0 and type_BH_rotor != 0
+    return problem
+
+
+def comp_band(problem, nodes):
+    """Triangulate the rotor side of the airgap for the current node positions"""
+
+    idx = np.concatenate([problem["band_in"], problem["band_out"]])
+    dela = Delaunay(nodes[idx], qhull_options="QJ")
+    tri = idx[dela.simplices]
+    radius = np.hypot(*_centroid(nodes, tri).T)
+    is_kept = (radius > problem["Rrot"]) & (radius < problem["Rgap"])
+    return _orient(nodes, tri[is_kept])
+
+
+def solve_step(problem, theta, Is, A0=None, tol=1e-6, max_iter=50):
+    """Solve one rotor position
+
+    Args:
+        problem (dict): output of build_problem
+        theta (float): rotor angle [rad]
+        Is (array): phase currents [A]
+        A0 (array): initial guess for the nonlinear iterations
+
+    Returns:
+        dict: nodal potential A, element flux density B, torque, number of
+        nonlinear iterations and the geometry of the moving band
+    """
+
+    nodes = problem["nodes"].copy()
+    rot = problem["is_rotor_node"]
+    nodes[rot] = _rotate(nodes[rot], theta)
+
+    band = comp_band(problem, nodes)
+    tri = np.vstack([problem["tri"], band])
+    kind = np.concatenate([problem["kind"], np.full(len(band), AIR)])
+    area, grad = _comp_geometry(nodes, tri)
+
+    f = _comp_source(problem, tri, kind, area, grad, theta, Is)
+    A, nb_iter = _solve_system(problem, tri, kind, area, grad, f, A0, tol, max_iter)
+
+    B = _comp_B(A, tri, grad)
+    Nstat = len(problem["tri"])
+    Tem = _comp_torque(problem, nodes, band, area[Nstat:], B[Nstat:])
+    return {"A": A, "B": B, "Tem": Tem, "nb_iter": nb_iter, "nodes": nodes, "band": band}
+
+
+def comp_airgap_flux(problem, result, angle):
+    """Radial and tangential flux density in the middle of the moving band"""
+
+    idx = _locate_airgap(problem, result["nodes"], result["band"], angle)
+    B = result["B"][len(problem["tri"]):][idx]
+    return _comp_rad_tan(B, angle)
+
+
+def _locate_airgap(problem, nodes, band, angle):
+    """Band element containing each point of the mid-band circle"""
+
+    Rs = (problem["Rrot"] + problem["Rgap"]) / 2
+    points = Rs * np.column_stack([np.cos(angle), np.sin(angle)])
+
+    # Band elements are convex and disjoint: point location by barycentric test
+    x0 = nodes[band[:, 0]]
+    d1 = nodes[band[:, 1]] - x0
+    d2 = nodes[band[:, 2]] - x0
+    det = d1[:, 0] * d2[:, 1] - d1[:, 1] * d2[:, 0]
+    centroid = _centroid(nodes, band)
+    idx = np.empty(len(points), dtype=int)
+    for ii, pt in enumerate(points):
+        rel = pt - x0
+        l1 = (rel[:, 0] * d2[:, 1] - rel[:, 1] * d2[:, 0]) / det
+        l2 = (d1[:, 0] * rel[:, 1] - d1[:, 1] * rel[:, 0]) / det
+        inside = np.where((l1 >= -1e-9) & (l2 >= -1e-9) & (l1 + l2 <= 1 + 1e-9))[0]
+        if len(inside) > 0:
+            idx[ii] = inside[0]
+        else:
+            idx[ii] = np.argmin(np.sum((centroid - pt) ** 2, axis=1))
+    return idx
+
+
+def _comp_rad_tan(B, angle):
+    """Radial and tangential components of B (E, 2, ...) at the given angles"""
+    shape = (-1,) + (1,) * (B.ndim - 2)
+    cos, sin = np.cos(angle).reshape(shape), np.sin(angle).reshape(shape)
+    Br = B[:, 0] * cos + B[:, 1] * sin
+    Bt = -B[:, 0] * sin + B[:, 1] * cos
+    return Br, Bt
+
+
+def comp_flux_linkage(problem, result):
+    """Flux linkage of each stator phase [Wb]"""
+    return _comp_flux_linkage(problem, result["A"])
+
+
+def _comp_flux_linkage(problem, A):
+    """Flux linkage (qs, ...) for nodal potentials A (N, ...)"""
+    Phi = 0
+    for k, (elem, area) in enumerate(zip(problem["slot_elem"], problem["slot_area"])):
+        A_elem = A[problem["tri"][elem]].mean(axis=1)
+        A_mean = np.tensordot(problem["elem_area"][elem], A_elem, axes=(0, 0)) / area
+        Ncond = problem["wind_mat"][problem["slot_index"][k]]
+        Phi = Phi + np.multiply.outer(Ncond, A_mean)
+    return problem["L1"] * Phi / problem["Npcp"]
+
+
+def solve_steps(problem, theta_list, Is_list, angle, tol=1e-6, max_iter=50, A0_list=None, is_keep_A=False):
+    """Solve a sequence of rotor positions (one worker)
+
+    Each step starts from the solution of the previous one, or from A0_list
+    (Nt, Nnode) when given (reference solution of a close variant). The
+    nodal potentials "A" (Nt, Nnode) are only returned with is_keep_A (warm
+    start of other variants, mesh iron losses).
+    """
+
+    Tem, Br, Bt, Phi, nb_iter, A_list = [], [], [], [], [], []
+    A0 = None
+    for ii, (theta, Is) in enumerate(zip(theta_list, Is_list)):
+        if A0_list is not None:
+            A0 = A0_list[ii]
+        res = solve_step(problem, theta, Is, A0=A0, tol=tol, max_iter=max_iter)
+        br, bt = comp_airgap_flux(problem, res, angle)
+        Tem.append(res["Tem"])
+        Br.append(br)
+        Bt.append(bt)
+        Phi.append(comp_flux_linkage(problem, res))
+        nb_iter.append(res["nb_iter"])
+        if is_keep_A:
+            A_list.append(res["A"])
+        A0 = res["A"]
+    result = {
+        "Tem": np.array(Tem),
+        "Br": np.array(Br),
+        "Bt": np.array(Bt),
+        "Phi_wind": np.array(Phi),
+        "nb_iter": np.array(nb_iter),
+    }
+    if is_keep_A:
+        result["A"] = np.array(A_list)
+    return result
+
+
+def solve_superposition(problem, theta, segments=None):
+    """Linear materials: potentials due to the magnets alone and to 1A in each phase
+
+    The stiffness matrix of the rotor position is factorized once (sparse LU)
+    and solved for the 1 + qs right-hand sides at the same time, the field of
+    any set of currents is then a linear combination of these columns.
+
+    Args:
+        segments (tuple): (segment index of the elements of each magnet, nb_seg)
+            to get one column per magnet segment instead of all the magnets
+
+    Returns:
+        dict: nodal potentials A (N, 1 + qs), or (N, Nmag * nb_seg + qs) with
+            segments, and the geometry of the position
+    """
+    if not problem["is_linear"]:
+        raise Exception("Superposition requires linear materials (type_BH_stator/rotor != 0)")
+
+    nodes = problem["nodes"].copy()
+    rot = problem["is_rotor_node"]
+    nodes[rot] = _rotate(nodes[rot], theta)
+    band = comp_band(problem, nodes)
+    tri = np.vstack([problem["tri"], band])
+    kind = np.concatenate([problem["kind"], np.full(len(band), AIR)])
+    area, grad = _comp_geometry(nodes, tri)
+
+    Nnode, qs = len(nodes), problem["wind_mat"].shape[1]
+    free = np.ones(Nnode, dtype=bool)
+    free[problem["fixed"]] = False
+    nu, _ = _elem_nu(problem, kind, np.zeros(len(tri)))
+    Ke = np.einsum("eid,ejd->eij", grad, grad) * (area * nu)[:, None, None]
+    lu = splu(_assemble(tri, Ke, Nnode)[free][:, free].tocsc())
+
+    if segments is None:
+        F_mag = _comp_magnet_source(problem, tri, area, grad, theta)[:, None]
+    else:
+        seg_list, nb_seg = segments
+        F_mag = np.zeros((Nnode, len(seg_list) * nb_seg))
+        source = _comp_magnet_elem_source(problem, area, grad, theta)
+        for m, (elem, fe) in enumerate(zip(problem["magnet_elem"], source)):
+            np.add.at(F_mag, (tri[elem], m * nb_seg + seg_list[m][:, None]), fe)
+    F = np.zeros((Nnode, F_mag.shape[1] + qs))
+    F[:, : F_mag.shape[1]] = F_mag
+    for ph in range(qs):
+        F[:, F_mag.shape[1] + ph] = _comp_winding_source(problem, tri, area, np.eye(qs)[ph])
+    A = np.zeros((Nnode, F.shape[1]))
+    A[free] = lu.solve(F[free])
+    return {"A": A, "nodes": nodes, "band": band, "tri": tri, "area": area, "grad": grad}
+
+
+def solve_current_sweep(problem, theta_list, Is_list, angle):
+    """Solve a sequence of rotor positions for several current waveforms (one worker)
+
+    Args:
+        problem (dict): output of build_problem with linear materials
+        theta_list (array): rotor angles (Nt,) [rad]
+        Is_list (array): phase currents of each operating point (Nop, Nt, qs) [A]
+        angle (array): airgap angles (Nangle,) [rad]
+
+    Returns:
+        dict: Tem (Nt, Nop), Br and Bt (Nt, Nop, Nangle), Phi_wind (Nt, Nop, qs)
+    """
+    Is_list = np.asarray(Is_list, dtype=float)
+    Nop = Is_list.shape[0]
+    Nstat = len(problem["tri"])
+
+    Tem, Br, Bt, Phi = [], [], [], []
+    for it, theta in enumerate(theta_list):
+        base = solve_superposition(problem, theta)
+        coef = np.column_stack([np.ones(Nop), Is_list[:, it, :]])  # (Nop, 1 + qs)
+        B = _comp_B(base["A"], base["tri"], base["grad"])[Nstat:]  # (Eb, 2, 1 + qs)
+        B = np.einsum("edk,ok->edo", B, coef)
+
+        Tem.append(_comp_torque(problem, base["nodes"], base["band"], base["area"][Nstat:], B))
+
+        idx = _locate_airgap(problem, base["nodes"], base["band"], angle)
+        br, bt = _comp_rad_tan(B[idx], angle)
+        Br.append(br.T)
+        Bt.append(bt.T)
+        Phi.append(coef.dot(_comp_flux_linkage(problem, base["A"]).T))
+    return {
+        "Tem": np.array(Tem),
+        "Br": np.array(Br),
+        "Bt": np.array(Bt),
+        "Phi_wind": np.array(Phi),
+        "nb_iter": np.ones(len(theta_list), dtype=int),
+    }
+
+
+def _solve_chunk(args):
+    return args[0](*args[1:])
+
+
+def _run_chunks(func, nb_worker, Nt, args):
+    """Run func on nb_worker contiguous chunks of the Nt time steps
+
+    args is called with the step indices of each chunk and returns the
+    arguments of func, the results are concatenated along the first axis.
+    """
+    chunks = [c for c in np.array_split(np.arange(Nt), max(1, nb_worker)) if len(c) > 0]
+    arg_list = [(func,) + args(c) for c in chunks]
+    if len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            res_list = list(pool.map(_solve_chunk, arg_list))
+    else:
+        res_list = [_solve_chunk(arg_list[0])]
+    return {k: np.concatenate([r[k] for r in res_list]) for k in res_list[0]}
+
+
+class MagScipy:
+    """Magnetic model solved with the built-in sparse FE solver
+
+    Same role as MagFEMM: holds the settings of the magnetic model and
+    fills out.mag with B(time, angle) and Tem(time).
+    """
+
+    def __init__(
+        self,
+        type_BH_stator=0,
+        type_BH_rotor=0,
+        T_mag=20,
+        nb_worker=1,
+        file_name="",
+        mesh_cache=None,
+        tol=1e-6,
+        max_iter=50,
+        region_rules=REGION_RULES,
+        solution_cache=None,
+    ):
+        self.type_BH_stator = type_BH_stator
+        self.type_BH_rotor = type_BH_rotor
+        self.T_mag = T_mag
+        self.nb_worker = nb_worker
+        self.file_name = file_name  # Existing .msh file, drawn with gmsh_export if empty
+        self.mesh_cache = mesh_cache  # MeshCache (or its folder) to reuse meshes by geometry
+        self.tol = tol
+        self.max_iter = max_iter
+        self.region_rules = region_rules
+        self.solution_cache = solution_cache  # SolutionCache to warm-start close variants
+        self.Phi_wind = None
+        self.nb_iter = None
+
+    @traced()
+    def get_mesh(self, output):
+        if self.file_name:
+            return read_mesh(self.file_name)
+        if self.mesh_cache is not None:
+            from util.mesh_cache import MeshCache
+
+            if not isinstance(self.mesh_cache, MeshCache):
+                self.mesh_cache = MeshCache(self.mesh_cache)
+            return self.mesh_cache.get_mesh(output)
+        from util.simulation import gmsh_export
+
+        path = join(mkdtemp(), "model.msh")
+        gmsh_export(out=output, path_save=path)
+        return read_mesh(path)
+
+    @traced()
+    def get_problem(self, output):
+        mesh = self.get_mesh(output)
+        return build_problem(
+            mesh,
+            output.simu.machine,
+            type_BH_stator=self.type_BH_stator,
+            type_BH_rotor=self.type_BH_rotor,
+            T_mag=self.T_mag,
+            region_rules=self.region_rules,
+        )
+
+    @traced()
+    def run(self, output):
+        simu = output.simu
+        problem = self.get_problem(output)
+        res = self.solve_input(problem, simu, np.asarray(simu.input.Is))
+        self.Phi_wind = res["Phi_wind"]
+        self.nb_iter = res["nb_iter"]
+        time, angle = np.asarray(simu.input.time), np.asarray(simu.input.angle)
+        store_output(output, time, angle, res["Br"], res["Bt"], res["Tem"])
+        return output
+
+    def solve_input(self, problem, simu, Is):
+        """Solve the time and angle axes of simu.input for the phase currents Is (Nt, qs)
+
+        The rotor turns in the direction of the stator field (rot_dir, as
+        pyleecan and util.simulation.comp_stator_currents) and the torque is
+        counted positive in that direction, as in the MagFEMM outputs.
+        """
+        theta = _rotor_angle(simu, np.asarray(simu.input.time))
+        res = self.solve(problem, theta, Is, np.asarray(simu.input.angle))
+        res["Tem"] = _rot_dir(simu) * res["Tem"]
+        return res
+
+    @traced()
+    def solve(self, problem, theta, Is, angle, is_keep_A=False):
+        """Solve all the rotor positions, split in nb_worker contiguous chunks
+
+        The nodal potentials "A" of the non-linear path are returned with
+        is_keep_A, and always kept for the solution_cache.
+        """
+
+        if problem["is_linear"]:
+            res = self.solve_sweep(problem, theta, np.asarray(Is)[None], angle)
+            return {k: v if k == "nb_iter" else v[0] for k, v in res.items()}
+        A0 = None
+        is_cache = self.solution_cache is not None
+        if is_cache:
+            A0 = self.solution_cache.get_initial(problem, theta)
+        res = _run_chunks(
+            solve_steps,
+            self.nb_worker,
+            len(theta),
+            lambda c: (
+                problem,
+                theta[c],
+                Is[c],
+                angle,
+                self.tol,
+                self.max_iter,
+                None if A0 is None else A0[c],
+                is_keep_A or is_cache,
+            ),
+        )
+        if is_cache:
+            self.solution_cache.add(problem, theta, res["A"])
+            if not is_keep_A:
+                del res["A"]
+        return res
+
+    @traced()
+    def solve_sweep(self, problem, theta, Is_list, angle):
+        """Linear fast path: all the operating points (Nop, Nt, qs) as one multi-RHS batch
+
+        Returns arrays with the operating point first: Tem (Nop, Nt),
+        Br and Bt (Nop, Nt, Nangle), Phi_wind (Nop, Nt, qs).
+        """
+        Is_list = np.asarray(Is_list, dtype=float)
+        res = _run_chunks(
+            solve_current_sweep,
+            self.nb_worker,
+            len(theta),
+            lambda c: (problem, theta[c], Is_list[:, c], angle),
+        )
+        return {k: v if k == "nb_iter" else np.moveaxis(v, 0, 1) for k, v in res.items()}
+
+
+class SimuScipy:
+    """Simulation with the magnetic model solved by MagScipy
+
+    Wraps the pyleecan simulation that defines the machine and the input,
+    so that run_simulation can call run() exactly as for a Simu1.
+    """
+
+    def __init__(self, simu, mag):
+        self.simu = simu
+        self.mag = mag
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__["simu"], name)
+
+    @traced()
+    def run(self):
+        from pyleecan.Classes.Output import Output
+
+        output = Output(simu=self.simu)
+        return self.mag.run(output)
+
+    @traced()
+    def run_sweep(self, Is_list):
+        """Run several current waveforms (Nop, Nt, qs) on the same machine and time axis
+
+        The mesh and the problem are built once; with linear materials all the
+        operating points are solved from one LU factorization per rotor position.
+
+        Returns:
+            list: one Output per operating point, its simu.input.Is holds the currents
+        """
+        from pyleecan.Classes.Output import Output
+
+        time = np.asarray(self.simu.input.time)
+        angle = np.asarray(self.simu.input.angle)
+        theta = _rotor_angle(self.simu, time)
+        problem = self.mag.get_problem(Output(simu=self.simu))
+
+        if problem["is_linear"]:
+            res = self.mag.solve_sweep(problem, theta, Is_list, angle)
+        else:
+            res_list = [self.mag.solve(problem, theta, np.asarray(Is), angle) for Is in Is_list]
+            res = {k: np.array([r[k] for r in res_list]) for k in res_list[0]}
+        res["Tem"] = _rot_dir(self.simu) * res["Tem"]
+
+        out_list = []
+        for iop, Is in enumerate(Is_list):
+            simu = self.simu.copy()
+            simu.input.Is = np.asarray(Is)
+            out = store_output(Output(simu=simu), time, angle, res["Br"][iop], res["Bt"][iop], res["Tem"][iop])
+            out_list.append(out)
+        self.mag.Phi_wind = res["Phi_wind"]
+        return out_list
+
+
+@traced()
+def store_output(output, time, angle, Br, Bt, Tem):
+    """Store the results in out.mag with the same layout as MagFEMM"""
+    from SciDataTool import Data1D, DataTime, VectorField
+
+    if output.mag is None:
+        from pyleecan.Classes.OutMag import OutMag
+
+        output.mag = OutMag()
+    Time = Data1D(name="time", unit="s", values=time)
+    Angle = Data1D(name="angle", unit="rad", values=angle)
+    components = {
+        "radial": DataTime(
+            name="Airgap radial flux density",
+            unit="T",
+            symbol="B_{rad}",
+            axes=[Time, Angle],
+            values=Br,
+        ),
+        "tangential": DataTime(
+            name="Airgap tangential flux density",
+            unit="T",
+            symbol="B_{circ}",
+            axes=[Time, Angle],
+            values=Bt,
+        ),
+    }
+    output.mag.axes_dict = {"time": Time, "angle": Angle}
+    output.mag.B = VectorField(name="Airgap flux density", symbol="B", components=components)
+    output.mag.Tem = DataTime(
+        name="Electromagnetic torque", unit="Nm", symbol="T_{em}", axes=[Time], values=Tem
+    )
+    output.mag.Tem_av = float(np.mean(Tem))
+    output.mag.Tem_rip_pp = float(np.ptp(Tem))
+    if output.mag.Tem_av != 0:
+        output.mag.Tem_rip_norm = output.mag.Tem_rip_pp / abs(output.mag.Tem_av)
+    return output
+
+
+def _rot_dir(simu):
+    """Rotation direction of the rotor and of the stator field (+1 counter-clockwise)"""
+    return simu.machine.stator.comp_mmf_dir()
+
+
+def _rotor_angle(simu, time):
+    N0 = simu.input.OP.N0
+    angle0 = getattr(simu.input, "angle_rotor_initial", 0) or 0
+    return angle0 + _rot_dir(simu) * 2 * np.pi * N0 / 60 * time
+
+
+def _rotate(xy, theta):
+    c, s = np.cos(theta), np.sin(theta)
+    return np.column_stack([c * xy[:, 0] - s * xy[:, 1], s * xy[:, 0] + c * xy[:, 1]])
+
+
+def _centroid(nodes, tri):
+    return nodes[tri].mean(axis=1)
+
+
+def _orient(nodes, tri):
+    """Counter-clockwise triangles"""
+    x = nodes[tri]
+    det = (x[:, 1, 0] - x[:, 0, 0]) * (x[:, 2, 1] - x[:, 0, 1]) - (
+        x[:, 2, 0] - x[:, 0, 0]
+    ) * (x[:, 1, 1] - x[:, 0, 1])
+    tri = tri.copy()
+    tri[det < 0] = tri[det < 0][:, [0, 2, 1]]
+    return tri
+
+
+def _comp_geometry(nodes, tri):
+    """Element area and gradients of the shape functions (E, 3, 2)"""
+    x, y = nodes[tri, 0], nodes[tri, 1]
+    b = np.column_stack([y[:, 1] - y[:, 2], y[:, 2] - y[:, 0], y[:, 0] - y[:, 1]])
+    c = np.column_stack([x[:, 2] - x[:, 1], x[:, 0] - x[:, 2], x[:, 1] - x[:, 0]])
+    area = 0.5 * (b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0])
+    grad = np.stack([b, c], axis=2) / (2 * area[:, None, None])
+    return area, grad
+
+
+def _comp_B(A, tri, grad):
+    """B = curl(Az) per element: Bx = dA/dy, By = -dA/dx, shape (E, 2, ...)"""
+    a = A[tri]
+    return np.stack(
+        [np.einsum("ei,ei...->e...", grad[:, :, 1], a), -np.einsum("ei,ei...->e...", grad[:, :, 0], a)],
+        axis=1,
+    )
+
+
+def _linear_material(mur):
+    return {"is_linear": True, "nu": 1 / (MU0 * mur)}
+
+
+def _iron_material(mat, type_BH):
+    if type_BH == 1:
+        return _linear_material(mat.mag.mur_lin)
+    elif type_BH == 2:
+        return _linear_material(1e5)
+    BH = np.asarray(mat.mag.get_BH(), dtype=float)
+    BH = BH[BH[:, 1] > 0]
+    B2 = BH[:, 1] ** 2
+    nu = BH[:, 0] / BH[:, 1]
+    return {
+        "is_linear": False,
+        "B2": np.concatenate([[0], B2]),
+        "nu": np.concatenate([[nu[0]], nu]),
+        "Bm": BH[-1, 1],
+        "Hm": BH[-1, 0],
+    }
+
+
+def comp_nu(material, B2):
+    """Reluctivity and its derivative with respect to B^2"""
+    if material["is_linear"]:
+        return np.full_like(B2, material["nu"]), np.zeros_like(B2)
+
+    xs, ys = material["B2"], material["nu"]
+    nu = np.interp(B2, xs, ys)
+    k = np.clip(np.searchsorted(xs, B2) - 1, 0, len(xs) - 2)
+    dnu = (ys[k + 1] - ys[k]) / (xs[k + 1] - xs[k])
+
+    # Straight line with mu0 slope above the last point of the curve
+    sat = B2 > xs[-1]
+    if np.any(sat):
+        B = np.sqrt(B2[sat])
+        C = material["Hm"] - material["Bm"] / MU0
+        nu[sat] = C / B + 1 / MU0
+        dnu[sat] = -C / B ** 3 / 2
+    return nu, dnu
+
+
+def _elem_nu(problem, kind, B2):
+    nu, dnu = np.zeros(len(kind)), np.zeros(len(kind))
+    for key, material in problem["materials"].items():
+        mask = kind == key
+        if np.any(mask):
+            nu[mask], dnu[mask] = comp_nu(material, B2[mask])
+    return nu, dnu
+
+
+def _assemble(tri, Ke, Nnode):
+    rows = np.repeat(tri, 3, axis=1).ravel()
+    cols = np.tile(tri, (1, 3)).ravel()
+    return coo_matrix((Ke.ravel(), (rows, cols)), shape=(Nnode, Nnode)).tocsr()
+
+
+def _comp_source(problem, tri, kind, area, grad, theta, Is):
+    """Right-hand side: winding current densities and magnet remanence"""
+    return _comp_winding_source(problem, tri, area, Is) + _comp_magnet_source(
+        problem, tri, area, grad, theta
+    )
+
+
+def _comp_winding_source(problem, tri, area, Is):
+    """J = sum_ph(Ncond * I / Npcp) / slot area in the winding elements"""
+    f = np.zeros(len(problem["nodes"]))
+    J = np.zeros(len(tri))
+    for k, (elem, area_k) in enumerate(zip(problem["slot_elem"], problem["slot_area"])):
+        Ncond = problem["wind_mat"][problem["slot_index"][k]]
+        J[elem] = np.dot(Ncond, Is) / problem["Npcp"] / area_k
+    np.add.at(f, tri, (J * area / 3)[:, None] * np.ones((1, 3)))
+    return f
+
+
+def _comp_magnet_source(problem, tri, area, grad, theta):
+    """int(nu * Br . curl(N)) in the magnet elements, Br turning with the rotor
+
+    Br of a magnet is one vector (2,) or one per element (E, 2) (see
+    util.demagnetization).
+    """
+    f = np.zeros(len(problem["nodes"]))
+    for elem, fe in zip(problem["magnet_elem"], _comp_magnet_elem_source(problem, area, grad, theta)):
+        np.add.at(f, tri[elem], fe)
+    return f
+
+
+def _comp_magnet_elem_source(problem, area, grad, theta):
+    """Element source (E, 3) of each magnet"""
+    nu = problem["materials"][MAGNET]["nu"]
+    source = list()
+    for elem, Br in zip(problem["magnet_elem"], problem["magnet_Br"]):
+        Brx, Bry = _rotate(np.atleast_2d(Br), theta).T
+        g = grad[elem]
+        source.append(nu * area[elem, None] * (Brx[:, None] * g[:, :, 1] - Bry[:, None] * g[:, :, 0]))
+    return source
+
+
+def _solve_system(problem, tri, kind, area, grad, f, A0, tol, max_iter):
+    """Linear solve, or Newton-Raphson with backtracking for B(H) curves"""
+    Nnode = len(problem["nodes"])
+    free = np.ones(Nnode, dtype=bool)
+    free[problem["fixed"]] = False
+    GG = np.einsum("eid,ejd->eij", grad, grad) * area[:, None, None]
+
+    def stiffness(A):
+        B2 = np.sum(_comp_B(A, tri, grad) ** 2, axis=1)
+        nu, dnu = _elem_nu(problem, kind, B2)
+        return nu, dnu, GG * nu[:, None, None]
+
+    if problem["is_linear"] or A0 is None:
+        # Linear solve with the initial reluctivity, starting point of Newton
+        nu, dnu, Ke = stiffness(np.zeros(Nnode))
+        A = np.zeros(Nnode)
+        A[free] = spsolve(_assemble(tri, Ke, Nnode)[free][:, free].tocsc(), f[free])
+        if problem["is_linear"]:
+            return A, 1
+    else:
+        A = np.array(A0, dtype=float)
+    nu, dnu, Ke = stiffness(A)
+
+    f_norm = max(np.linalg.norm(f[free]), 1e-30)
+    for nb_iter in range(1, max_iter + 1):
+        K = _assemble(tri, Ke, Nnode)
+        r = K.dot(A) - f
+        r_norm = np.linalg.norm(r[free])
+        if r_norm <= tol * f_norm:
+            return A, nb_iter
+
+        # Jacobian: K + 2 * area * dnu/dB2 * (G^T B)(G^T B)^T
+        g = np.einsum("eij,ej->ei", GG, A[tri])
+        Je = Ke + 2 * (dnu / area)[:, None, None] * g[:, :, None] * g[:, None, :]
+        J = _assemble(tri, Je, Nnode)
+        dA = np.zeros(Nnode)
+        dA[free] = spsolve(J[free][:, free].tocsc(), -r[free])
+
+        alpha = 1.0
+        while True:
+            A_new = A + alpha * dA
+            nu, dnu, Ke = stiffness(A_new)
+            r_new = _assemble(tri, Ke, Nnode).dot(A_new) - f
+            if np.linalg.norm(r_new[free]) < r_norm or alpha < 1e-3:
+                break
+            alpha /= 2
+        A = A_new
+    return A, max_iter
+
+
+def _comp_torque(problem, nodes, band, area, B):
+    """Arkkio torque from the elements of the moving band (B of shape (E, 2, ...))"""
+    centroid = _centroid(nodes, band)
+    radius = np.hypot(*centroid.T)
+    Br, Bt = _comp_rad_tan(B, np.arctan2(centroid[:, 1], centroid[:, 0]))
+    width = problem["Rgap"] - problem["Rrot"]
+    return problem["L1"] / (MU0 * width) * np.einsum("e,e...->...", area * radius, Br * Bt)
+
+
+def _components(nodes, tri, elem):
+    """Connected groups of elements (sharing at least one node)"""
+    Ne = len(elem)
+    incidence = coo_matrix(
+        (np.ones(3 * Ne), (np.repeat(np.arange(Ne), 3), tri[elem].ravel())),
+        shape=(Ne, len(nodes)),
+    ).tocsr()
+    _, labels = connected_components(incidence.dot(incidence.T), directed=False)
+    return [elem[labels == ii] for ii in range(labels.max() + 1)] if Ne > 0 else []
+
+
+def _comp_winding(machine, nodes, tri, kind):
+    """Slot regions and number of conductors of each phase in each slot"""
+    winding = machine.stator.winding
+    wind_mat = np.asarray(winding.wind_mat, dtype=float)
+    Zs = wind_mat.shape[2]
+    area, _ = _comp_geometry(nodes, tri)
+
+    slot_elem, slot_area, slot_index = [], [], []
+    for elem in _components(nodes, tri, np.where(kind == WINDING)[0]):
+        x, y = np.sum(_centroid(nodes, tri[elem]) * area[elem, None], axis=0)
+        phi = np.arctan2(y, x) % (2 * np.pi)
+        slot_elem.append(elem)
+        slot_area.append(np.sum(area[elem]))
+        # pyleecan convention: slot k centered on (k + 0.5) * 2 * pi / Zs
+        slot_index.append(int(np.round(phi * Zs / (2 * np.pi) - 0.5)) % Zs)
+
+    return {
+        "wind_mat": wind_mat.sum(axis=(0, 1)),
+        "Npcp": winding.Npcp,
+        "slot_elem": slot_elem,
+        "slot_area": np.array(slot_area),
+        "slot_index": np.array(slot_index, dtype=int),
+        "elem_area": area,
+    }
+
+
+def _comp_magnets(machine, nodes, tri, kind, T_mag):
+    """Magnet regions and their remanent flux density vector at angle 0
+
+    Each magnet is magnetized along its short axis, poles are the Zh angular
+    clusters of magnets separated by the largest angular gaps, with
+    alternating polarity. The magnets are sorted by the angle of their
+    centroid, so that neighbouring indices are neighbouring magnets.
+    """
+    hole = machine.rotor.hole[0]
+    magnet = next(
+        getattr(hole, name) for name in ("magnet_0", "magnet_1") if getattr(hole, name, None)
+    )
+    mat = magnet.mat_type.mag
+    Br_T = mat.Brm20 * (1 + mat.alpha_Br * (T_mag - 20))
+
+    area, _ = _comp_geometry(nodes, tri)
+    magnet_elem = _components(nodes, tri, np.where(kind == MAGNET)[0])
+    if len(magnet_elem) == 0:
+        return {"magnet_elem": [], "magnet_Br": [], "mur_magnet": mat.mur_lin}
+
+    center, axis = [], []
+    for elem in magnet_elem:
+        pts = _centroid(nodes, tri[elem])
+        w = area[elem] / np.sum(area[elem])
+        c = np.sum(pts * w[:, None], axis=0)
+        cov = np.einsum("e,ei,ej->ij", w, pts - c, pts - c)
+        _, vect = np.linalg.eigh(cov)
+        u = vect[:, 0]  # short axis
+        center.append(c)
+        axis.append(u if np.dot(u, c) > 0 else -u)
+    center = np.array(center)
+
+    # Angular order (the connected components come in mesh order)
+    phi = np.arctan2(center[:, 1], center[:, 0]) % (2 * np.pi)
+    order = np.argsort(phi, kind="stable")
+    magnet_elem = [magnet_elem[ii] for ii in order]
+    axis = [axis[ii] for ii in order]
+    phi = phi[order]
+
+    # Group the magnets by pole
+    Zh = hole.Zh
+    gap = (np.roll(phi, -1) - phi) % (2 * np.pi)
+    cut = np.sort(np.argsort(gap)[-Zh:])
+    pole = np.searchsorted(cut, np.arange(len(phi))) % Zh
+
+    magnet_Br = [Br_T * (-1) ** pole[ii] * axis[ii] for ii in range(len(magnet_elem))]
+    return {
+        "magnet_elem": magnet_elem,
+        "magnet_Br": magnet_Br,
+        "magnet_pole": pole,
+        "mur_magnet": mat.mur_lin,
+    }
@@ -0,0 +1,222 @@
+"""Geometric feasibility of a machine before its simulation.
+
+Aggressive variants (e.g. Rint+2.0mm_Rext-0.5mm, hybrid generator output)
+can have slots deeper than the yoke, overlapping holes or magnets larger
+than their hole, which only shows up when the FEMM drawing fails minutes
+later. check_machine detects them from the pyleecan geometry (radii, slot
+and hole surfaces) in milliseconds; the result is cached by geometry
+fingerprint, so the winding or magnet variants of a machine are checked once.
+
+    report = check_machine_tree("machines_custom_geom1", nb_worker=8)
+    out = run_simulation(simulation)  # None if the machine is not feasible
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from os.path import join, relpath
+
+import numpy as np
+
+from util.mesh_cache import comp_geometry_fingerprint
+from util.tracing import traced
+
+# Minimum dimensions [m] below which a machine is flagged (warning)
+FEASIBILITY_LIMITS = {
+    "min_airgap": 1e-4,
+    "min_yoke": 1e-3,
+    "min_tooth": 5e-4,
+    "min_bridge": 3e-4,
+}
+REPORT_NAME = "feasibility_report.json"
+
+_cache = dict()
+_CACHE_SIZE = 512
+
+
+@traced()
+def check_machine(machine, limits=FEASIBILITY_LIMITS):
+    """Errors and warnings of the geometry of a machine
+
+    Args:
+        machine: pyleecan machine
+        limits (dict): see FEASIBILITY_LIMITS
+
+    Returns:
+        dict: {"is_feasible": bool, "errors": [str], "warnings": [str]}
+    """
+    key = comp_geometry_fingerprint(machine, extra=sorted(limits.items()))
+    if key not in _cache:
+        if len(_cache) >= _CACHE_SIZE:
+            _cache.pop(next(iter(_cache)))
+        errors, warnings = list(), list()
+        for check in [_check_radii, _check_slots, _check_holes]:
+            try:
+                check(machine, limits, errors, warnings)
+            except Exception as e:
+                warnings.append(check.__name__[7:] + " not checked (" + type(e).__name__ + ": " + str(e) + ")")
+        _cache[key] = (errors, warnings)
+
+    errors, warnings = list(_cache[key][0]), list(_cache[key][1])
+    # pyleecan checks of the winding and magnets (not part of the fingerprint)
+    if hasattr(machine, "check"):
+        try:
+            machine.check()
+        except Exception as e:
+            errors.append("pyleecan check: " + type(e).__name__ + ": " + str(e))
+    _check_magnet_length(machine, warnings)
+    return {"is_feasible": len(errors) == 0, "errors": errors, "warnings": warnings}
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def _check_radii(machine, limits, errors, warnings):
+    stator, rotor = machine.stator, machine.rotor
+    for name, lam in [("stator", stator), ("rotor", rotor)]:
+        if lam.Rint >= lam.Rext:
+            errors.append(name + ": Rint >= Rext (" + _mm(lam.Rint) + " >= " + _mm(lam.Rext) + ")")
+    if getattr(rotor, "is_internal", True):
+        airgap = stator.Rint - rotor.Rext
+    else:
+        airgap = rotor.Rint - stator.Rext
+    if airgap <= 0:
+        errors.append("airgap: rotor and stator overlap (" + _mm(airgap) + ")")
+    elif airgap < limits["min_airgap"]:
+        warnings.append("airgap: " + _mm(airgap) + " < " + _mm(limits["min_airgap"]))
+    shaft = getattr(machine, "shaft", None)
+    if shaft is not None and shaft.Drsh is not None and shaft.Drsh / 2 > rotor.Rint + 1e-9:
+        errors.append("shaft: radius " + _mm(shaft.Drsh / 2) + " > rotor Rint " + _mm(rotor.Rint))
+
+
+def _check_slots(machine, limits, errors, warnings):
+    for name, lam in [("stator", machine.stator), ("rotor", machine.rotor)]:
+        slot = getattr(lam, "slot", None)
+        if slot is None or not getattr(slot, "Zs", 0):
+            continue
+        # Yoke left behind the slots
+        yoke = lam.Rext - lam.Rint - slot.comp_height()
+        if yoke <= 0:
+            errors.append(name + " slot: deeper than the lamination (yoke " + _mm(yoke) + ")")
+        elif yoke < limits["min_yoke"]:
+            warnings.append(name + " slot: yoke " + _mm(yoke) + " < " + _mm(limits["min_yoke"]))
+        # Tooth left between two slots (slot centered on the x axis)
+        points = _comp_points([slot.get_surface()])
+        tooth = np.min(np.abs(points) * (2 * np.pi / slot.Zs - 2 * np.abs(np.angle(points))))
+        if tooth <= 0:
+            errors.append(name + " slot: neighbouring slots overlap (tooth " + _mm(tooth) + ")")
+        elif tooth < limits["min_tooth"]:
+            warnings.append(name + " slot: tooth " + _mm(tooth) + " < " + _mm(limits["min_tooth"]))
+
+
+def _check_holes(machine, limits, errors, warnings):
+    for name, lam in [("rotor", machine.rotor), ("stator", machine.stator)]:
+        for ii, hole in enumerate(getattr(lam, "hole", None) or []):
+            label = name + " hole[" + str(ii) + "]"
+            surf_list = hole.build_geometry()
+            points = _comp_points(surf_list)
+            radius = np.abs(points)
+            # Bridges to the airgap and to the bore
+            if radius.max() >= lam.Rext or radius.min() <= lam.Rint:
+                errors.append(label + ": outside the lamination")
+            elif lam.Rext - radius.max() < limits["min_bridge"]:
+                warnings.append(label + ": bridge " + _mm(lam.Rext - radius.max()) + " < " + _mm(limits["min_bridge"]))
+            # Overlap with the neighbouring holes (hole centered on the x axis)
+            if np.max(np.abs(np.angle(points))) >= np.pi / hole.Zh:
+                errors.append(label + ": overlaps the neighbouring holes")
+            # A magnet larger than its hole leaves air surfaces of negative width
+            for surf in surf_list:
+                if surf.comp_surface() <= 0:
+                    errors.append(label + ": degenerate surface " + str(surf.label))
+
+
+def _check_magnet_length(machine, warnings):
+    L1 = getattr(machine.rotor, "L1", None)
+    for hole in getattr(machine.rotor, "hole", None) or []:
+        for key in ["magnet_0", "magnet_1", "magnet_2"]:
+            magnet = getattr(hole, key, None)
+            if magnet is not None and L1 is not None and magnet.Lmag is not None and magnet.Lmag > L1:
+                warnings.append("rotor " + key + ": Lmag " + _mm(magnet.Lmag) + " > L1 " + _mm(L1))
+
+
+def _comp_points(surf_list, nb_point=100):
+    return np.concatenate([np.asarray(surf.discretize(nb_point)).ravel() for surf in surf_list])
+
+
+def _mm(value):
+    return "%.2fmm" % (value * 1e3)
+
+
+def check_file(path):
+    """check_machine of a machine file, with its path and check time [s]"""
+    t0 = time.perf_counter()
+    try:
+        from pyleecan.Functions.load import load
+
+        result = check_machine(load(path))
+    except Exception as e:
+        result = {"is_feasible": False, "errors": ["load: " + type(e).__name__ + ": " + str(e)], "warnings": []}
+    result["path"] = path
+    result["time"] = time.perf_counter() - t0
+    return result
+
+
+def find_machine_files(root):
+    """Machine files (json of a pyleecan Machine*) under root, materials and simulations excluded"""
+    path_list = list()
+    for folder, _, file_list in os.walk(root):
+        for file_name in sorted(file_list):
+            if not file_name.endswith(".json") or file_name == REPORT_NAME:
+                continue
+            path = join(folder, file_name)
+            try:
+                with open(path) as f:
+                    class_name = json.load(f).get("__class__", "")
+            except (ValueError, AttributeError, UnicodeDecodeError):
+                continue
+            if class_name.startswith("Machine"):
+                path_list.append(path)
+    return path_list
+
+
+@traced()
+def check_machine_tree(root, nb_worker=None, report_path=None):
+    """Check every machine file under root in parallel and write the report
+
+    Args:
+        root (str): folder of machine files (sub-folders included)
+        nb_worker (int): processes, os.cpu_count() by default
+        report_path (str): join(root, REPORT_NAME) by default
+
+    Returns:
+        dict: report, {"machines": {relative path: check_file result}, ...}
+    """
+    path_list = find_machine_files(root)
+    if nb_worker == 1 or len(path_list) < 2:
+        result_list = [check_file(path) for path in path_list]
+    else:
+        with ProcessPoolExecutor(max_workers=nb_worker) as pool:
+            result_list = list(pool.map(check_file, path_list, chunksize=max(1, len(path_list) // 64)))
+
+    machines = {relpath(res.pop("path"), root): res for res in result_list}
+    report = {
+        "root": os.path.abspath(root),
+        "nb_machine": len(machines),
+        "nb_infeasible": sum(not res["is_feasible"] for res in machines.values()),
+        "machines": machines,
+    }
+    with open(report_path or join(root, REPORT_NAME), "w") as f:
+        json.dump(report, f, indent=1)
+    print(report["nb_infeasible"], "/", report["nb_machine"], "machines flagged, report:", report_path or join(root, REPORT_NAME))
+    return report
+
+
+def is_flagged(path, report):
+    """True if the machine file is not feasible according to a report (or its path)"""
+    if isinstance(report, str):
+        with open(report) as f:
+            report = json.load(f)
+    res = report["machines"].get(relpath(os.path.abspath(path), report["root"]))
+    return res is not None and not res["is_feasible"]
@@ -0,0 +1,226 @@
+"""Flux linkage and torque lookup table of a machine over the (Id, Iq) plane.
+
+Each operating point of load_simulation is a full transient. Here the
+machine is solved once on an (Id, Iq) grid, at a few rotor positions over
+one electrical period, with the sparse FE solver: Phi_d, Phi_q and the mean
+torque are stored as a small table (float32 .npz). Any operating point,
+MTPA or torque-speed query is then a vectorized interpolation of the table.
+
+With linear materials all the grid points of a rotor position are solved
+from one LU factorization (solve_current_sweep); with non-linear B(H) the
+grid points are split between nb_worker processes.
+
+The d axis is found from the no-load flux linkage (no assumption on the
+position of the magnets or the phase order). Id and Iq are peak values
+(amplitude-invariant Park transform), the operating point (I0_rms, Phi0) of
+load_simulation is Id = sqrt(2) I0_rms cos(Phi0), Iq = sqrt(2) I0_rms sin(Phi0).
+
+    lut = comp_machine_lut(machine, Id=np.linspace(-300, 0, 16), Iq=np.linspace(0, 300, 16))
+    lut.save("Toyota_Prius_lut.npz")
+    Id, Iq, Tem = lut.comp_mtpa(np.linspace(10, 250, 25))
+"""
+
+import numpy as np
+
+from util import fe_solver
+from util.tracing import traced
+
+
+def _solve_points(problem, theta, Is_list, angle):
+    """Non-linear solve of several operating points (Nop, Nt, qs), operating point first"""
+    res_list = [fe_solver.solve_steps(problem, theta, Is, angle) for Is in Is_list]
+    return {k: np.array([r[k] for r in res_list]) for k in ["Tem", "Phi_wind"]}
+
+
+def comp_phase_currents(Id, Iq, theta_d, qs=3, sign=1):
+    """Phase currents (..., Nt, qs) of (Id, Iq) for the electrical d-axis angles theta_d (Nt,)"""
+    shift = theta_d[:, None] - sign * 2 * np.pi * np.arange(qs)[None, :] / qs
+    Id, Iq = np.asarray(Id, dtype=float)[..., None, None], np.asarray(Iq, dtype=float)[..., None, None]
+    return Id * np.cos(shift) - Iq * np.sin(shift)
+
+
+def comp_park(Phi, theta_d, sign=1):
+    """d and q components of phase quantities (..., Nt, qs)"""
+    qs = Phi.shape[-1]
+    shift = theta_d[:, None] - sign * 2 * np.pi * np.arange(qs)[None, :] / qs
+    d = 2 / qs * np.sum(Phi * np.cos(shift), axis=-1)
+    q = -2 / qs * np.sum(Phi * np.sin(shift), axis=-1)
+    return d, q
+
+
+def comp_d_axis(Phi0, theta, p):
+    """Phase order and electrical angle of the d axis from the no-load flux linkage
+
+    Args:
+        Phi0 (array): no-load flux linkage (Nt, qs) at the rotor angles theta (Nt,)
+
+    Returns:
+        tuple: sign (+1 or -1) of the phase order, offset such that
+            theta_d = p * theta + offset
+    """
+    qs = Phi0.shape[-1]
+    best = None
+    for sign in [1, -1]:
+        vector = 2 / qs * Phi0.dot(np.exp(1j * sign * 2 * np.pi * np.arange(qs) / qs)) * np.exp(-1j * p * theta)
+        spread = np.std(vector) / max(np.abs(np.mean(vector)), 1e-12)
+        if best is None or spread < best[0]:
+            best = (spread, sign, float(np.angle(np.mean(vector))))
+    return best[1], best[2]
+
+
+@traced()
+def comp_flux_lut(problem, p, Id, Iq, nb_step=24, nb_worker=4):
+    """Lookup table of a problem of the FE solver
+
+    Args:
+        problem (dict): output of fe_solver.build_problem
+        p (int): pole pairs
+        Id, Iq (array): grid axes [A peak]
+        nb_step (int): rotor positions over one electrical period, enough to
+            average the torque ripple (6th harmonic and slot harmonics)
+
+    Returns:
+        FluxLUT
+    """
+    Id, Iq = np.asarray(Id, dtype=float), np.asarray(Iq, dtype=float)
+    qs = problem["wind_mat"].shape[1]
+    theta = np.arange(nb_step) * 2 * np.pi / (p * nb_step)
+    angle = np.zeros(1)  # airgap flux not used
+
+    # d axis from the magnets alone
+    zero = np.zeros((1, nb_step, qs))
+    if problem["is_linear"]:
+        Phi0 = fe_solver.solve_current_sweep(problem, theta, zero, angle)["Phi_wind"][:, 0]
+    else:
+        Phi0 = _solve_points(problem, theta, zero, angle)["Phi_wind"][0]
+    sign, offset = comp_d_axis(Phi0, theta, p)
+    theta_d = p * theta + offset
+
+    grid_d, grid_q = np.meshgrid(Id, Iq, indexing="ij")
+    Is_list = comp_phase_currents(grid_d.ravel(), grid_q.ravel(), theta_d, qs, sign)  # (Nop, Nt, qs)
+    if problem["is_linear"]:
+        res = fe_solver._run_chunks(
+            fe_solver.solve_current_sweep, nb_worker, nb_step, lambda c: (problem, theta[c], Is_list[:, c], angle)
+        )
+        Tem, Phi = res["Tem"].T, np.moveaxis(res["Phi_wind"], 0, 1)
+    else:
+        res = fe_solver._run_chunks(_solve_points, nb_worker, len(Is_list), lambda c: (problem, theta, Is_list[c], angle))
+        Tem, Phi = res["Tem"], res["Phi_wind"]
+
+    Phi_d, Phi_q = comp_park(Phi, theta_d, sign)
+    shape = grid_d.shape
+    return FluxLUT(
+        Id,
+        Iq,
+        Phi_d.mean(axis=1).reshape(shape),
+        Phi_q.mean(axis=1).reshape(shape),
+        Tem.mean(axis=1).reshape(shape),
+        p=p,
+        qs=qs,
+    )
+
+
+@traced()
+def comp_machine_lut(machine, Id, Iq, type_BH=0, nb_step=24, nb_worker=4, mesh_cache=None):
+    """comp_flux_lut of a pyleecan machine (mesh of the scipy solver of load_simulation)"""
+    from pyleecan.Classes.Output import Output
+
+    from util.simulation import load_simulation
+
+    simulation = load_simulation(machine=machine, solver="scipy", type_BH=type_BH, mesh_cache=mesh_cache)
+    problem = simulation.mag.get_problem(Output(simu=simulation.simu))
+    return comp_flux_lut(problem, machine.stator.winding.p, Id, Iq, nb_step=nb_step, nb_worker=nb_worker)
+
+
+class FluxLUT:
+    """Phi_d, Phi_q [Wb] and mean torque [Nm] on an (Id, Iq) grid [A peak]"""
+
+    def __init__(self, Id, Iq, Phi_d, Phi_q, Tem, p, qs=3):
+        self.Id = np.asarray(Id, dtype=float)
+        self.Iq = np.asarray(Iq, dtype=float)
+        self.Phi_d = np.asarray(Phi_d)
+        self.Phi_q = np.asarray(Phi_q)
+        self.Tem = np.asarray(Tem)
+        self.p = int(p)
+        self.qs = int(qs)
+        self.interpolators = None
+
+    def get_interpolators(self):
+        if self.interpolators is None:
+            from scipy.interpolate import RegularGridInterpolator
+
+            self.interpolators = {
+                key: RegularGridInterpolator((self.Id, self.Iq), getattr(self, key), bounds_error=False, fill_value=None)
+                for key in ["Phi_d", "Phi_q", "Tem"]
+            }
+        return self.interpolators
+
+    def interp(self, Id, Iq):
+        """Phi_d, Phi_q and Tem at any (Id, Iq) arrays (linear extrapolation outside the grid)"""
+        Id, Iq = np.broadcast_arrays(np.asarray(Id, dtype=float), np.asarray(Iq, dtype=float))
+        points = np.stack([Id.ravel(), Iq.ravel()], axis=-1)
+        interpolators = self.get_interpolators()
+        return tuple(interpolators[key](points).reshape(Id.shape) for key in ["Phi_d", "Phi_q", "Tem"])
+
+    def interp_operating_point(self, I0_rms, Phi0):
+        """interp of the (I0_rms, Phi0) operating points of load_simulation"""
+        I0 = np.sqrt(2) * np.asarray(I0_rms, dtype=float)
+        return self.interp(I0 * np.cos(Phi0), I0 * np.sin(Phi0))
+
+    def comp_torque_dq(self, Id, Iq):
+        """Torque from the interpolated flux linkages: qs/2 p (Phi_d Iq - Phi_q Id)"""
+        Phi_d, Phi_q, _ = self.interp(Id, Iq)
+        return self.qs / 2 * self.p * (Phi_d * np.asarray(Iq) - Phi_q * np.asarray(Id))
+
+    def comp_mtpa(self, I_list, nb_angle=181):
+        """Maximum torque per ampere: Id, Iq and Tem of each current amplitude [A peak]"""
+        I_list = np.asarray(I_list, dtype=float)
+        gamma = np.linspace(0, np.pi / 2, nb_angle)  # current angle from the q axis towards -d
+        Id = -I_list[:, None] * np.sin(gamma)[None, :]
+        Iq = I_list[:, None] * np.cos(gamma)[None, :]
+        Tem = self.interp(Id, Iq)[2]
+        best = np.argmax(Tem, axis=1)
+        rows = np.arange(len(I_list))
+        return Id[rows, best], Iq[rows, best], Tem[rows, best]
+
+    def comp_torque_speed(self, speed_list, I_max, U_max, Rs=0.0, nb_point=64):
+        """Maximum torque at each speed [rpm] within the current and voltage limits
+
+        Args:
+            I_max (float): peak phase current limit [A]
+            U_max (float): peak phase voltage limit [V]
+            Rs (float): phase resistance [Ohm]
+
+        Returns:
+            tuple: Tem, Id, Iq of each speed (Tem NaN if no point satisfies the limits)
+        """
+        # Candidate points inside the current circle (half plane Id <= 0)
+        radius = np.linspace(0, I_max, nb_point)[:, None]
+        gamma = np.linspace(0, np.pi, 2 * nb_point)[None, :]
+        Id, Iq = (-radius * np.sin(gamma)).ravel(), (radius * np.cos(gamma)).ravel()
+        Phi_d, Phi_q, Tem = self.interp(Id, Iq)
+
+        omega = 2 * np.pi * self.p * np.asarray(speed_list, dtype=float)[:, None] / 60
+        Ud = Rs * Id - omega * Phi_q
+        Uq = Rs * Iq + omega * Phi_d
+        Tem = np.where(Ud**2 + Uq**2 <= U_max**2, Tem[None, :], -np.inf)
+        best = np.argmax(Tem, axis=1)
+        Tem_max = Tem[np.arange(len(best)), best]
+        return np.where(np.isfinite(Tem_max), Tem_max, np.nan), Id[best], Iq[best]
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            Id=self.Id,
+            Iq=self.Iq,
+            Phi_d=self.Phi_d.astype(np.float32),
+            Phi_q=self.Phi_q.astype(np.float32),
+            Tem=self.Tem.astype(np.float32),
+            p=self.p,
+            qs=self.qs,
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["Id"], data["Iq"], data["Phi_d"], data["Phi_q"], data["Tem"], int(data["p"]), int(data["qs"]))
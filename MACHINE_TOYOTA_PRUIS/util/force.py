@@ -0,0 +1,126 @@
+"""Maxwell stress, force waves and unbalanced magnetic pull from the airgap field.
+
+load_simulation disables the force and structural models (simu.force = None);
+eccentricity and rotor unbalance are seen mostly on the radial force and
+vibration harmonics. Here the forces are computed from the stored airgap
+flux density B(t, angle), vectorized over any leading axes (runs, samples):
+
+    Pr = (Br^2 - Bt^2) / (2 mu0),  Pt = Br Bt / mu0  [N/m2]
+
+- force waves: amplitudes of Pr(t, angle) by time harmonic (multiple of the
+  frequency of the simulated time window) and spatial order r,
+- unbalanced magnetic pull: net force (Fx, Fy) on the rotor, zero for a
+  centered rotor; the 0-order of Pt gives the torque as a check.
+
+add_force_fields adds the force fields to the shards of a dataset
+(util.dataset) without rerunning any simulation.
+
+    Rgap, L = comp_machine_geometry(machine)
+    add_force_fields("dataset", Rgap, L)
+"""
+
+import json
+import os
+from glob import glob
+from os.path import join
+
+import numpy as np
+
+from util.tracing import traced
+
+MU0 = 4e-7 * np.pi
+
+
+def comp_machine_geometry(machine):
+    """Airgap radius [m] and active length [m] of a pyleecan machine"""
+    return machine.comp_Rgap_mec(), machine.stator.L1
+
+
+def comp_maxwell_stress(Br, Bt):
+    """Radial and tangential Maxwell stress [N/m2] of B (..., Nt, Na) [T]"""
+    Br, Bt = np.asarray(Br), np.asarray(Bt)
+    return (Br**2 - Bt**2) / (2 * MU0), Br * Bt / MU0
+
+
+def comp_force_waves(P, nb_freq=16, nb_order=16):
+    """Amplitudes of the force waves (..., nb_freq, 2 * nb_order + 1) of P (..., Nt, Na)
+
+    Row k is the time harmonic k (k / duration of the time axis), column
+    nb_order + r the spatial order r (waves rotating in the direction of the
+    angle for r > 0), so a mode r at frequency k is cos(r angle - 2 pi k t / T).
+    """
+    Nt, Na = P.shape[-2:]
+    # exp(-j (r angle - w t)): inverse FFT in time, forward FFT in angle
+    spectrum = np.fft.fft(np.fft.ifft(P, axis=-2) * Nt, axis=-1) / (Nt * Na)
+    orders = np.arange(-nb_order, nb_order + 1)
+    waves = spectrum[..., :nb_freq, :][..., orders % Na]
+    amplitude = 2 * np.abs(waves)
+    amplitude[..., 0, :] = np.abs(waves[..., 0, :])  # static waves
+    # Static r and -r are the same wave
+    amplitude[..., 0, nb_order + 1 :] += amplitude[..., 0, :nb_order][..., ::-1]
+    amplitude[..., 0, :nb_order] = 0
+    return amplitude
+
+
+def comp_ump(Pr, Pt, Rgap, L):
+    """Unbalanced magnetic pull (..., Nt, 2) [N] and torque (..., Nt) [Nm] on the rotor
+
+    Args:
+        Pr, Pt (array): Maxwell stress (..., Nt, Na) on a uniform angle axis from 0
+        Rgap (float): radius of the airgap line [m]
+        L (float): active length [m]
+    """
+    Na = Pr.shape[-1]
+    angle = 2 * np.pi * np.arange(Na) / Na
+    cos, sin = np.cos(angle), np.sin(angle)
+    dS = Rgap * L * 2 * np.pi / Na
+    Fx = dS * (Pr @ cos - Pt @ sin)
+    Fy = dS * (Pr @ sin + Pt @ cos)
+    Tem = Rgap * dS * Pt.sum(axis=-1)
+    return np.stack([Fx, Fy], axis=-1), Tem
+
+
+def comp_force_features(Br, Bt, Rgap, L, nb_freq=16, nb_order=16, dtype=np.float32):
+    """Force fields of B (..., Nt, Na): "force_waves" of Pr and "UMP" (..., Nt, 2)"""
+    Pr, Pt = comp_maxwell_stress(Br, Bt)
+    UMP, _ = comp_ump(Pr, Pt, Rgap, L)
+    return {
+        "force_waves": comp_force_waves(Pr, nb_freq, nb_order).astype(dtype),
+        "UMP": UMP.astype(dtype),
+    }
+
+
+@traced()
+def add_force_fields(root, Rgap, L, nb_freq=16, nb_order=16, batch_size=64):
+    """Add the force fields to every shard of a dataset (B_radial and B_tangential needed)
+
+    The shards are read with memory mapping by batches of batch_size samples,
+    the new fields are written next to the others and added to the manifests.
+
+    Returns:
+        int: number of samples processed
+    """
+    nb_sample = 0
+    for path in sorted(glob(join(root, "manifest_*.json"))):
+        with open(path) as f:
+            manifest = json.load(f)
+        if "B_radial" not in manifest["fields"] or "B_tangential" not in manifest["fields"]:
+            raise Exception(path + " has no B_radial and B_tangential fields")
+        for shard in manifest["shards"]:
+            prefix = join(root, shard["prefix"])
+            Br = np.load(prefix + "_B_radial.npy", mmap_mode="r")
+            Bt = np.load(prefix + "_B_tangential.npy", mmap_mode="r")
+            parts = [
+                comp_force_features(Br[ii : ii + batch_size], Bt[ii : ii + batch_size], Rgap, L, nb_freq, nb_order)
+                for ii in range(0, len(Br), batch_size)
+            ]
+            for key in parts[0]:
+                array = np.concatenate([part[key] for part in parts])
+                np.save(prefix + "_" + key + ".tmp.npy", array)
+                os.replace(prefix + "_" + key + ".tmp.npy", prefix + "_" + key + ".npy")
+                manifest["fields"][key] = {"shape": list(array.shape[1:]), "dtype": str(array.dtype)}
+            nb_sample += len(Br)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(path + ".tmp", path)
+    return nb_sample
@@ -0,0 +1,35 @@
+"""Names of a module imported on first access (PEP 562).
+
+The util modules used to import about thirty pyleecan classes, the plot
+settings and GMSH at import time, which every worker process paid before
+doing any work. They now import what their functions need inside the
+functions, and keep the old module-level names reachable through
+lazy_getattr so that `from util.simulation import *` in the notebooks
+still provides them.
+"""
+
+import sys
+from importlib import import_module
+
+
+def pyleecan_classes(*names):
+    """{name: module} of pyleecan.Classes entries"""
+    return {name: "pyleecan.Classes." + name for name in names}
+
+
+def lazy_getattr(module_name, lazy_names):
+    """Module __getattr__ importing lazy_names[name] on first access
+
+    Args:
+        module_name (str): __name__ of the module using it
+        lazy_names (dict): {name: module where the name is defined}
+    """
+
+    def __getattr__(name):
+        if name not in lazy_names:
+            raise AttributeError("module " + module_name + " has no attribute " + name)
+        value = getattr(import_module(lazy_names[name]), name)
+        setattr(sys.modules[module_name], name, value)  # next accesses skip __getattr__
+        return value
+
+    return __getattr__
@@ -0,0 +1,197 @@
+"""Iron and copper losses of simulated runs, vectorized over the runs.
+
+Bertotti model per harmonic k of the flux density waveform (frequency
+k / period, amplitude B_k) [W/kg]:
+
+    p = sum_k kh f_k B_k^alpha + kc (f_k B_k)^2 + ke (f_k B_k)^1.5
+
+The flux density comes either from the mesh (nodal potentials A kept by
+fe_solver.solve_steps with is_keep_A, element B in the frame of each
+element) or, when only the airgap field was stored, from estimates of the
+stator teeth and yoke: the flux of a slot pitch goes through its tooth, the
+yoke carries the antiderivative of Br along the airgap. Copper losses are the mean of
+R_k i_k^2 over the phase currents Is.
+
+    geometry = comp_machine_geometry(machine)
+    coefs = comp_material_loss_coefs(machine.stator.mat_type)
+    losses = comp_batch_losses(Br, Is, period=60 / 3000, R=0.08, coefs=coefs, **geometry)  # Br (runs, Nt, Na)
+"""
+
+import numpy as np
+
+from util.tracing import traced
+
+# M400-50A, the lamination of every machine of the repo (toyota_prius_generator):
+# fit_loss_coefs of its pyleecan LossData (50 Hz - 2.5 kHz, 0.1 - 1.8 T)
+LOSS_COEFS_M400_50A = {"kh": 0.0232, "alpha": 2.0, "kc": 1.075e-4, "ke": 8.54e-4, "rho": 7650.0}
+LOSS_COEFS = LOSS_COEFS_M400_50A
+# Copper resistivity temperature coefficient [1/K], reference 20 degC
+ALPHA_CU = 3.93e-3
+LOSS_TYPES = ("hysteresis", "eddy", "excess")
+
+
+def fit_loss_coefs(f, B, p, rho, alpha=2.0):
+    """Bertotti coefficients of loss measurements p [W/kg] at frequencies f [Hz] and peak B [T]
+
+    Non-negative least squares on the relative error, so that the low
+    frequency points weigh as much as the high frequency ones.
+    """
+    from scipy.optimize import nnls
+
+    f, B, p = (np.asarray(x, dtype=float) for x in (f, B, p))
+    A = np.column_stack([f * B**alpha, (f * B) ** 2, (f * B) ** 1.5]) / p[:, None]
+    (kh, kc, ke), _ = nnls(A, np.ones(len(p)))
+    return {"kh": float(kh), "alpha": alpha, "kc": float(kc), "ke": float(ke), "rho": float(rho)}
+
+
+def comp_material_loss_coefs(mat, default=LOSS_COEFS_M400_50A):
+    """Bertotti coefficients of a pyleecan lamination material from its LossData (rows f, B, p)
+
+    Materials without loss data (e.g. an empty ImportMatrix) get default.
+    """
+    loss_data = getattr(mat.mag, "LossData", None)
+    data = loss_data.get_data() if hasattr(loss_data, "get_data") else None
+    if data is None or np.size(data) == 0:
+        return dict(default)
+    data = np.asarray(data, dtype=float)
+    if data.shape[0] != 3:
+        data = data.T
+    rho = getattr(mat.struct, "rho", None) or default["rho"]
+    return fit_loss_coefs(data[0], data[1], data[2], rho, default["alpha"])
+
+
+def comp_iron_loss_density(B, period, coefs=LOSS_COEFS, is_vector=False):
+    """Bertotti loss density [W/kg] of B (..., Nt, E) or components (..., Nt, E, 2) over one period [s]
+
+    Returns:
+        dict: "hysteresis", "eddy" and "excess" (..., E)
+    """
+    B = np.asarray(B, dtype=float)
+    axis = -3 if is_vector else -2
+    Nt = B.shape[axis]
+    spectrum = np.abs(np.fft.rfft(B, axis=axis)) * 2 / Nt
+    if is_vector:
+        spectrum = np.sqrt(np.sum(spectrum**2, axis=-1))
+    spectrum = np.moveaxis(spectrum, -2, -1)[..., 1:]  # (..., E, H) without the DC term
+    f = np.arange(1, spectrum.shape[-1] + 1) / period
+    fB = f * spectrum
+    return {
+        "hysteresis": np.sum(coefs["kh"] * f * spectrum ** coefs["alpha"], axis=-1),
+        "eddy": np.sum(coefs["kc"] * fB**2, axis=-1),
+        "excess": np.sum(coefs["ke"] * fB**1.5, axis=-1),
+    }
+
+
+def comp_mesh_flux(problem, A, kinds=None):
+    """Element flux density (Nt, E, 2) of the nodal potentials A (Nt, Nnode) of fe_solver
+
+    The rotor elements are taken at rest (rotor frame), so each element sees
+    its own B waveform. Returns B and the area (E,) of the elements of kinds
+    (stator and rotor iron by default).
+    """
+    from util import fe_solver
+
+    if kinds is None:
+        kinds = (fe_solver.IRON_STATOR, fe_solver.IRON_ROTOR)
+    is_kept = np.isin(problem["kind"], kinds)
+    tri = problem["tri"][is_kept]
+    area, grad = fe_solver._comp_geometry(problem["nodes"], tri)
+    B = fe_solver._comp_B(np.asarray(A).T, tri, grad)  # (E, 2, Nt)
+    return np.transpose(B, (2, 0, 1)), area
+
+
+@traced()
+def comp_mesh_iron_loss(problem, A, period, coefs=LOSS_COEFS, kinds=None):
+    """Iron losses [W] of a solution kept on the mesh (see comp_mesh_flux)"""
+    B, area = comp_mesh_flux(problem, A, kinds)
+    mass = area * problem["L1"] * coefs["rho"]
+    density = comp_iron_loss_density(B, period, coefs, is_vector=True)
+    return {key: float(density[key] @ mass) for key in LOSS_TYPES}
+
+
+def comp_stator_flux(Br, Rgap, Zs, w_tooth, h_yoke):
+    """Tooth (..., Nt, Zs) and yoke (..., Nt, Na) flux density estimates from Br (..., Nt, Na)
+
+    Args:
+        Rgap (float): radius of the airgap line [m]
+        w_tooth (float): tooth width [m]
+        h_yoke (float): yoke height [m]
+    """
+    Br = np.asarray(Br, dtype=float)
+    Na = Br.shape[-1]
+    # Antiderivative of Br along the angle from its Fourier series
+    orders = np.fft.rfftfreq(Na, 1 / Na)
+    spectrum = np.fft.rfft(Br, axis=-1) / Na
+    spectrum[..., 1:] /= 1j * orders[1:]
+    # Flux of each slot pitch (the first pitch centered on angle 0), exact for non-integer Na / Zs
+    edge = 2 * np.pi * (np.arange(Zs + 1) - 0.5) / Zs
+    factor = np.where((orders > 0) & (orders < Na / 2), 2.0, 1.0)  # one-sided series
+    exp = np.exp(1j * orders[1:, None] * edge[None, :])
+    F = np.real((spectrum[..., 1:] * factor[1:]) @ exp) + spectrum[..., :1].real * edge
+    B_tooth = np.diff(F, axis=-1) * Rgap / w_tooth
+    # Yoke: zero-mean antiderivative of Br
+    spectrum[..., 0] = 0
+    B_yoke = np.fft.irfft(spectrum * Na, n=Na, axis=-1) * Rgap / h_yoke
+    return B_tooth, B_yoke
+
+
+@traced()
+def comp_airgap_iron_loss(Br, period, Rgap, L, Zs, w_tooth, h_tooth, h_yoke, coefs=LOSS_COEFS):
+    """Stator iron losses [W] (...) estimated from the airgap field Br (..., Nt, Na)
+
+    Returns:
+        dict: "hysteresis", "eddy", "excess", and the "tooth" and "yoke" totals
+    """
+    B_tooth, B_yoke = comp_stator_flux(Br, Rgap, Zs, w_tooth, h_yoke)
+    Na = B_yoke.shape[-1]
+    mass_tooth = w_tooth * h_tooth * L * coefs["rho"]
+    mass_yoke = 2 * np.pi * (Rgap + h_tooth + h_yoke / 2) * h_yoke * L * coefs["rho"] / Na
+    tooth = comp_iron_loss_density(B_tooth, period, coefs)
+    yoke = comp_iron_loss_density(B_yoke, period, coefs)
+    losses = {key: mass_tooth * tooth[key].sum(axis=-1) + mass_yoke * yoke[key].sum(axis=-1) for key in LOSS_TYPES}
+    losses["tooth"] = mass_tooth * sum(tooth[key] for key in LOSS_TYPES).sum(axis=-1)
+    losses["yoke"] = mass_yoke * sum(yoke[key] for key in LOSS_TYPES).sum(axis=-1)
+    return losses
+
+
+def comp_resistance(R20, T, alpha=ALPHA_CU):
+    """Winding resistance at the temperature T [degC] from its value at 20 degC"""
+    return np.asarray(R20) * (1 + alpha * (np.asarray(T) - 20))
+
+
+def comp_copper_loss(Is, R):
+    """Copper losses [W] (...) of the phase currents Is (..., Nt, qs), R [Ohm] scalar or (..., qs)"""
+    Is = np.asarray(Is, dtype=float)
+    return np.sum(np.mean(Is**2, axis=-2) * np.asarray(R, dtype=float), axis=-1)
+
+
+def comp_machine_geometry(machine):
+    """Stator dimensions of a pyleecan machine for comp_airgap_iron_loss"""
+    stator = machine.stator
+    h_tooth = stator.slot.comp_height()
+    Zs = stator.slot.Zs
+    # Mean tooth width: slot pitch at mid height minus the mean slot width
+    w_tooth = 2 * np.pi * (stator.Rint + h_tooth / 2) / Zs - stator.slot.comp_surface() / h_tooth
+    return {
+        "Rgap": machine.comp_Rgap_mec(),
+        "L": stator.L1,
+        "Zs": Zs,
+        "w_tooth": w_tooth,
+        "h_tooth": h_tooth,
+        "h_yoke": stator.Rext - stator.Rint - h_tooth,
+    }
+
+
+@traced()
+def comp_batch_losses(Br, Is, period, R, Rgap, L, Zs, w_tooth, h_tooth, h_yoke, coefs=LOSS_COEFS):
+    """Losses [W] of a batch of runs: Br (runs, Nt, Na), Is (runs, Nt, qs), R scalar, (runs,) or (runs, qs)
+
+    Returns:
+        dict: (runs,) arrays "hysteresis", "eddy", "excess", "iron", "copper" and "total"
+    """
+    losses = comp_airgap_iron_loss(Br, period, Rgap, L, Zs, w_tooth, h_tooth, h_yoke, coefs)
+    losses = {key: losses[key] for key in LOSS_TYPES}
+    losses["iron"] = sum(losses[key] for key in LOSS_TYPES)
+    losses["copper"] = comp_copper_loss(Is, np.asarray(R, dtype=float)[..., None] if np.ndim(R) == 1 else R)
+    losses["total"] = losses["iron"] + losses["copper"]
+    return losses
@@ -0,0 +1,128 @@
+"""Mesh reuse across geometrically identical machine variants.
+
+Winding faults (Ntcoil, wind_mat), demagnetization or magnet temperature
+variants share the geometry of their reference machine. The geometry
+fingerprint only depends on laminations, slots, holes and airgap, so these
+variants find the mesh of the first case and only the excitation and the
+material assignment are recomputed.
+"""
+
+import hashlib
+import json
+from os import makedirs, replace
+from os.path import isfile, join
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from util.tracing import traced
+
+# Keys of the machine dict that do not change the 2D mesh
+NON_GEOMETRY_KEYS = {
+    "name",
+    "desc",
+    "logger_name",
+    "__save_date__",
+    "__version__",
+    "mat_type",
+    "mat_void",
+    "cond_mat",
+    "ins_mat",
+    "winding",
+    "type_magnetization",
+    "magnetization_dict_offset",
+    "Lmag",
+    "L1",
+    "Lshaft",
+    "Kf1",
+}
+# Keys whose material does not change the mesh, but whose presence does (a
+# slot wedge adds the wedge surfaces to the drawn slot)
+PRESENCE_KEYS = {"wedge_mat"}
+
+
+def comp_geometry_fingerprint(machine, extra=None, ndigits=9):
+    """Hash of the geometry of a machine (laminations, slots, holes, airgap)
+
+    Args:
+        machine: pyleecan machine
+        extra: anything else that changes the mesh (mesh settings, symmetry)
+        ndigits (int): rounding of the dimensions [m] before hashing
+
+    Returns:
+        str: hexadecimal fingerprint
+    """
+    geo = _strip(machine.as_dict(), ndigits)
+    winding = machine.stator.winding
+    if winding is not None and winding.wind_mat is not None:
+        # Only the layer layout changes the winding surfaces
+        shape = [len(winding.wind_mat), len(winding.wind_mat[0])]
+        geo["winding_layout"] = shape
+    geo["extra"] = extra
+    text = json.dumps(geo, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _strip(value, ndigits):
+    if isinstance(value, dict):
+        return {
+            k: v is not None if k in PRESENCE_KEYS else _strip(v, ndigits)
+            for k, v in value.items()
+            if k not in NON_GEOMETRY_KEYS
+        }
+    elif isinstance(value, (list, tuple)):
+        return [_strip(v, ndigits) for v in value]
+    elif isinstance(value, float):
+        return round(value, ndigits)
+    return value
+
+
+class MeshCache:
+    """Meshes stored by geometry fingerprint in a folder
+
+    The parsed meshes are also kept in memory so that a campaign running in
+    one process reads each .msh file only once.
+    """
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = mkdtemp()
+        makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.meshes = dict()
+        self.nb_hit = 0
+        self.nb_miss = 0
+
+    def get_path(self, key):
+        return join(self.cache_dir, key + ".msh")
+
+    def get_mesh(self, output, extra=None):
+        """Parsed mesh of the machine of output, drawn only on the first call"""
+        from util.fe_solver import read_mesh
+
+        key = comp_geometry_fingerprint(output.simu.machine, extra=extra)
+        if key in self.meshes:
+            self.nb_hit += 1
+            return self.meshes[key]
+
+        path = self.get_path(key)
+        if isfile(path):
+            self.nb_hit += 1
+        else:
+            self.nb_miss += 1
+            self.draw(output, path)
+        self.meshes[key] = read_mesh(path)
+        return self.meshes[key]
+
+    @traced("MeshCache.draw (gmsh)")
+    def draw(self, output, path):
+        """Mesh with gmsh_export, moved in place once complete (safe for concurrent workers)"""
+        from util.simulation import gmsh_export
+
+        tmp_dir = mkdtemp(dir=self.cache_dir)
+        try:
+            tmp_path = join(tmp_dir, "model.msh")
+            gmsh_export(out=output, path_save=tmp_path)
+            replace(tmp_path, path)
+        finally:
+            # A failed export leaves no partial mesh behind
+            rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,149 @@
+"""Long, high sample rate signals from the periodic solution of a simulation.
+
+load_simulation solves one mechanical revolution with 32*p time steps: a
+100000 step FEA of a few seconds is out of reach. The solution being
+periodic in the rotor position, it is stored as its Fourier series in the
+rotor angle and evaluated at the rotor angle of any time axis:
+
+    x(t) = sum_h c_h exp(j h phi(t)),  phi(t) = integral of 2*pi*N(t)/60
+
+- speed profile N(t) [rpm]: the phase is integrated sample by sample, so the
+  frequencies follow run-ups and speed fluctuations,
+- load changes: solutions at several load levels (e.g. currents I0) are
+  interpolated harmonic by harmonic along a load profile,
+- measurement noise: Gaussian, relative to the RMS of the solution.
+
+The magnetostatic quantities (B, Tem, flux linkage) depend on the rotor
+position and currents only, not on the speed. Harmonics above the Nyquist
+frequency of a chunk (at its maximum speed) are removed. The signal is
+produced in chunks of chunk_size samples, so the memory does not depend on
+the duration; write_npy streams it to a memory-mapped .npy file.
+
+    signal = PeriodicSignal.from_output(out, "Tem")
+    time, Tem = signal.synthesize(fs=50e3, duration=5, speed=lambda t: 1000 + 400 * t, noise_std=0.01)
+"""
+
+import numpy as np
+
+from util.tracing import traced
+
+
+def _get_profile(profile, time):
+    """Values of a profile (constant or callable of the time) on a time chunk"""
+    if callable(profile):
+        return np.broadcast_to(np.asarray(profile(time), dtype=float), time.shape)
+    return np.full(time.shape, float(profile))
+
+
+class PeriodicSignal:
+    """Fourier series in the rotor angle of a periodic solution
+
+    Args:
+        values (array): samples (Nt, ...) over the revolution fraction, or
+            (Nload, Nt, ...) at the load levels
+        revolution (float): fraction of a mechanical revolution covered by the
+            Nt samples (1 for load_simulation, 1/p for one electrical period)
+        load_levels (array): load of each solution (Nload,), increasing
+        nb_harmonic (int): harmonics kept (all by default)
+    """
+
+    def __init__(self, values, revolution=1.0, load_levels=None, nb_harmonic=None):
+        values = np.asarray(values, dtype=float)
+        if load_levels is None:
+            values = values[None]
+            load_levels = [0.0]
+        self.load_levels = np.asarray(load_levels, dtype=float)
+        if values.shape[0] != len(self.load_levels):
+            raise Exception("Expected " + str(len(self.load_levels)) + " solutions, got " + str(values.shape[0]))
+        Nt = values.shape[1]
+        self.shape = values.shape[2:]
+        coefs = np.fft.rfft(values.reshape(len(self.load_levels), Nt, -1), axis=1) / Nt
+        coefs[:, 1:] *= 2  # one-sided
+        if Nt % 2 == 0:
+            coefs[:, -1] /= 2  # Nyquist term counted once
+        if nb_harmonic is not None:
+            coefs = coefs[:, :nb_harmonic]
+        self.coefs = coefs  # (Nload, H, channels)
+        self.orders = np.arange(coefs.shape[1]) / revolution  # mechanical orders
+        self.rms = float(np.sqrt(np.mean(values**2)))
+
+    @classmethod
+    def from_output(cls, output, field="Tem", **kwargs):
+        """Signal of a pyleecan output: "Tem" (Nt,) or a B component (Nt, Na), e.g. "B_radial" """
+        if field == "Tem":
+            data = output.mag.Tem
+            values = data.get_along("time")[data.symbol]
+        else:
+            data = output.mag.B.components[field.split("_")[-1]]
+            values = data.get_along("time", "angle")[data.symbol]
+        return cls(values, **kwargs)
+
+    def get_weights(self, load):
+        """Weights (n, Nload) of the solutions at each load of a chunk (linear interpolation)"""
+        index = np.clip(np.searchsorted(self.load_levels, load) - 1, 0, len(self.load_levels) - 2)
+        w = (load - self.load_levels[index]) / (self.load_levels[index + 1] - self.load_levels[index])
+        weights = np.zeros((len(load), len(self.load_levels)))
+        rows = np.arange(len(load))
+        weights[rows, index] = 1 - w
+        weights[rows, index + 1] += w
+        return weights
+
+    def iter_chunks(self, fs, duration, speed=3000, load=None, noise_std=0.0, chunk_size=8192, seed=0, angle0=0.0):
+        """Generator of (time, values) chunks of the signal
+
+        Args:
+            fs (float): sample rate [Hz]
+            duration (float): length of the signal [s]
+            speed (float or callable): rotor speed [rpm], or function of the time
+            load (float or callable): load level (see load_levels), or function of the time
+            noise_std (float): noise standard deviation relative to the RMS of the solution
+            chunk_size (int): samples per chunk (memory of chunk_size x channels)
+            angle0 (float): rotor angle at t = 0 [rad]
+
+        Yields:
+            tuple: time (n,), values (n, ...)
+        """
+        rng = np.random.default_rng(seed)
+        nb_sample = int(round(duration * fs))
+        phase, omega_prev = None, None
+        for start in range(0, nb_sample, chunk_size):
+            time = np.arange(start, min(start + chunk_size, nb_sample)) / fs
+            omega = 2 * np.pi * _get_profile(speed, time) / 60
+            # Trapezoidal integration of the rotor angle, continued between chunks
+            if omega_prev is None:
+                phase, omega_prev = angle0 - omega[0] / fs, omega[0]  # angle0 at the first sample
+            steps = np.concatenate([[omega_prev], omega])
+            angle = phase + np.cumsum((steps[1:] + steps[:-1]) / 2) / fs
+            phase, omega_prev = angle[-1], omega[-1]
+
+            mask = self.orders * np.max(np.abs(omega)) / (2 * np.pi) < fs / 2
+            exp = np.exp(1j * angle[:, None] * self.orders[None, mask])  # (n, H)
+            if len(self.load_levels) == 1:
+                values = (exp @ self.coefs[0, mask]).real
+            else:
+                # Interpolation of the solutions, linear in the harmonics
+                weights = self.get_weights(_get_profile(0 if load is None else load, time))
+                values = 0
+                for level in np.flatnonzero(np.any(weights != 0, axis=0)):
+                    values = values + weights[:, level, None] * (exp @ self.coefs[level, mask]).real
+            if noise_std > 0:
+                values += rng.normal(0, noise_std * self.rms, values.shape)
+            yield time, values.reshape((len(time),) + self.shape)
+
+    @traced()
+    def synthesize(self, fs, duration, **kwargs):
+        """Whole signal: time (n,), values (n, ...) (see iter_chunks)"""
+        time, values = zip(*self.iter_chunks(fs, duration, **kwargs))
+        return np.concatenate(time), np.concatenate(values)
+
+    @traced()
+    def write_npy(self, path, fs, duration, dtype=np.float32, **kwargs):
+        """Stream the signal to a .npy file (n, ...) without holding it in memory"""
+        shape = (int(round(duration * fs)),) + self.shape
+        array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        start = 0
+        for time, values in self.iter_chunks(fs, duration, **kwargs):
+            array[start : start + len(time)] = values
+            start += len(time)
+        array.flush()
+        return path
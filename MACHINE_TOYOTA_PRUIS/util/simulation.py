@@ -2,21 +2,57 @@ from os.path import join
 
 from numpy import ones, pi, array, linspace, cos, sqrt
 
-from pyleecan.Functions.GMSH.draw_GMSH import draw_GMSH
-from pyleecan.Classes.Simu1 import Simu1
-from pyleecan.Classes.InputCurrent import InputCurrent
-from pyleecan.Classes.OPdq import OPdq
-from pyleecan.Classes.MagFEMM import MagFEMM
-from os.path import join
-from pyleecan.Functions.load import load
-from pyleecan.definitions import DATA_DIR
-from pyleecan.Functions.Plot import dict_2D, dict_3D
+from util.lazy import lazy_getattr, pyleecan_classes
+from util.tracing import traced
+
+# pyleecan, GMSH and the plot settings are imported by the functions using
+# them; the names stay importable from this module (star import included)
+_LAZY_NAMES = pyleecan_classes("Simu1", "InputCurrent", "OPdq", "MagFEMM")
+_LAZY_NAMES.update(
+    {
+        "draw_GMSH": "pyleecan.Functions.GMSH.draw_GMSH",
+        "load": "pyleecan.Functions.load",
+        "DATA_DIR": "pyleecan.definitions",
+        "dict_2D": "pyleecan.Functions.Plot",
+        "dict_3D": "pyleecan.Functions.Plot",
+    }
+)
+__getattr__ = lazy_getattr(__name__, _LAZY_NAMES)
+__all__ = [
+    "load_machine",
+    "load_simulation",
+    "comp_stator_currents",
+    "run_load_sweep",
+    "airgap_series_simulation",
+    "run_simulation",
+    "plot_simulation_results",
+    "compare_simulation_results",
+    "gmsh_export",
+    "winding_failure_simulation",
+    "join",
+    "ones",
+    "pi",
+    "array",
+    "linspace",
+    "cos",
+    "sqrt",
+] + list(_LAZY_NAMES)
 
+@traced()
 def load_machine(name):
+    from pyleecan.definitions import DATA_DIR
+    from pyleecan.Functions.load import load
+
     machine = load(join(DATA_DIR, "Machine", name+".json"))
     return machine
 
-def load_simulation(name="simulation", machine=None, rotor_speed=3000, start=0, stop=5, num_steps =100000):
+@traced()
+def load_simulation(name="simulation", machine=None, rotor_speed=3000, start=0, stop=5, num_steps =100000, solver="FEMM", mesh_cache=None, I0_rms=250/sqrt(2), Phi0=140*pi/180, type_BH=0, T_mag=60):
+
+    from pyleecan.Classes.InputCurrent import InputCurrent
+    from pyleecan.Classes.MagFEMM import MagFEMM
+    from pyleecan.Classes.OPdq import OPdq
+    from pyleecan.Classes.Simu1 import Simu1
 
     if machine is None:
         raise Exception("No input machine")
@@ -37,47 +73,48 @@ def load_simulation(name="simulation", machine=None, rotor_speed=3000, start=0,
     # time discretization [s]
     time = linspace(start=0, stop=60/N0, num=32*p, endpoint=False) # 32*p timesteps
     # time = linspace(start=start, stop=stop, num=num_steps, endpoint=False)
+    # (long signals: see util.signal_synthesis.PeriodicSignal built from this periodic solution)
     simu_femm.input.time = time
     
     # Angular discretization along the airgap circonference for flux density calculation
     simu_femm.input.angle = linspace(start = 0, stop = 2*pi, num=2048, endpoint=False) # 2048 steps
     
     # Stator currents as a function of time, each column correspond to one phase [A]
-    I0_rms = 250/sqrt(2)
-    felec = p * N0 /60 # [Hz]
-    rot_dir = simu_femm.machine.stator.comp_mmf_dir()
-    Phi0 = 140*pi/180  # Maximum Torque Per Amp
-    
-    Ia = (
-        I0_rms
-        * sqrt(2)
-        * cos(2 * pi * felec * time + 0 * rot_dir * 2 * pi / qs + Phi0)
-    )
-    Ib = (
-        I0_rms
-        * sqrt(2)
-        * cos(2 * pi * felec * time + 1 * rot_dir * 2 * pi / qs + Phi0)
-    )
-    Ic = (
-        I0_rms
-        * sqrt(2)
-        * cos(2 * pi * felec * time + 2 * rot_dir * 2 * pi / qs + Phi0)
-    )
-    simu_femm.input.Is = array([Ia, Ib, Ic]).transpose()
+    # Phi0 = 140° : Maximum Torque Per Amp
+    simu_femm.input.Is = comp_stator_currents(simu_femm, I0_rms=I0_rms, Phi0=Phi0)
     
     
+    if solver == "scipy":
+        # Built-in sparse FE solver on the GMSH mesh, runs headless without FEMM
+        from util.fe_solver import MagScipy, SimuScipy
+
+        simu_femm.elec = None
+        simu_femm.force = None
+        simu_femm.struct = None
+        simu_femm.mag = None
+        mag = MagScipy(
+            type_BH_stator=type_BH,
+            type_BH_rotor=type_BH,
+            T_mag=T_mag,
+            nb_worker=4,  # Number of processes solving the time steps at the same time
+            mesh_cache=mesh_cache,  # Folder or MeshCache: variants with the same geometry skip meshing
+        )
+        return SimuScipy(simu_femm, mag)
+    elif solver != "FEMM":
+        raise Exception("Unknown solver " + str(solver) + ", use 'FEMM' or 'scipy'")
+
     simu_femm.mag = MagFEMM(
-        type_BH_stator=0, # 0 to use the material B(H) curve,
+        type_BH_stator=type_BH, # 0 to use the material B(H) curve,
                           # 1 to use linear B(H) curve according to mur_lin,
                           # 2 to enforce infinite permeability (mur_lin =100000)
-        type_BH_rotor=0,  # 0 to use the material B(H) curve,
+        type_BH_rotor=type_BH,  # 0 to use the material B(H) curve,
                           # 1 to use linear B(H) curve according to mur_lin,
                           # 2 to enforce infinite permeability (mur_lin =100000)
         file_name = "", # Name of the file to save the FEMM model
         is_fast_draw=True,  # Speed-up drawing of the machine by using lamination periodicity
         is_sliding_band=True,  # True to use the symetry of the lamination to draw the machine faster
         is_calc_torque_energy=True, # True to calculate torque from integration of energy derivate over rotor elements
-        T_mag=60,  # Permanent magnet temperature to adapt magnet remanent flux density [°C]
+        T_mag=T_mag,  # Permanent magnet temperature to adapt magnet remanent flux density [°C]
         is_remove_ventS=False,  # True to remove stator ventilation duct
         is_remove_ventR=False,  # True to remove rotor ventilation duct
     )
@@ -93,13 +130,86 @@ def load_simulation(name="simulation", machine=None, rotor_speed=3000, start=0,
     simu_femm.mag.is_save_meshsolution_as_file = False # To save FEA results in a dat file
     return simu_femm
 
-def run_simulation(simulation = None):
+def comp_stator_currents(simulation, I0_rms=250/sqrt(2), Phi0=140*pi/180):
+    """Sinusoidal phase currents on the time axis of the simulation, one column per phase [A]"""
+    p = simulation.machine.stator.winding.p
+    qs = simulation.machine.stator.winding.qs
+    felec = p * simulation.input.OP.N0 / 60 # [Hz]
+    rot_dir = simulation.machine.stator.comp_mmf_dir()
+    time = simulation.input.time
+    return array(
+        [I0_rms * sqrt(2) * cos(2 * pi * felec * time + k * rot_dir * 2 * pi / qs + Phi0) for k in range(qs)]
+    ).transpose()
+
+@traced()
+def run_load_sweep(simulation=None, I0_rms_list=None, Phi0_list=None):
+    """Run the same machine for several operating points (I0_rms[k], Phi0[k])
+
+    With the scipy solver the mesh is built once and, with linear materials
+    (type_BH=1), every rotor position is factorized once for all the points.
+    """
     if simulation is None:
         raise Exception("Provide a simulation")
+    if I0_rms_list is None or Phi0_list is None or len(I0_rms_list) != len(Phi0_list):
+        raise Exception("Provide I0_rms_list and Phi0_list of the same length")
+
+    Is_list = [comp_stator_currents(simulation, I0_rms=I0, Phi0=Phi0) for I0, Phi0 in zip(I0_rms_list, Phi0_list)]
+    if hasattr(simulation, "run_sweep"):
+        return simulation.run_sweep(Is_list)
+
+    out_list = []
+    for Is in Is_list:
+        simu = simulation.copy()
+        simu.input.Is = Is
+        out_list.append(simu.run())
+    return out_list
+
+@traced()
+def airgap_series_simulation(machine_files=None, warm_start=True, type_BH=0, mesh_cache=None):
+    """Run a series of close variants (e.g. Toyota_Prius_gap_*.json) with the scipy solver
+
+    With warm_start, each variant starts its Newton iterations from the nearest
+    already solved variant. Returns the outputs and the total number of Newton
+    iterations of each variant, to compare with warm_start=False.
+    """
+    if machine_files is None or len(machine_files) == 0:
+        raise Exception("Provide machine files")
+    from pyleecan.Functions.load import load
+
+    from util.solution_cache import SolutionCache
+
+    solution_cache = SolutionCache() if warm_start else None
+    out_list, nb_iter_list = [], []
+    for machine_file in machine_files:
+        simulation = load_simulation(machine=load(machine_file), solver="scipy", type_BH=type_BH, mesh_cache=mesh_cache)
+        simulation.mag.solution_cache = solution_cache
+        out_list.append(run_simulation(simulation))
+        if out_list[-1] is None:
+            nb_iter_list.append(None)
+            continue
+        nb_iter_list.append(int(sum(simulation.mag.nb_iter)))
+        print(machine_file, ":", nb_iter_list[-1], "Newton iterations")
+    return out_list, nb_iter_list
+
+@traced()
+def run_simulation(simulation = None, check_feasibility=True):
+    """Run a simulation, None if its machine fails util.feasibility.check_machine"""
+    if simulation is None:
+        raise Exception("Provide a simulation")
+    if check_feasibility:
+        from util.feasibility import check_machine
+
+        result = check_machine(simulation.machine)
+        if not result["is_feasible"]:
+            print("Skipped", simulation.machine.name, ":", "; ".join(result["errors"]))
+            return None
     out_femm = simulation.run()
     return out_femm
 
+@traced()
 def plot_simulation_results(out=None, save=False):
+    from pyleecan.Functions.Plot import dict_2D
+
     if out is None:
         raise Exception("Provide a simulation output")
     
@@ -111,7 +221,10 @@ def plot_simulation_results(out=None, save=False):
     out.mag.B.plot_2D_Data("time", "angle=180{°}", component_list=["tangential"], is_show_fig=False, **dict_2D)
 
 
+@traced()
 def compare_simulation_results(out1=None, out2=None, legend_list=["Reference", "Winding failure"], save=False):
+    from pyleecan.Functions.Plot import dict_2D
+
     if out1 is None or out2 is None:
         raise Exception("Provide simulation outputs")
     
@@ -121,7 +234,9 @@ def compare_simulation_results(out1=None, out2=None, legend_list=["Reference", "
     out1.mag.B.plot_2D_Data("time", component_list=["tangential"], data_list=[out2.mag.B], legend_list=legend_list, **dict_2D)
     out1.mag.B.plot_2D_Data("time", "angle=180{°}", component_list=["tangential"], data_list=[out2.mag.B], legend_list=legend_list, **dict_2D)
 
+@traced()
 def gmsh_export(out=None, path_save="out.msh"):
+    from pyleecan.Functions.GMSH.draw_GMSH import draw_GMSH
 
     if out is None:
         raise Exception("Provide a simulation output")
@@ -156,7 +271,8 @@ def gmsh_export(out=None, path_save="out.msh"):
     boundary_prop["airbox_arc"] = "VP0_BOUNDARY"
     draw_GMSH(out, sym=1, path_save=path_save, boundary_prop=boundary_prop)
 
-def winding_failure_simulation(machine = None, machine_name=None):
+@traced()
+def winding_failure_simulation(machine = None, machine_name=None, solver="FEMM", mesh_cache=None):
 
     if machine_name is None:
         raise Exception("Provide a machine name")
@@ -167,11 +283,14 @@ def winding_failure_simulation(machine = None, machine_name=None):
     if machine.stator.winding.wind_mat is None:
         raise Exception("Error loading machine")
     
+    from util.clone import clone_machine
+
     nb_coils = int(machine.stator.winding.wind_mat[0][0][0][0])
     out_femm = []
     for i in range(1,nb_coils+1):
-        machine.stator.winding.wind_mat[0][0][0][0] = i
-        simu_femm = load_simulation(name = machine_name, machine=machine)
+        # Each output keeps its own machine, the input machine is not modified
+        variant = clone_machine(machine, {"stator.winding.wind_mat[0][0][0][0]": i})
+        simu_femm = load_simulation(name = machine_name, machine=variant, solver=solver, mesh_cache=mesh_cache)
         out_femm.append(simu_femm.run())
         # Tangential magnetic flux
         out_femm[i-1].mag.B.plot_2D_Data("angle","time[1]",component_list=["tangential"], is_show_fig=False, save_path=machine_name+"_tangential_time_"+str(i)+".png")
@@ -0,0 +1,102 @@
+"""Reference solutions used as initial guess of the nonlinear FE solver.
+
+Near-identical variants (airgap series, small dimension changes) have close
+magnetic states: the nodal potential of the nearest solved reference,
+interpolated on the mesh of the new variant, starts the Newton iterations
+much closer to the solution than the linear initial guess.
+"""
+
+import numpy as np
+from scipy.interpolate import LinearNDInterpolator, NearestNDInterpolator
+
+
+def comp_problem_features(problem):
+    """Descriptors of a problem compared to find the nearest reference"""
+    return np.array(
+        [
+            problem["Rrot"],
+            problem["Rgap"],
+            np.sum(problem["slot_area"]),
+            np.sum([np.sum(problem["elem_area"][elem]) for elem in problem["magnet_elem"]]),
+            np.mean([np.linalg.norm(Br) for Br in problem["magnet_Br"]]),
+        ]
+    )
+
+
+class SolutionCache:
+    """Nodal potentials of solved problems, kept for warm-starting variants
+
+    Args:
+        max_size (int): number of references kept (oldest dropped first)
+        max_distance (float): maximum relative distance between the features
+            of a problem and a reference for the reference to be used
+    """
+
+    def __init__(self, max_size=20, max_distance=0.1):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.references = list()
+        self.nb_hit = 0
+        self.nb_miss = 0
+
+    def add(self, problem, theta, A):
+        """Store the potentials A (Nt, Nnode) of the rotor angles theta (Nt,)"""
+        self.references.append(
+            {
+                "features": comp_problem_features(problem),
+                "nodes": problem["nodes"],
+                "is_rotor_node": problem["is_rotor_node"],
+                "Nnode": len(problem["nodes"]),
+                "theta": np.asarray(theta),
+                "A": np.asarray(A),
+            }
+        )
+        if len(self.references) > self.max_size:
+            self.references.pop(0)
+
+    def get_nearest(self, problem):
+        """Nearest reference and its relative distance (None if the cache is empty)"""
+        if len(self.references) == 0:
+            return None, np.inf
+        features = comp_problem_features(problem)
+        dist = [
+            np.max(np.abs(ref["features"] - features) / np.maximum(np.abs(features), 1e-12))
+            for ref in self.references
+        ]
+        ii = int(np.argmin(dist))
+        return self.references[ii], dist[ii]
+
+    def get_initial(self, problem, theta):
+        """Initial potentials (Nt, Nnode) for the rotor angles theta, None without a close reference
+
+        Stator and rotor nodes are interpolated separately, in their own frame,
+        so that the value at each rotor angle follows the rotor.
+        """
+        ref, dist = self.get_nearest(problem)
+        if ref is None or dist > self.max_distance:
+            self.nb_miss += 1
+            return None
+        self.nb_hit += 1
+
+        # Time step of the reference with the closest rotor angle
+        diff = np.angle(np.exp(1j * (np.asarray(theta)[:, None] - ref["theta"][None, :])))
+        step = np.argmin(np.abs(diff), axis=1)
+
+        if ref["Nnode"] == len(problem["nodes"]) and np.allclose(ref["nodes"], problem["nodes"]):
+            return ref["A"][step]
+        A0 = np.zeros((len(theta), len(problem["nodes"])))
+        for is_rotor in [False, True]:
+            src = ref["is_rotor_node"] == is_rotor
+            dst = problem["is_rotor_node"] == is_rotor
+            values = ref["A"][step][:, src].T  # (Nsrc, Nt)
+            A0[:, dst] = _interpolate(ref["nodes"][src], values, problem["nodes"][dst]).T
+        return A0
+
+
+def _interpolate(points, values, xi):
+    """Linear interpolation, nearest value outside the convex hull of points"""
+    res = LinearNDInterpolator(points, values)(xi)
+    is_out = np.isnan(res[:, 0])
+    if np.any(is_out):
+        res[is_out] = NearestNDInterpolator(points, values)(xi[is_out])
+    return res
@@ -0,0 +1,207 @@
+"""Surrogate of the magnetic simulation trained on stored runs.
+
+A random forest maps (machine parameters, defect parameters) to the airgap
+flux density harmonics and torque statistics. The spread of the trees gives
+the uncertainty of each prediction: confident queries are answered by the
+model, the others fall back to a real simulation whose result is added to
+the training set.
+"""
+
+import pickle
+
+import numpy as np
+
+
+def comp_machine_features(machine, defect=None):
+    """Scalar parameters of a machine (and of its defect) as a dict
+
+    Args:
+        machine: pyleecan machine (stator with winding, rotor with holes)
+        defect (dict): defect parameters, e.g. {"Ntcoil_fault": 40, "demag": 0.1}
+    """
+    stator, rotor = machine.stator, machine.rotor
+    winding = stator.winding
+    features = {
+        "stator_Rint": stator.Rint,
+        "stator_Rext": stator.Rext,
+        "rotor_Rint": rotor.Rint,
+        "rotor_Rext": rotor.Rext,
+        "L1": stator.L1,
+        "Zs": stator.get_Zs(),
+        "p": winding.p,
+        "Ntcoil": winding.Ntcoil,
+        "Npcp": winding.Npcp,
+    }
+    if winding.wind_mat is not None:
+        wind_mat = np.abs(np.asarray(winding.wind_mat))
+        features["wind_mat_sum"] = wind_mat.sum()
+        features["wind_mat_min"] = wind_mat[wind_mat > 0].min() if np.any(wind_mat > 0) else 0
+    for ii, hole in enumerate(getattr(rotor, "hole", None) or []):
+        for key, value in hole.as_dict().items():
+            if key[0] in "HW" and key[1:].isdigit():
+                features["hole" + str(ii) + "_" + key] = value
+        magnet = getattr(hole, "magnet_0", None)
+        if magnet is not None:
+            features["hole" + str(ii) + "_Brm20"] = magnet.mat_type.mag.Brm20
+    for key, value in (defect or {}).items():
+        features["defect_" + key] = float(value)
+    return features
+
+
+def comp_output_targets(output, nb_harm=6):
+    """Torque statistics and airgap flux density harmonics of a simulation output
+
+    Harmonics are the odd multiples of the pole pair number of the spatial
+    spectrum (time average of the amplitudes), for the radial and tangential
+    components.
+    """
+    Tem = np.asarray(output.mag.Tem.get_along("time")[output.mag.Tem.symbol])
+    p = output.simu.machine.stator.winding.p
+    targets = {
+        "Tem_mean": np.mean(Tem),
+        "Tem_ripple": (np.max(Tem) - np.min(Tem)) / max(abs(np.mean(Tem)), 1e-9),
+        "Tem_std": np.std(Tem),
+    }
+    for comp in ["radial", "tangential"]:
+        B = output.mag.B.components[comp]
+        B = np.asarray(B.get_along("time", "angle")[B.symbol])
+        spectrum = np.mean(np.abs(np.fft.rfft(B, axis=1)), axis=0) * 2 / B.shape[1]
+        for k in range(nb_harm):
+            order = p * (2 * k + 1)
+            targets["B" + comp[0] + "_h" + str(order)] = spectrum[order] if order < len(spectrum) else 0
+    return targets
+
+
+class SurrogateModel:
+    """Random forest surrogate with uncertainty and fallback to the simulation
+
+    Args:
+        n_estimators (int): number of trees
+        threshold (float): maximum relative uncertainty (tree spread divided by
+            the spread of the training targets) of an answered query
+        min_samples (int): number of samples before the model is used
+        simulate (callable): machine -> pyleecan output (None if infeasible), real
+            simulation used for the fallback (scipy solver with load_simulation by default)
+    """
+
+    def __init__(self, n_estimators=100, threshold=0.05, min_samples=10, simulate=None, random_state=0):
+        self.n_estimators = n_estimators
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.simulate = simulate
+        self.random_state = random_state
+        self.feature_names = None
+        self.target_names = None
+        self.X = list()
+        self.Y = list()
+        self.model = None
+        self.Y_scale = None
+        self.nb_surrogate = 0
+        self.nb_simulation = 0
+        self.nb_infeasible = 0
+
+    def add(self, features, targets):
+        """Add a (features, targets) pair of dicts to the training set"""
+        if self.feature_names is None:
+            self.feature_names = sorted(features)
+            self.target_names = sorted(targets)
+        self.X.append(self.to_vector(features))
+        self.Y.append([targets[name] for name in self.target_names])
+
+    def to_vector(self, features):
+        """Features dict in the order of the training set (missing ones are 0)"""
+        return [float(features.get(name, 0)) for name in self.feature_names]
+
+    def fit(self):
+        from sklearn.ensemble import RandomForestRegressor
+
+        if len(self.X) < 2:
+            raise Exception("Not enough samples to fit the surrogate")
+        X, Y = np.array(self.X), np.array(self.Y)
+        self.model = RandomForestRegressor(
+            n_estimators=self.n_estimators, random_state=self.random_state
+        ).fit(X, Y if Y.shape[1] > 1 else Y.ravel())
+        self.Y_scale = np.where(Y.std(axis=0) > 0, Y.std(axis=0), 1)
+        return self
+
+    def predict(self, features_list):
+        """Mean and standard deviation (Nquery, Ntarget) over the trees"""
+        if self.model is None:
+            raise Exception("Fit the surrogate first")
+        X = np.array([self.to_vector(f) for f in features_list])
+        pred = np.array([tree.predict(X) for tree in self.model.estimators_]).reshape(
+            len(self.model.estimators_), len(X), -1
+        )
+        return pred.mean(axis=0), pred.std(axis=0)
+
+    def comp_uncertainty(self, features_list, std):
+        """Relative uncertainty of each query: worst target, infinite outside the training box
+
+        The trees extrapolate with constant values, so their spread says
+        nothing about queries beyond the range of the training features.
+        """
+        X, X_train = np.array([self.to_vector(f) for f in features_list]), np.array(self.X)
+        margin = 1e-9 * np.maximum(np.abs(X_train).max(axis=0), 1)
+        is_out = np.any((X < X_train.min(axis=0) - margin) | (X > X_train.max(axis=0) + margin), axis=1)
+        return np.where(is_out, np.inf, np.max(std / self.Y_scale, axis=-1))
+
+    def query(self, machine, defect=None, is_refit=True):
+        """Targets of a variant, from the surrogate if confident, else simulated
+
+        Returns:
+            dict: targets, plus "uncertainty" and "source" ("surrogate" or
+                "simulation"), only the last two ("source" "infeasible") if the
+                simulation skipped the machine
+        """
+        features = comp_machine_features(machine, defect)
+        if self.model is not None and len(self.X) >= self.min_samples:
+            mean, std = self.predict([features])
+            uncertainty = self.comp_uncertainty([features], std)[0]
+            if uncertainty <= self.threshold:
+                self.nb_surrogate += 1
+                res = dict(zip(self.target_names, mean[0]))
+                res.update({"uncertainty": uncertainty, "source": "surrogate"})
+                return res
+        else:
+            uncertainty = np.inf
+
+        output = self.run_simulation(machine)
+        if output is None:  # machine rejected by util.feasibility.check_machine
+            self.nb_infeasible += 1
+            return {"uncertainty": uncertainty, "source": "infeasible"}
+        targets = comp_output_targets(output)
+        self.nb_simulation += 1
+        self.add(features, targets)
+        if is_refit and len(self.X) >= 2:
+            self.fit()
+        res = dict(targets)
+        res.update({"uncertainty": uncertainty, "source": "simulation"})
+        return res
+
+    def run_simulation(self, machine):
+        if self.simulate is not None:
+            return self.simulate(machine)
+        from util.simulation import load_simulation, run_simulation
+
+        return run_simulation(load_simulation(machine=machine, solver="scipy"))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump({k: v for k, v in self.__dict__.items() if k != "simulate"}, f)
+
+    @classmethod
+    def load(cls, path):
+        surrogate = cls()
+        with open(path, "rb") as f:
+            surrogate.__dict__.update(pickle.load(f))
+        return surrogate
+
+
+def train_from_outputs(runs, **kwargs):
+    """Surrogate trained on stored runs: list of (machine, defect, output), None outputs skipped"""
+    surrogate = SurrogateModel(**kwargs)
+    for machine, defect, output in runs:
+        if output is None:
+            continue
+        surrogate.add(comp_machine_features(machine, defect), comp_output_targets(output))
+    return surrogate.fit()
@@ -0,0 +1,136 @@
+"""Equivalent defect locations from the rotational symmetry of the machine.
+
+Rotating the whole healthy machine by k slot pitches leaves it unchanged
+when the rolled winding matrix is the original one (same phases) and the
+rotor holes are moved onto holes. With the antiperiodicity of a pole pitch
+the rolled winding is the opposite of the original one and the magnets
+are reversed: the machine is then unchanged up to the sign of the field.
+
+A defect at slot s (or angle a) simulated once gives the result of the
+defect at slot s + k (angle a + 2*pi*k/Zs) for each symmetry k of the
+group: B(t, angle) is rolled by k slot pitches and multiplied by the sign,
+the torque is unchanged. For the Toyota Prius (Zs=48, p=4, 8 holes) the
+group has 8 elements, a fault in coil k is equivalent to coils k+6 (field
+reversed), k+12, ... and an eccentricity at alpha to alpha+45deg, alpha+90deg...
+
+    group = comp_machine_symmetry(machine)
+    for sample_k, defect_k in expand_sample(sample, {"slot": 3, "Ntcoil_fault": 40}, group, Zs=48):
+        writer.add(sample_k, family, group="winding", label=...)
+"""
+
+import numpy as np
+
+# Defect keys of a location and their unit ("slot" index or "rad"/"deg" angle)
+LOCATION_KEYS = {"slot": "slot", "coil": "slot", "angle": "rad", "angle_deg": "deg"}
+# Sample fields along the airgap angle (last axis) and fields changing sign
+ANGLE_FIELDS = ("B_radial", "B_tangential")
+SIGNED_FIELDS = ("B_radial", "B_tangential", "Phi_wind", "emf")
+
+
+def comp_symmetry_group(wind_mat, Zh=None, is_antiper_rotor=True):
+    """Slot shifts (k, sign) leaving the machine unchanged (sign -1: field reversed)
+
+    Args:
+        wind_mat (array): winding matrix (Nrad, Ntan, Zs, qs)
+        Zh (int): number of rotor holes (or poles), no rotor constraint if None
+        is_antiper_rotor (bool): the rotor is antiperiodic over one hole pitch
+            (alternate magnet polarities)
+
+    Returns:
+        list: [(k, sign)] sorted by k, (0, 1) included
+    """
+    wind_mat = np.asarray(wind_mat, dtype=float)
+    Zs = wind_mat.shape[2]
+    group = list()
+    for k in range(Zs):
+        rolled = np.roll(wind_mat, k, axis=2)
+        for sign in [1, -1]:
+            if not np.array_equal(rolled, sign * wind_mat):
+                continue
+            if Zh is not None:
+                # The rotor moves by k * Zh / Zs hole pitches
+                if (k * Zh) % Zs != 0:
+                    continue
+                nb_hole = k * Zh // Zs
+                rotor_sign = (-1) ** nb_hole if is_antiper_rotor else 1
+                if rotor_sign != sign:
+                    continue
+            group.append((k, sign))
+            break
+    return group
+
+
+def comp_machine_symmetry(machine):
+    """comp_symmetry_group of a pyleecan machine (holes of the rotor, 2p poles otherwise)"""
+    winding = machine.stator.winding
+    holes = getattr(machine.rotor, "hole", None) or []
+    Zh = holes[0].Zh if holes else 2 * winding.p
+    return comp_symmetry_group(winding.wind_mat, Zh=Zh)
+
+
+def transform_defect(defect, k, Zs):
+    """Defect parameters with their location moved by k slot pitches"""
+    moved = dict(defect)
+    for key, unit in LOCATION_KEYS.items():
+        if key not in defect:
+            continue
+        if unit == "slot":
+            moved[key] = (defect[key] + k) % Zs
+        elif unit == "rad":
+            moved[key] = (defect[key] + 2 * np.pi * k / Zs) % (2 * np.pi)
+        else:
+            moved[key] = (defect[key] + 360.0 * k / Zs) % 360.0
+    return moved
+
+
+def roll_angle(field, k, Zs):
+    """Field rolled by k slot pitches along its last axis (angle over 2*pi)
+
+    Exact roll when k slot pitches are a whole number of angle points,
+    Fourier phase shift otherwise (e.g. 2048 points and 48 slots).
+    """
+    Na = field.shape[-1]
+    shift = k * Na / Zs
+    if float(shift).is_integer():
+        return np.roll(field, int(shift), axis=-1)
+    orders = np.fft.rfftfreq(Na, 1 / Na)
+    spectrum = np.fft.rfft(field, axis=-1) * np.exp(-2j * np.pi * orders * shift / Na)
+    return np.fft.irfft(spectrum, n=Na, axis=-1).astype(field.dtype)
+
+
+def transform_sample(sample, k, sign, Zs, angle_fields=ANGLE_FIELDS, signed_fields=SIGNED_FIELDS):
+    """Sample of the machine rotated by k slot pitches"""
+    moved = dict(sample)
+    for key in sample:
+        value = sample[key]
+        if key in angle_fields:
+            value = roll_angle(np.asarray(value), k, Zs)
+        if key in signed_fields and sign == -1:
+            value = -np.asarray(value)
+        moved[key] = value
+    return moved
+
+
+def expand_sample(sample, defect, group, Zs, is_identity=True):
+    """(sample, defect) of each distinct defect location of the symmetry group
+
+    Args:
+        sample (dict): fields of the simulated defect (see util.dataset.comp_output_sample)
+        defect (dict): defect parameters with a location (see LOCATION_KEYS)
+        group (list): [(k, sign)] of comp_symmetry_group
+        is_identity (bool): include the simulated sample itself
+
+    Returns:
+        list: [(sample, defect)]
+    """
+    expanded, seen = list(), set()
+    for k, sign in group:
+        moved = transform_defect(defect, k, Zs)
+        key = tuple(np.round(moved[name], 9) for name in LOCATION_KEYS if name in moved)
+        if key in seen:
+            continue
+        seen.add(key)
+        if k == 0 and not is_identity:
+            continue
+        expanded.append((transform_sample(sample, k, sign, Zs), moved))
+    return expanded
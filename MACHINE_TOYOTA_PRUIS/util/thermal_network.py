@@ -0,0 +1,358 @@
+"""Lumped-parameter thermal network of the machine, batched over defect cases.
+
+The stator and rotor are split into angular sectors (one per slot pitch by
+default), each with a yoke, tooth, winding, end winding, magnet and rotor
+iron node, plus three global nodes (airgap, housing, shaft). The housing is
+cooled by a water jacket at T_cool. The conductances come from the geometry
+(radii, length, slot) and the thermal parameters of THERMAL_PARAMS, each
+edge belongs to a group ("cooling", "end_space", "airgap", "bearing",
+"slot_liner", "iron", "copper") that a defect can scale.
+
+A batch of cases (different losses and edge scales) is assembled as one
+block-diagonal sparse system (cases x nodes unknowns) and solved with a
+single sparse LU: steady state, or backward Euler transient from an initial
+temperature. The results are mapped to the inputs of the electromagnetic
+runs: magnet temperature (MagFEMM.T_mag, fe_solver T_mag) and winding
+temperature and resistance of each phase.
+
+    network = ThermalNetwork(GEOMETRIES["Toyota_Prius"])
+    P = network.comp_node_losses(copper=1500, tooth=300, yoke=400)
+    T = solve_defect_cases(network, defects, P)  # defects of ThermalDefectGenerator
+    inputs = network.comp_em_inputs(T, wind_mat=wind_mat, R20=0.077)
+"""
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.linalg import splu
+
+from util.losses import comp_resistance
+from util.tracing import traced
+
+# Stator and rotor dimensions [m] (pyleecan machine files of the repository)
+GEOMETRIES = {
+    "Toyota_Prius": {
+        "Rext": 0.13462,
+        "Rint": 0.08095,
+        "L": 0.08382,
+        "Zs": 48,
+        "h_slot": 0.0343,
+        "S_slot": 2.18e-4,
+        "Rrot": 0.0802,
+        "Rshaft": 0.05532,
+        "h_magnet": 0.0065,
+    },
+    "Tesla_Model3": {
+        "Rext": 0.10685,
+        "Rint": 0.0753,
+        "L": 0.134,
+        "Zs": 54,
+        "h_slot": 0.0189,
+        "S_slot": 1.01e-4,
+        "Rrot": 0.07485,
+        "Rshaft": 0.033,
+        "h_magnet": 0.005,
+    },
+}
+THERMAL_PARAMS = {
+    "k_iron": 30.0,  # lamination, in plane [W/m/K]
+    "k_copper": 390.0,
+    "k_slot": 1.0,  # impregnated winding, across the conductors
+    "fill": 0.45,  # copper fill factor of the slot
+    "h_contact": 2000.0,  # yoke to housing [W/m2/K]
+    "h_cool": 1500.0,  # water jacket
+    "h_gap": 80.0,  # airgap convection
+    "h_end": 15.0,  # end winding to end-space air
+    "G_bearing": 1.0,  # shaft to housing [W/K]
+    "l_end": 0.03,  # end winding overhang [m]
+    "t_housing": 0.01,  # housing thickness [m]
+    "T_cool": 65.0,  # coolant [degC]
+}
+# Volumetric heat capacity [J/m3/K]
+RHO_CP = {"iron": 7650 * 460.0, "copper": 8900 * 385.0, "magnet": 7500 * 440.0, "aluminium": 2700 * 900.0}
+SECTOR_NODES = ("yoke", "tooth", "winding", "end_winding", "magnet", "rotor")
+GLOBAL_NODES = ("airgap", "housing", "shaft")
+
+
+class ThermalNetwork:
+    """Nodes, conductances [W/K] and capacities [J/K] of the thermal network
+
+    Args:
+        geometry (dict): dimensions (see GEOMETRIES)
+        nb_sector (int): angular sectors, Zs by default
+        params (dict): values replacing those of THERMAL_PARAMS
+    """
+
+    def __init__(self, geometry, nb_sector=None, params=None):
+        self.geometry = dict(geometry)
+        self.params = dict(THERMAL_PARAMS, **(params or {}))
+        self.nb_sector = nb_sector or geometry["Zs"]
+        self.N = len(SECTOR_NODES) * self.nb_sector + len(GLOBAL_NODES)
+        self.edges = {"i": list(), "j": list(), "G": list(), "group": list()}
+        self.boundary = {"i": list(), "G": list(), "group": list()}  # edges to the coolant
+        self.build()
+        self.edges = {k: np.array(v) for k, v in self.edges.items()}
+        self.boundary = {k: np.array(v) for k, v in self.boundary.items()}
+
+    def node(self, name, k=None):
+        """Index of a node (k: sector, array allowed, for the sector nodes)
+
+        The nodes of a sector are contiguous and the global nodes last, so the
+        matrix of a case is banded with a few dense rows (little LU fill-in).
+        """
+        if name in GLOBAL_NODES:
+            return len(SECTOR_NODES) * self.nb_sector + GLOBAL_NODES.index(name)
+        return (np.asarray(k) % self.nb_sector) * len(SECTOR_NODES) + SECTOR_NODES.index(name)
+
+    def add_edges(self, i, j, G, group):
+        i, j, G = np.broadcast_arrays(np.atleast_1d(i), np.atleast_1d(j), np.atleast_1d(np.asarray(G, dtype=float)))
+        self.edges["i"] += i.tolist()
+        self.edges["j"] += j.tolist()
+        self.edges["G"] += G.tolist()
+        self.edges["group"] += [group] * len(i)
+
+    def build(self):
+        g, q = self.geometry, self.params
+        n = self.nb_sector
+        k = np.arange(n)
+        dangle = 2 * np.pi / n
+        L = g["L"]
+        h_yoke = g["Rext"] - g["Rint"] - g["h_slot"]
+        w_slot = g["S_slot"] / g["h_slot"] * g["Zs"] / n  # slot width per sector
+        w_tooth = (g["Rint"] + g["h_slot"] / 2) * dangle - w_slot
+        S_copper = q["fill"] * g["S_slot"] * g["Zs"] / n
+        R_yoke = g["Rext"] - h_yoke / 2
+        R_rotor = (g["Rrot"] - g["h_magnet"] + g["Rshaft"]) / 2
+        h_rotor = g["Rrot"] - g["h_magnet"] - g["Rshaft"]
+
+        # Stator
+        A_out = g["Rext"] * dangle * L
+        G_out = 1 / (1 / (q["h_contact"] * A_out) + h_yoke / 2 / (q["k_iron"] * A_out))
+        self.add_edges(self.node("yoke", k), self.node("housing"), G_out, "iron")
+        self.add_edges(self.node("yoke", k), self.node("yoke", k + 1), q["k_iron"] * h_yoke * L / (R_yoke * dangle), "iron")
+        self.add_edges(self.node("tooth", k), self.node("yoke", k), q["k_iron"] * w_tooth * L / ((g["h_slot"] + h_yoke) / 2), "iron")
+        self.add_edges(self.node("winding", k), self.node("tooth", k), q["k_slot"] * 2 * g["h_slot"] * L / (w_slot / 4), "slot_liner")
+        self.add_edges(self.node("winding", k), self.node("yoke", k), q["k_slot"] * w_slot * L / (g["h_slot"] / 2), "slot_liner")
+        # Copper along the axis to the end windings (both ends in one node)
+        G_axial = 2 * q["k_copper"] * S_copper / ((L + q["l_end"]) / 2)
+        self.add_edges(self.node("winding", k), self.node("end_winding", k), G_axial, "copper")
+        A_end = 2 * 2 * (g["h_slot"] + w_slot) * q["l_end"]
+        self.add_edges(self.node("end_winding", k), self.node("housing"), q["h_end"] * A_end, "end_space")
+
+        # Airgap and rotor
+        self.add_edges(self.node("tooth", k), self.node("airgap"), q["h_gap"] * g["Rint"] * dangle * L, "airgap")
+        self.add_edges(self.node("magnet", k), self.node("airgap"), q["h_gap"] * g["Rrot"] * dangle * L, "airgap")
+        A_mag = (g["Rrot"] - g["h_magnet"] / 2) * dangle * L
+        self.add_edges(self.node("magnet", k), self.node("rotor", k), q["k_iron"] * A_mag / g["h_magnet"], "iron")
+        self.add_edges(self.node("rotor", k), self.node("rotor", k + 1), q["k_iron"] * h_rotor * L / (R_rotor * dangle), "iron")
+        self.add_edges(self.node("rotor", k), self.node("shaft"), q["k_iron"] * R_rotor * dangle * L / (h_rotor / 2), "iron")
+        self.add_edges(self.node("shaft"), self.node("housing"), q["G_bearing"], "bearing")
+
+        # Water jacket
+        self.boundary["i"].append(self.node("housing"))
+        self.boundary["G"].append(q["h_cool"] * 2 * np.pi * (g["Rext"] + q["t_housing"]) * L)
+        self.boundary["group"].append("cooling")
+
+        # Heat capacities
+        C = np.zeros(self.N)
+        C[self.node("yoke", k)] = RHO_CP["iron"] * h_yoke * R_yoke * dangle * L
+        C[self.node("tooth", k)] = RHO_CP["iron"] * w_tooth * g["h_slot"] * L
+        C[self.node("winding", k)] = RHO_CP["copper"] * S_copper * L
+        C[self.node("end_winding", k)] = RHO_CP["copper"] * S_copper * 2 * q["l_end"]
+        C[self.node("magnet", k)] = RHO_CP["magnet"] * g["h_magnet"] * A_mag
+        C[self.node("rotor", k)] = RHO_CP["iron"] * h_rotor * R_rotor * dangle * L
+        C[self.node("airgap")] = 1.0  # air, negligible
+        C[self.node("housing")] = RHO_CP["aluminium"] * 2 * np.pi * g["Rext"] * q["t_housing"] * (L + 2 * q["l_end"])
+        C[self.node("shaft")] = RHO_CP["iron"] * np.pi * g["Rshaft"] ** 2 * (L + 0.1)
+        self.C = C
+
+    def comp_edge_scale(self, nb_case, **group_scale):
+        """Edge and boundary conductance multipliers (nb_case, E), (nb_case, Eb), e.g. cooling=0.5"""
+        edge = np.ones((nb_case, len(self.edges["G"])))
+        boundary = np.ones((nb_case, len(self.boundary["G"])))
+        for group, scale in group_scale.items():
+            scale = np.broadcast_to(np.asarray(scale, dtype=float), (nb_case,))[:, None]
+            edge[:, self.edges["group"] == group] *= scale
+            boundary[:, self.boundary["group"] == group] *= scale
+        return edge, boundary
+
+    def comp_node_losses(self, copper=0.0, tooth=0.0, yoke=0.0, rotor=0.0, magnet=0.0):
+        """Node losses (B, N) [W] from the total losses of each region, scalars or (B,)
+
+        The copper losses are split between the slots and the end windings in
+        proportion of their copper length, the others evenly between the sectors.
+        """
+        values = np.broadcast_arrays(*[np.atleast_1d(np.asarray(v, dtype=float)) for v in [copper, tooth, yoke, rotor, magnet]])
+        copper, tooth, yoke, rotor, magnet = values
+        P = np.zeros((len(copper), self.N))
+        k = np.arange(self.nb_sector)
+        ratio = self.geometry["L"] / (self.geometry["L"] + 2 * self.params["l_end"])
+        for name, value in [
+            ("winding", ratio * copper),
+            ("end_winding", (1 - ratio) * copper),
+            ("tooth", tooth),
+            ("yoke", yoke),
+            ("rotor", rotor),
+            ("magnet", magnet),
+        ]:
+            P[:, self.node(name, k)] = value[:, None] / self.nb_sector
+        return P
+
+    def assemble(self, edge_scale=None, boundary_scale=None, nb_case=1):
+        """Block-diagonal conductance matrix (B N, B N) and boundary conductances (B, N)"""
+        E = len(self.edges["G"])
+        G = self.edges["G"] * (1 if edge_scale is None else edge_scale)  # (B, E)
+        G = np.broadcast_to(G, (nb_case, E))
+        offset = (np.arange(nb_case) * self.N)[:, None]
+        i, j = self.edges["i"] + offset, self.edges["j"] + offset
+        rows = np.concatenate([i, j, i, j], axis=1).ravel()
+        cols = np.concatenate([i, j, j, i], axis=1).ravel()
+        data = np.concatenate([G, G, -G, -G], axis=1).ravel()
+        Gb = np.zeros((nb_case, self.N))
+        Gb_edges = np.broadcast_to(self.boundary["G"] * (1 if boundary_scale is None else boundary_scale), (nb_case, len(self.boundary["G"])))
+        np.add.at(Gb, (slice(None), self.boundary["i"]), Gb_edges)
+        rows = np.concatenate([rows, np.arange(nb_case * self.N)])
+        cols = np.concatenate([cols, np.arange(nb_case * self.N)])
+        data = np.concatenate([data, Gb.ravel()])
+        size = nb_case * self.N
+        return coo_matrix((data, (rows, cols)), shape=(size, size)).tocsc(), Gb
+
+    @traced()
+    def solve_steady(self, P, edge_scale=None, boundary_scale=None, T_cool=None):
+        """Steady-state temperatures (B, N) [degC] of the node losses P (B, N)"""
+        P = np.atleast_2d(P)
+        T_cool = self.params["T_cool"] if T_cool is None else T_cool
+        G, Gb = self.assemble(edge_scale, boundary_scale, len(P))
+        return splu(G, permc_spec="NATURAL").solve((P + Gb * T_cool).ravel()).reshape(P.shape)
+
+    @traced()
+    def solve_transient(self, P, T0, duration, edge_scale=None, boundary_scale=None, nb_step=200, T_cool=None):
+        """Temperatures (B, N) after duration (B,) [s] of the losses P, from T0 (B, N)
+
+        Backward Euler with nb_step steps of duration / nb_step for each case
+        (the time step is per block of the block-diagonal system).
+        """
+        P = np.atleast_2d(P)
+        B = len(P)
+        T_cool = self.params["T_cool"] if T_cool is None else T_cool
+        duration = np.broadcast_to(np.asarray(duration, dtype=float), (B,))
+        dt = np.where(duration > 0, duration, 1.0) / nb_step
+        G, Gb = self.assemble(edge_scale, boundary_scale, B)
+        C_dt = (self.C[None, :] / dt[:, None]).ravel()
+        diag = np.arange(B * self.N)
+        lu = splu((G + coo_matrix((C_dt, (diag, diag)), shape=G.shape)).tocsc(), permc_spec="NATURAL")
+        source = (P + Gb * T_cool).ravel()
+        T0 = np.broadcast_to(np.asarray(T0, dtype=float), (B, self.N))
+        T = T0.ravel()
+        for _ in range(nb_step):
+            T = lu.solve(source + C_dt * T)
+        return np.where((duration > 0)[:, None], T.reshape(B, self.N), T0)
+
+    def comp_em_inputs(self, T, wind_mat=None, R20=None):
+        """Inputs of the electromagnetic runs from the node temperatures T (B, N)
+
+        Args:
+            wind_mat (array): winding matrix (Nrad, Ntan, Zs, qs), for the phase temperatures
+            R20 (float): phase resistance at 20 degC [Ohm], for the phase resistances
+
+        Returns:
+            dict: "T_mag" (B,) mean magnet temperature, "T_mag_sector" (B, nb_sector),
+                "T_winding" and "T_winding_max" (B,), "T_phase" and "R" (B, qs)
+        """
+        T = np.atleast_2d(T)
+        k = np.arange(self.nb_sector)
+        T_mag = T[:, self.node("magnet", k)]
+        ratio = self.geometry["L"] / (self.geometry["L"] + 2 * self.params["l_end"])
+        T_winding = ratio * T[:, self.node("winding", k)] + (1 - ratio) * T[:, self.node("end_winding", k)]
+        inputs = {
+            "T_mag": T_mag.mean(axis=1),
+            "T_mag_sector": T_mag,
+            "T_winding": T_winding.mean(axis=1),
+            "T_winding_max": np.maximum(T[:, self.node("winding", k)], T[:, self.node("end_winding", k)]).max(axis=1),
+        }
+        if wind_mat is not None:
+            # Turns of each phase in each sector (slots grouped by sector)
+            turns = np.abs(np.asarray(wind_mat, dtype=float)).sum(axis=(0, 1))  # (Zs, qs)
+            sector = np.arange(len(turns)) * self.nb_sector // len(turns)
+            weight = np.zeros((self.nb_sector, turns.shape[1]))
+            np.add.at(weight, sector, turns)
+            inputs["T_phase"] = T_winding @ weight / weight.sum(axis=0)
+            if R20 is not None:
+                inputs["R"] = comp_resistance(R20, inputs["T_phase"])
+        return inputs
+
+
+def comp_defect_cases(network, defects, P):
+    """Node losses and conductance scales of thermal defects (ThermalDefectGenerator dicts)
+
+    - hotspot: local loss in the affected sectors (area_affected) of the layer
+      at radial_pos, sized for temp_increase over the local conductance,
+    - cooling_failure: cooling of the affected components reduced by
+      efficiency_reduction (stator: water jacket and end space, rotor: airgap,
+      bearings),
+    - overload: copper losses times current_increase^2 during duration,
+    - other types: healthy network.
+
+    Args:
+        P (array): node losses of the healthy machine (N,) or (B, N)
+
+    Returns:
+        dict: "P" (B, N), "edge_scale" (B, E), "boundary_scale" (B, Eb), "duration" (B,) (inf: steady state)
+    """
+    B = len(defects)
+    P = np.array(np.broadcast_to(P, (B, network.N)), dtype=float)
+    edge_scale, boundary_scale = network.comp_edge_scale(B)
+    duration = np.full(B, np.inf)
+    g = network.geometry
+    k = np.arange(network.nb_sector)
+    G_node = np.zeros(network.N)
+    np.add.at(G_node, network.edges["i"], network.edges["G"])
+    np.add.at(G_node, network.edges["j"], network.edges["G"])
+    # Layers of a hotspot by radius (radial_pos relative to Rext)
+    layers = [
+        ("rotor", (g["Rrot"] - g["h_magnet"] + g["Rshaft"]) / 2),
+        ("magnet", g["Rrot"] - g["h_magnet"] / 2),
+        ("winding", g["Rint"] + g["h_slot"] / 2),
+        ("yoke", (g["Rint"] + g["h_slot"] + g["Rext"]) / 2),
+    ]
+    components = {"stator": ["cooling", "end_space"], "rotor": ["airgap"], "bearings": ["bearing"]}
+    for ii, defect in enumerate(defects):
+        kind = defect["defect_type"]
+        if kind == "hotspot":
+            position = defect["position"]
+            layer = min(layers, key=lambda x: abs(x[1] - position["radial_pos"] * g["Rext"]))[0]
+            nb = max(1, int(round(defect["area_affected"] * network.nb_sector)))
+            center = int(position["angular_pos"] / (2 * np.pi) * network.nb_sector)
+            nodes = network.node(layer, center - nb // 2 + np.arange(nb))
+            P[ii, nodes] += defect["temp_increase"] * G_node[nodes]
+        elif kind == "cooling_failure":
+            for component in defect["components_affected"]:
+                for group in components[component]:
+                    edge_scale[ii, network.edges["group"] == group] *= 1 - defect["efficiency_reduction"]
+                    boundary_scale[ii, network.boundary["group"] == group] *= 1 - defect["efficiency_reduction"]
+        elif kind == "overload":
+            copper = network.node("winding", k).tolist() + network.node("end_winding", k).tolist()
+            P[ii, copper] *= defect["current_increase"] ** 2
+            duration[ii] = defect["duration"]
+    return {"P": P, "edge_scale": edge_scale, "boundary_scale": boundary_scale, "duration": duration}
+
+
+@traced()
+def solve_defect_cases(network, defects, P, nb_step=200):
+    """Node temperatures (B, N) of thermal defects, steady state or transient (overloads)
+
+    The transients start from the steady state of the healthy machine.
+    """
+    cases = comp_defect_cases(network, defects, P)
+    T = network.solve_steady(cases["P"], cases["edge_scale"], cases["boundary_scale"])
+    is_transient = np.isfinite(cases["duration"])
+    if np.any(is_transient):
+        T0 = network.solve_steady(np.broadcast_to(P, (len(defects), network.N))[is_transient])
+        T[is_transient] = network.solve_transient(
+            cases["P"][is_transient],
+            T0,
+            cases["duration"][is_transient],
+            cases["edge_scale"][is_transient],
+            cases["boundary_scale"][is_transient],
+            nb_step=nb_step,
+        )
+    return T
@@ -0,0 +1,166 @@
+"""PyTorch dataset over the shards of util.dataset.
+
+The shards are opened with memory mapping in each DataLoader worker; a sample
+is located with a binary search on the shard offsets, so the dataset holds no
+Python object per sample and the workers only read the pages they use.
+FEMM and pyleecan are never imported.
+
+Augmentations are applied on the fly and keep the physics of the samples
+(one mechanical revolution of B(t, angle) with 32*p steps, see
+load_simulation):
+- roll of the airgap angle by k pole pitches (Na / 2p points), B changing
+  sign for odd k since the field of a pole pitch is antiperiodic,
+- shift of the time axis by whole electrical periods (Nt / p steps),
+- Gaussian sensor noise relative to the RMS of each field.
+The unbalanced magnetic pull UMP (Nt, 2) of util.force follows the field: it
+is shifted in time and its (Fx, Fy) rotated by the k pi / p of the angle
+roll. The force wave amplitudes do not change under both transformations.
+
+    loader = make_loader("dataset", "train", batch_size=64, num_workers=8, augment=Augment(noise_std=0.01))
+"""
+
+import os
+from bisect import bisect_right
+from os.path import join
+
+import numpy as np
+
+from util.dataset import load_manifest
+
+try:
+    from torch.utils.data import Dataset
+except ImportError:  # the dataset can still be indexed without torch
+    Dataset = object
+
+
+class Augment:
+    """Random physics-consistent transformations of a sample
+
+    Args:
+        is_roll (bool): roll the angle by a random number of pole pitches
+        is_time_shift (bool): shift the time by a random number of electrical periods
+        noise_std (float): noise standard deviation relative to the field RMS
+        p (int): pole pairs when the samples have no "p" field
+        fields (tuple): fields transformed, time first and angle last
+        vectors (tuple): (Nt, 2) fields of x and y components, shifted and rotated
+    """
+
+    def __init__(
+        self,
+        is_roll=True,
+        is_time_shift=True,
+        noise_std=0.0,
+        p=None,
+        fields=("Tem", "B_radial", "B_tangential"),
+        vectors=("UMP",),
+    ):
+        self.fields = fields
+        self.vectors = vectors
+        self.is_roll = is_roll
+        self.is_time_shift = is_time_shift
+        self.noise_std = noise_std
+        self.p = p
+
+    def __call__(self, sample, rng):
+        p = int(sample["p"]) if "p" in sample else self.p
+        fields = [k for k in self.fields if k in sample]
+        vectors = [k for k in self.vectors if k in sample]
+        Nt = sample[(fields + vectors)[0]].shape[0]
+        if self.is_time_shift and p and Nt % p == 0:
+            shift = rng.integers(p) * (Nt // p)
+            for key in fields + vectors:
+                sample[key] = np.roll(sample[key], shift, axis=0)
+        if self.is_roll and p:
+            for key in fields:
+                if sample[key].ndim == 2 and sample[key].shape[1] % (2 * p) == 0:
+                    k = rng.integers(2 * p)
+                    break
+            else:
+                k = 0
+            for key in fields:
+                if k and sample[key].ndim == 2:
+                    sample[key] = np.roll(sample[key], k * sample[key].shape[1] // (2 * p), axis=1) * (-1) ** k
+            if k:
+                # The field turns by k pole pitches counter-clockwise, and so does the net force
+                c, s = np.cos(k * np.pi / p), np.sin(k * np.pi / p)
+                rot = np.array([[c, -s], [s, c]])
+                for key in vectors:
+                    sample[key] = (sample[key] @ rot.T).astype(sample[key].dtype)
+        if self.noise_std > 0:
+            for key in fields:
+                rms = np.sqrt(np.mean(sample[key] ** 2))
+                sample[key] = sample[key] + rng.normal(0, self.noise_std * rms, sample[key].shape).astype(sample[key].dtype)
+        return sample
+
+
+class ShardDataset(Dataset):
+    """Samples of a split of a sharded dataset, read with memory mapping
+
+    Args:
+        root (str): dataset folder (see util.dataset.ShardWriter)
+        split (str): "train", "val" or "test"
+        fields (list): fields returned, all the fields by default
+        augment (callable): (sample, rng) -> sample, e.g. Augment
+        dtype: type of the returned arrays
+    """
+
+    def __init__(self, root, split="train", fields=None, augment=None, dtype=np.float32, seed=0):
+        manifest = load_manifest(root)
+        self.root = root
+        self.classes = manifest["classes"]
+        self.fields = list(fields or manifest["fields"])
+        self.shards = [s for s in manifest["shards"] if s["split"] == split]
+        self.offsets = np.cumsum([0] + [s["count"] for s in self.shards]).tolist()
+        self.label_maps = [np.asarray(s["label_map"], dtype=np.int64) for s in self.shards]
+        self.augment = augment
+        self.dtype = dtype
+        self.seed = seed
+        self.arrays = dict()
+        self.rng = None
+        self.pid = None
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def get_array(self, index_shard, key):
+        # Opened on first use in each worker process (memory maps are not shared)
+        if (index_shard, key) not in self.arrays:
+            path = join(self.root, self.shards[index_shard]["prefix"] + "_" + key + ".npy")
+            self.arrays[(index_shard, key)] = np.load(path, mmap_mode="r")
+        return self.arrays[(index_shard, key)]
+
+    def get_rng(self):
+        # One random stream per worker process
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.rng = np.random.default_rng([self.seed, self.pid])
+        return self.rng
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        index_shard = bisect_right(self.offsets, index) - 1
+        ii = index - self.offsets[index_shard]
+        sample = dict()
+        for key in self.fields:
+            value = self.get_array(index_shard, key)[ii]
+            sample[key] = value if key == "p" else np.array(value, dtype=self.dtype)
+        if self.augment is not None:
+            sample = self.augment(sample, self.get_rng())
+        sample["label"] = self.label_maps[index_shard][self.get_array(index_shard, "label")[ii]]
+        return sample
+
+
+def make_loader(root, split="train", batch_size=64, num_workers=4, augment=None, fields=None, **kwargs):
+    """DataLoader of a split (shuffled for train, worker processes kept alive)"""
+    from torch.utils.data import DataLoader
+
+    dataset = ShardDataset(root, split, fields=fields, augment=augment if split == "train" else None)
+    return DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=split == "train",
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0,
+        **kwargs
+    )
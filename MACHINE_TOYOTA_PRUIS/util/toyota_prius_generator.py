@@ -1,63 +1,100 @@
-from pyleecan.Classes.LamSlotWind import LamSlotWind
-from pyleecan.Classes.LamSlotMag import LamSlotMag
-from pyleecan.Classes.LamSlot import LamSlot
-from pyleecan.Classes.Winding import Winding
-from pyleecan.Classes.SlotW10 import SlotW10
-from pyleecan.Classes.SlotW22 import SlotW22
-from pyleecan.Classes.Shaft import Shaft
-from pyleecan.Classes.Material import Material
-from pyleecan.Classes.MachineIPMSM import MachineIPMSM
-from pyleecan.Classes.LamHole import LamHole
-from pyleecan.Classes.HoleM50 import HoleM50
-from pyleecan.Classes.Magnet import Magnet
-from pyleecan.Classes.MatMagnetics import MatMagnetics
-from pyleecan.Functions.load import load
-from pyleecan.definitions import DATA_DIR
-from pyleecan.Classes.MatElectrical import MatElectrical
-from pyleecan.Classes.ImportMatrix import ImportMatrix
-from pyleecan.Classes. MatStructural import MatStructural
-from pyleecan.Classes.ModelBH import ModelBH
-from pyleecan.Classes.MatHT import MatHT
-from pyleecan.Classes.CondType12 import CondType12
-from pyleecan.Classes.SlotW11 import SlotW11
-from pyleecan.Classes.EndWinding import EndWinding
-from pyleecan.Classes.Simu1 import Simu1
-from pyleecan.Classes.Electrical import Electrical
-from pyleecan.Classes.EEC_PMSM import EEC_PMSM
-from pyleecan.Classes.MagFEMM import MagFEMM
-from pyleecan.Classes.InputCurrent import InputCurrent
-from pyleecan.Classes.OPdq import OPdq
 from os.path import join
 
+from util.lazy import lazy_getattr, pyleecan_classes
+from util.tracing import traced
 
-class Toyota_Prius_Generator:
+# pyleecan is imported by the methods that build the machine: importing this
+# module (e.g. in every worker process) loads neither pyleecan nor a material.
+# The names it used to import at module level stay available, on first access.
+_LAZY_NAMES = pyleecan_classes(
+    "LamSlotWind",
+    "LamSlotMag",
+    "LamSlot",
+    "Winding",
+    "SlotW10",
+    "SlotW22",
+    "Shaft",
+    "Material",
+    "MachineIPMSM",
+    "LamHole",
+    "HoleM50",
+    "Magnet",
+    "MatMagnetics",
+    "MatElectrical",
+    "ImportMatrix",
+    "MatStructural",
+    "ModelBH",
+    "MatHT",
+    "CondType12",
+    "SlotW11",
+    "EndWinding",
+    "Simu1",
+    "Electrical",
+    "EEC_PMSM",
+    "MagFEMM",
+    "InputCurrent",
+    "OPdq",
+)
+_LAZY_NAMES.update({"load": "pyleecan.Functions.load", "DATA_DIR": "pyleecan.definitions"})
+__getattr__ = lazy_getattr(__name__, _LAZY_NAMES)
+__all__ = ["Toyota_Prius_Generator", "load_material", "join"] + list(_LAZY_NAMES)
 
-    def __init__(self, shaft_material=None, rotor_material=None, magnet_material=None, stator_material=None, Ntcoil=9, custom_wind_mat=None):
-        if shaft_material is None:
-            shaft_material = load(join(DATA_DIR, "Material", "M400-50A.json"))
-        self.shaft_material = shaft_material
+# Default material of each part, loaded on first use
+DEFAULT_MATERIALS = {
+    "shaft_material": "M400-50A",
+    "rotor_material": "M400-50A",
+    "magnet_material": "MagnetPrius",
+    "stator_material": "M400-50A",
+}
 
-        if rotor_material is None:
-            rotor_material = load(join(DATA_DIR, "Material", "M400-50A.json"))
-        self.rotor_material = rotor_material
-        
-        if magnet_material is None:
-            magnet_material = load(join(DATA_DIR, "Material", "MagnetPrius.json"))
-        self.magnet_material = magnet_material
 
-        if stator_material is None:
-            self.stator_material = load(join(DATA_DIR, "Material", "M400-50A.json"))
+@traced("load_material")
+def load_material(name):
+    """Material of the pyleecan library (Material folder of DATA_DIR)"""
+    from pyleecan.definitions import DATA_DIR
+    from pyleecan.Functions.load import load
+
+    return load(join(DATA_DIR, "Material", name + ".json"))
+
+
+class Toyota_Prius_Generator:
+
+    def __init__(self, shaft_material=None, rotor_material=None, magnet_material=None, stator_material=None, Ntcoil=9, custom_wind_mat=None):
+        # Materials not given are loaded on first access (see __getattr__)
+        for key, material in [
+            ("shaft_material", shaft_material),
+            ("rotor_material", rotor_material),
+            ("magnet_material", magnet_material),
+            ("stator_material", stator_material),
+        ]:
+            if material is not None:
+                setattr(self, key, material)
 
         self.Ntcoil = Ntcoil
         self.custom_wind_mat = custom_wind_mat
+
+    def __getattr__(self, name):
+        if name in DEFAULT_MATERIALS:
+            material = load_material(DEFAULT_MATERIALS[name])
+            setattr(self, name, material)
+            return material
+        raise AttributeError(name)
         
+    @traced()
     def create_shaft(self):
+        from pyleecan.Classes.Shaft import Shaft
+
         shaft = Shaft(Lshaft=0.1, mat_type=self.shaft_material, Drsh=0.11064)
         return shaft
 
+    @traced()
     def create_rotor(self):
+        from pyleecan.Classes.HoleM50 import HoleM50
+        from pyleecan.Classes.LamHole import LamHole
+        from pyleecan.Classes.Magnet import Magnet
+
         # Define the air material
-        air_material = load(join(DATA_DIR, "Material", "Air.json"))
+        air_material = load_material("Air")
         
         # Define magnet objects
         magnet_0 = Magnet(
@@ -114,8 +151,15 @@ class Toyota_Prius_Generator:
 
         return rotor
 
+    @traced()
     def create_stator(self): 
-        copper_1 = load(join(DATA_DIR, "Material", "Copper1.json"))
+        from pyleecan.Classes.CondType12 import CondType12
+        from pyleecan.Classes.EndWinding import EndWinding
+        from pyleecan.Classes.LamSlotWind import LamSlotWind
+        from pyleecan.Classes.SlotW11 import SlotW11
+        from pyleecan.Classes.Winding import Winding
+
+        copper_1 = load_material("Copper1")
         conductor = CondType12(cond_mat=copper_1)
         
         slot = SlotW11(
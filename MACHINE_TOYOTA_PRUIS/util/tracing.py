@@ -0,0 +1,220 @@
+"""Per-stage timing of the simulation pipeline as a Chrome trace.
+
+Stages are marked with the span context manager or the traced decorator.
+While tracing is disabled (default) a span is a shared no-op context and a
+traced function only pays one global lookup. Once enabled, each span records
+its wall and CPU time (and, with memory=True, the peak of Python allocations
+through tracemalloc) as a complete event of the Chrome trace format: open the
+saved JSON with chrome://tracing or https://ui.perfetto.dev.
+
+    from util.tracing import enable_tracing, save_trace, comp_stage_stats
+    enable_tracing(memory=True)
+    out = run_simulation(load_simulation(machine=machine))
+    save_trace("trace.json")
+    comp_stage_stats()  # percentiles per stage over the whole campaign
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+import numpy as np
+
+_tracer = None
+_NULL_SPAN = nullcontext()
+
+
+class Tracer:
+    """Events of the enabled tracing session"""
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.events = list()
+        self.t0 = time.perf_counter()
+        self.local = threading.local()
+        self.is_tracemalloc_owner = False
+        if memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.is_tracemalloc_owner = True
+
+    def stop(self):
+        """Stop tracemalloc if this tracer started it (it slows every allocation)"""
+        if self.is_tracemalloc_owner:
+            import tracemalloc
+
+            tracemalloc.stop()
+            self.is_tracemalloc_owner = False
+
+    def get_stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = list()
+        return self.local.stack
+
+    @contextmanager
+    def span(self, name, cat="stage", args=None):
+        stack = self.get_stack()
+        entry = {"peak": 0, "mem": 0}
+        if self.memory:
+            import tracemalloc
+
+            entry["mem"], peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+        stack.append(entry)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            dur, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            stack.pop()
+            event_args = dict(args or {})
+            event_args["cpu_ms"] = cpu * 1e3
+            if self.memory:
+                import tracemalloc
+
+                peak = max(entry["peak"], tracemalloc.get_traced_memory()[1])
+                if stack:
+                    stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+                tracemalloc.reset_peak()
+                event_args["peak_mem_MB"] = (peak - entry["mem"]) / 1e6
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": cat,
+                    "ph": "X",
+                    "ts": (wall - self.t0) * 1e6,
+                    "dur": dur * 1e6,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                    "args": event_args,
+                }
+            )
+
+
+def enable_tracing(memory=False):
+    """Start a tracing session (replaces the current one)"""
+    global _tracer
+    if _tracer is not None:
+        _tracer.stop()
+    _tracer = Tracer(memory=memory)
+    return _tracer
+
+
+def disable_tracing():
+    """Stop tracing, returns the tracer holding the recorded events"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.stop()
+    return tracer
+
+
+def is_tracing():
+    return _tracer is not None
+
+
+def span(name, cat="stage", **args):
+    """Context manager timing the enclosed block as the stage name"""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, cat=cat, args=args)
+
+
+def traced(name=None, cat="stage"):
+    """Decorator timing each call of a function (qualified name by default)"""
+
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(label, cat=cat):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument(cls, names=None, cat="stage"):
+    """Wrap public methods of a class defined elsewhere (e.g. the Boldea generators)
+
+    Args:
+        cls: class to instrument in place
+        names (list): methods to wrap, all public methods by default
+    """
+    if names is None:
+        names = [k for k, v in vars(cls).items() if callable(v) and not k.startswith("_")]
+    for key in names:
+        method = getattr(cls, key)
+        if not getattr(method, "__traced__", False):
+            wrapper = traced(cls.__name__ + "." + key, cat=cat)(method)
+            wrapper.__traced__ = True
+            setattr(cls, key, wrapper)
+    return cls
+
+
+def get_events(tracer=None):
+    tracer = tracer or _tracer
+    return [] if tracer is None else tracer.events
+
+
+def save_trace(path, tracer=None):
+    """Write the events in the Chrome trace format (JSON object with traceEvents)"""
+    with open(path, "w") as f:
+        json.dump({"traceEvents": get_events(tracer), "displayTimeUnit": "ms"}, f)
+
+
+def load_trace(path_list):
+    """Events of one or several saved traces (e.g. one per worker of a campaign)"""
+    if isinstance(path_list, str):
+        path_list = [path_list]
+    events = list()
+    for path in path_list:
+        with open(path) as f:
+            events.extend(json.load(f)["traceEvents"])
+    return events
+
+
+def comp_stage_stats(events=None, percentiles=(50, 90, 99)):
+    """Count, total and percentiles of the wall and CPU time of each stage [ms]
+
+    Args:
+        events (list): trace events, those of the current session by default
+    """
+    if events is None:
+        events = get_events()
+    durations, cpu = dict(), dict()
+    for event in events:
+        if event.get("ph") != "X":
+            continue
+        durations.setdefault(event["name"], []).append(event["dur"] / 1e3)
+        cpu.setdefault(event["name"], []).append(event.get("args", {}).get("cpu_ms", np.nan))
+
+    stats = dict()
+    for name, dur in durations.items():
+        stats[name] = {"count": len(dur), "total_ms": float(np.sum(dur))}
+        for q in percentiles:
+            stats[name]["p" + str(q) + "_ms"] = float(np.percentile(dur, q))
+            stats[name]["cpu_p" + str(q) + "_ms"] = float(np.nanpercentile(cpu[name], q))
+    return stats
+
+
+def print_stage_stats(stats=None):
+    """Table of comp_stage_stats sorted by total time"""
+    stats = comp_stage_stats() if stats is None else stats
+    print(f"{'stage':<45s} {'count':>6s} {'total':>10s} {'p50':>9s} {'p90':>9s}")
+    for name, s in sorted(stats.items(), key=lambda x: -x[1]["total_ms"]):
+        print(
+            f"{name:<45s} {s['count']:6d} {s['total_ms']:8.1f}ms "
+            f"{s.get('p50_ms', np.nan):7.1f}ms {s.get('p90_ms', np.nan):7.1f}ms"
+        )
@@ -0,0 +1,244 @@
+"""Work queue of a simulation campaign shared by workers on several nodes.
+
+A coordinator enqueues (machine file, defect changes, operating point) tasks;
+workers started on any node lease them, run the simulation and write the
+output to shared storage. A leased task is invisible to the other workers
+until its lease expires: the worker extends it while the simulation runs, so
+a task whose worker died is leased again after lease_time. A task failing
+max_attempts times goes to the dead-letter queue instead of blocking the
+campaign.
+
+    broker = SQLiteBroker("campaign.db")
+    enqueue_campaign(broker, machine_files, defects=[{}, {"stator.winding.Ntcoil": 6}])
+    # on each node (the database and output folder on a shared file system):
+    python -m util.work_queue worker campaign.db --output results/
+
+The broker is any object with the methods of SQLiteBroker (put_many, lease,
+heartbeat, ack, nack, counts). SQLiteBroker suits one host or a shared file
+system with working locks; a broker process (e.g. a Redis or RabbitMQ client
+with the same methods) takes its place for a larger cluster.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from itertools import product
+from os.path import join
+
+from util.tracing import traced
+
+PENDING, RUNNING, DONE, DEAD = "pending", "running", "done", "dead"
+
+
+class SQLiteBroker:
+    """Task queue in a SQLite database (one connection per thread)"""
+
+    def __init__(self, path, lease_time=600, max_attempts=3):
+        self.path = path
+        self.lease_time = lease_time
+        self.max_attempts = max_attempts
+        self.local = threading.local()
+        self.connect().execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY, payload TEXT, status TEXT, attempts INTEGER DEFAULT 0, "
+            "lease_until REAL DEFAULT 0, worker TEXT, result TEXT, error TEXT)"
+        )
+        self.connect().execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_until)")
+
+    def connect(self):
+        if not hasattr(self.local, "connection"):
+            self.local.connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            self.local.connection.execute("PRAGMA journal_mode=WAL")
+        return self.local.connection
+
+    def put_many(self, payload_list):
+        """Enqueue tasks, returns their ids"""
+        db = self.connect()
+        db.execute("BEGIN IMMEDIATE")
+        id_list = [db.execute("INSERT INTO tasks (payload, status) VALUES (?, ?)", (json.dumps(p), PENDING)).lastrowid for p in payload_list]
+        db.execute("COMMIT")
+        return id_list
+
+    def put(self, payload):
+        return self.put_many([payload])[0]
+
+    def lease(self, worker, nb_task=1):
+        """Lease up to nb_task tasks, returns [(id, payload)]
+
+        Running tasks whose lease expired are leased again, or moved to the
+        dead-letter queue once they used max_attempts.
+        """
+        db = self.connect()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "UPDATE tasks SET status=?, error=COALESCE(error, 'lease expired') "
+                "WHERE status=? AND lease_until<? AND attempts>=?",
+                (DEAD, RUNNING, now, self.max_attempts),
+            )
+            rows = db.execute(
+                "SELECT id, payload FROM tasks WHERE status=? OR (status=? AND lease_until<?) ORDER BY id LIMIT ?",
+                (PENDING, RUNNING, now, nb_task),
+            ).fetchall()
+            db.executemany(
+                "UPDATE tasks SET status=?, attempts=attempts+1, lease_until=?, worker=? WHERE id=?",
+                [(RUNNING, now + self.lease_time, worker, task_id) for task_id, _ in rows],
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return [(task_id, json.loads(payload)) for task_id, payload in rows]
+
+    def heartbeat(self, task_id, worker):
+        """Extend the lease of a running task, False if the task was lost"""
+        cursor = self.connect().execute(
+            "UPDATE tasks SET lease_until=? WHERE id=? AND worker=? AND status=?",
+            (time.time() + self.lease_time, task_id, worker, RUNNING),
+        )
+        return cursor.rowcount == 1
+
+    def ack(self, task_id, result=None):
+        self.connect().execute("UPDATE tasks SET status=?, result=? WHERE id=?", (DONE, json.dumps(result), task_id))
+
+    def nack(self, task_id, error="", worker=None):
+        """Release a failed task: pending again, or dead after max_attempts
+
+        With worker, a task leased again by another worker (lease expired) is left alone.
+        """
+        self.connect().execute(
+            "UPDATE tasks SET status=CASE WHEN attempts>=? THEN ? ELSE ? END, lease_until=0, error=? "
+            "WHERE id=? AND status=? AND (? IS NULL OR worker=?)",
+            (self.max_attempts, DEAD, PENDING, error, task_id, RUNNING, worker, worker),
+        )
+
+    def counts(self):
+        """{status: number of tasks}"""
+        rows = self.connect().execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        return {status: nb for status, nb in rows}
+
+    def get_dead(self):
+        """[(id, payload, error)] of the dead-letter queue"""
+        rows = self.connect().execute("SELECT id, payload, error FROM tasks WHERE status=? ORDER BY id", (DEAD,))
+        return [(task_id, json.loads(payload), error) for task_id, payload, error in rows]
+
+    def requeue_dead(self):
+        """Move the dead-letter queue back to pending (e.g. after a fix)"""
+        cursor = self.connect().execute("UPDATE tasks SET status=?, attempts=0, lease_until=0 WHERE status=?", (PENDING, DEAD))
+        return cursor.rowcount
+
+    def get_results(self):
+        """{id: result} of the done tasks"""
+        rows = self.connect().execute("SELECT id, result FROM tasks WHERE status=? ORDER BY id", (DONE,))
+        return {task_id: json.loads(result) for task_id, result in rows}
+
+
+def enqueue_campaign(broker, machine_files, defects=None, operating_points=None, solver="FEMM", cost=None):
+    """Enqueue every (machine file, defect, operating point) combination
+
+    Args:
+        machine_files (list): paths of the machine files (shared storage)
+        defects (list): {path: value} changes of each defect (see util.clone.set_path),
+            {} for the healthy machine
+        operating_points (list): load_simulation keyword arguments
+            (rotor_speed, I0_rms, Phi0, ...)
+        cost: function payload -> predicted runtime (see util.cost_model), the
+            tasks are then enqueued (and leased) longest first
+    """
+    payload_list = [
+        {"machine": machine_file, "defect": defect, "operating_point": op, "solver": solver}
+        for machine_file, defect, op in product(machine_files, defects or [{}], operating_points or [{}])
+    ]
+    if cost is not None:
+        for payload in payload_list:
+            payload["predicted_time"] = float(cost(payload))
+        payload_list.sort(key=lambda payload: -payload["predicted_time"])
+    return broker.put_many(payload_list)
+
+
+@traced()
+def run_simulation_task(task_id, payload, output_dir):
+    """Simulate a task and save its output in output_dir, returns the result stored by the broker"""
+    from pyleecan.Functions.load import load
+
+    from util.clone import clone_machine
+    from util.simulation import load_simulation, run_simulation
+
+    machine = clone_machine(load(payload["machine"]), payload.get("defect"))
+    simulation = load_simulation(machine=machine, solver=payload.get("solver", "FEMM"), **payload.get("operating_point", {}))
+    out = run_simulation(simulation)
+    if out is None:
+        return {"skipped": "machine not feasible"}
+    path = join(output_dir, "task_" + str(task_id) + ".h5")
+    out.save(path)
+    return {"output": path}
+
+
+def run_worker(broker, handler, worker=None, poll_time=5, max_task=None, stop_when_empty=True):
+    """Lease and run tasks until the queue is empty (or max_task tasks ran)
+
+    Args:
+        broker: SQLiteBroker or any broker with the same methods
+        handler: function (task_id, payload) -> result (JSON serializable),
+            an exception releases the task for a retry
+        worker (str): worker name, host:pid by default
+
+    Returns:
+        int: number of tasks run
+    """
+    worker = worker or socket.gethostname() + ":" + str(os.getpid())
+    nb_task = 0
+    while max_task is None or nb_task < max_task:
+        task_list = broker.lease(worker)
+        if not task_list:
+            if stop_when_empty and not broker.counts().get(RUNNING):
+                break
+            time.sleep(poll_time)
+            continue
+        task_id, payload = task_list[0]
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(broker, task_id, worker, stop), daemon=True)
+        beat.start()
+        try:
+            result = handler(task_id, payload)
+        except Exception:
+            broker.nack(task_id, traceback.format_exc(), worker)
+        else:
+            broker.ack(task_id, result)
+        finally:
+            stop.set()
+            beat.join()
+        nb_task += 1
+    return nb_task
+
+
+def _heartbeat(broker, task_id, worker, stop):
+    while not stop.wait(broker.lease_time / 3):
+        if not broker.heartbeat(task_id, worker):
+            break
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Worker and status of a simulation work queue")
+    parser.add_argument("command", choices=["worker", "status", "requeue"])
+    parser.add_argument("queue", help="SQLite database of the queue")
+    parser.add_argument("--output", default=".", help="folder of the simulation outputs (shared storage)")
+    parser.add_argument("--lease-time", type=float, default=600)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    args = parser.parse_args()
+
+    broker = SQLiteBroker(args.queue, lease_time=args.lease_time, max_attempts=args.max_attempts)
+    if args.command == "worker":
+        os.makedirs(args.output, exist_ok=True)
+        nb_task = run_worker(broker, lambda task_id, payload: run_simulation_task(task_id, payload, args.output))
+        print(nb_task, "tasks run")
+    elif args.command == "requeue":
+        print(broker.requeue_dead(), "dead tasks requeued")
+    print(broker.counts())